@@ -6,14 +6,21 @@ GitHub 多仓库自动处理脚本
 
 import os
 import sys
-import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from core.github import GitHubClient
+from core.github_graphql import GitHubGraphQLClient
+from core.github_app import GitHubAppAuth
+from core.http_cache import HTTPCache
+from core.checkpoint import RunCheckpoint
+from core.file_lock import load_json, update_json_file
+from core.leases import IssueLeaseStore
+from core.fingerprint import make_fingerprint, fingerprint_matches, is_legacy
+from core.watermark import WatermarkStore
 from providers.claude import ClaudeProvider
 
 # 设置日志
@@ -30,128 +37,207 @@ logger = logging.getLogger(__name__)
 # 状态文件
 STATE_FILE = 'logs/github_multi_repo_state.json'
 
+# 增量轮询水位线：只拉取上次运行后更新过的 issues，每隔一段时间全量同步一次
+WATERMARK_FILE = 'logs/github_multi_repo_watermarks.json'
+FULL_RESYNC_HOURS = float(os.getenv('GITHUB_FULL_RESYNC_HOURS', '24'))
+
+# HTTP 条件请求缓存，跨 cron 运行复用 ETag
+HTTP_CACHE_FILE = os.getenv('HTTP_CACHE_FILE', 'logs/http_cache.db')
+HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', '50'))
+
+# GitHub App 认证：设置 GITHUB_APP_ID 和 GITHUB_APP_PRIVATE_KEY_PATH 后，
+# 每个 owner 使用各自 installation 的 token 和配额，token 缓存在这个文件里
+APP_TOKEN_CACHE_FILE = 'logs/github_app_tokens.json'
+
+# 使用 GraphQL 一次查询拿到 issues 和评论，避免每个 issue 单独请求评论
+USE_GRAPHQL = os.getenv('GITHUB_USE_GRAPHQL', '0') == '1'
+
+# 多个进程（webhook、cron）通过这个库里的租约保证同一时间只有一个 worker 处理某个 issue
+LEASE_FILE = 'logs/issue_leases.db'
+LEASE_SECONDS = 900
+
+# 运行检查点：记录每个仓库、每个 issue 的进度，崩溃或超时后下次运行跳过已完成的仓库，
+# 继续处理中断的 issue（复用已有的 AI 决策）；GITHUB_RESUME=0 时忽略旧检查点重新开始
+CHECKPOINT_FILE = 'logs/github_multi_repo_checkpoint.jsonl'
+RESUME = os.getenv('GITHUB_RESUME', '1') == '1'
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv('GITHUB_CHECKPOINT_MAX_AGE_HOURS', '6'))
+
 
 def load_processed_issues():
     """加载已处理的 issues"""
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    return load_json(STATE_FILE)
 
 
-def save_processed_issues(processed):
-    """保存已处理的 issues"""
-    os.makedirs('logs', exist_ok=True)
-    with open(STATE_FILE, 'w') as f:
-        json.dump(processed, f, indent=2)
+def save_processed_issues(updates):
+    """把本次处理的 issues 合并写入状态文件（加文件锁，不覆盖其他进程写入的记录）"""
+    return update_json_file(STATE_FILE, updates)
 
 
-def process_repository(github_client, ai_provider, repo_owner, repo_name, processed):
+def process_repository(github_client, ai_provider, repo_owner, repo_name, processed, watermarks, leases,
+                       checkpoint):
     """处理单个仓库的 issues"""
 
     logger.info(f"\n{'='*60}")
     logger.info(f"Processing repository: {repo_owner}/{repo_name}")
     logger.info(f"{'='*60}")
 
-    try:
-        # 获取带 'bot' 标签的 open issues
-        issues = github_client.get_repository_issues(
-            owner=repo_owner,
-            repo=repo_name,
-            labels=['bot'],
-            state='open'
-        )
-
-        logger.info(f"Found {len(issues)} open issues with 'bot' label")
+    # 增量轮询的起始时间（None 表示本轮全量同步）
+    repo_key = f"{repo_owner}/{repo_name}"
+    since = watermarks.get_since(repo_key)
+    if since:
+        logger.info(f"Incremental poll: issues updated since {since}")
+    else:
+        logger.info("Full resync of open issues")
 
+    try:
+        # 逐页获取带 'bot' 标签的 open issues，拿到第一页就开始处理
+        # GraphQL 模式下评论随 issue 一起返回；REST 模式下评论为 None，需要时再单独获取
+        if USE_GRAPHQL:
+            issues = GitHubGraphQLClient(github_client).iter_issues_with_comments(
+                owner=repo_owner,
+                repo=repo_name,
+                labels=['bot'],
+                state='open',
+                since=since
+            )
+        else:
+            issues = (
+                (issue, None)
+                for issue in github_client.iter_repository_issues(
+                    owner=repo_owner,
+                    repo=repo_name,
+                    labels=['bot'],
+                    state='open',
+                    since=since
+                )
+            )
+
+        found_count = 0
         processed_count = 0
-        for issue in issues:
+        max_updated_at = None
+        had_failures = False
+        for issue, comments in issues:
+            found_count += 1
+            if max_updated_at is None or issue['updated_at'] > max_updated_at:
+                max_updated_at = issue['updated_at']
             issue_number = issue['number']
             issue_key = f"{repo_owner}/{repo_name}#{issue_number}"
 
             # 获取当前标签
             current_labels = [label['name'] for label in issue.get('labels', [])]
 
+            # 上次运行处理到一半中断的 issue 带着 analyzing 标签，从检查点继续处理
+            # （只有拿到检查点文件锁时才会恢复，说明上次运行的进程已经退出）
+            entry = checkpoint.get(issue_key)
+            resuming = checkpoint.resumed and entry is not None and entry['status'] in ('started', 'analyzed')
+            if resuming:
+                logger.info(f"Issue #{issue_number} was interrupted in the previous run, resuming")
+                # 中断的进程留下的租约要等过期，这里直接释放
+                leases.release(issue_key, worker_id=entry.get('worker'))
+
             # 🔍 关键：如果有状态标签，跳过（用户需手动移除才会重新处理）
             skip_labels = ['needs-info', 'in-progress', 'cannot-fix', 'analyzing']
-            if any(label in current_labels for label in skip_labels):
+            if not resuming and any(label in current_labels for label in skip_labels):
                 logger.debug(f"Issue #{issue_number} has status label, skipping")
                 continue
 
-            # 获取评论
-            comments = github_client.get_comments(issue_number, repo_owner, repo_name)
-
-            # 生成指纹（包含标签状态）
-            fingerprint = f"{issue['title']}_{issue['body']}_{len(comments)}_{','.join(sorted(current_labels))}"
-
-            # 检查是否已处理
-            if issue_key in processed and processed[issue_key] == fingerprint:
+            # 生成此 issue 的"状态指纹"（用于判断是否有新变化）
+            # 包含：标题和描述的摘要、评论数（issue 自带的总数）、最新评论 ID（已获取评论时）、标签
+            # REST 模式下全部来自列表接口返回的字段，不需要先请求评论
+            fingerprint = make_fingerprint(issue, comments)
+
+            # 检查是否已处理过且没有新变化
+            if fingerprint_matches(processed.get(issue_key), issue, fingerprint):
+                # 旧版状态文件保存的是 issue 全文，匹配时顺便换成摘要记录
+                if is_legacy(processed[issue_key]):
+                    processed[issue_key] = fingerprint
+                    save_processed_issues({issue_key: fingerprint})
                 logger.debug(f"Issue #{issue_number} already processed, skipping")
                 continue
 
-            logger.info(f"Processing issue #{issue_number}: {issue['title']}")
+            # 其他进程（webhook 触发的处理、另一个 cron）正在处理这个 issue 时跳过
+            if not leases.claim(issue_key, LEASE_SECONDS):
+                logger.info(f"Issue #{issue_number} is being processed by another worker, skipping")
+                continue
 
+            # 认领之后（包括获取评论、读取状态时）出错也要释放租约，否则 issue 会被锁住到租约过期
             try:
-                # 发布开始处理评论
-                start_comment = """🤖 **AI Agent 已开始处理此 issue，请稍等...**
+                # 认领之前其他进程可能刚处理完
+                if fingerprint_matches(load_processed_issues().get(issue_key), issue, fingerprint):
+                    continue
+
+                # 指纹有变化才获取评论
+                if comments is None:
+                    comments = github_client.get_comments(issue_number, repo_owner, repo_name)
+                    fingerprint = make_fingerprint(issue, comments)
+
+                logger.info(f"Processing issue #{issue_number}: {issue['title']}")
+
+                try:
+                    # 发布开始处理评论（中断前已经发过时不再重复）
+                    if not resuming:
+                        start_comment = """🤖 **AI Agent 已开始处理此 issue，请稍等...**
 
 正在分析 issue 内容，很快会给出反馈。
 
 ⏳ *Processing...*
 """
-                github_client.add_comment(issue_number, start_comment, repo_owner, repo_name)
-
-                # 添加 analyzing 标签
-                current_labels = [label['name'] for label in issue.get('labels', [])]
-                if 'analyzing' not in current_labels:
-                    github_client.add_labels(issue_number, ['analyzing'], repo_owner, repo_name)
-
-                # 构建仓库信息
-                repo_info = {
-                    'name': repo_name,
-                    'path_with_namespace': f"{repo_owner}/{repo_name}",
-                    'default_branch': 'main',
-                    'description': f"GitHub repository: {repo_owner}/{repo_name}"
-                }
-
-                # 转换为统一格式
-                unified_issue = {
-                    'iid': issue['number'],
-                    'title': issue['title'],
-                    'description': issue['body'] or '',
-                    'author': {
-                        'username': issue['user']['login']
-                    },
-                    'labels': [label['name'] for label in issue.get('labels', [])]
-                }
-
-                # 过滤用户评论
-                user_comments = []
-                for comment in comments:
-                    author = comment['user']['login']
-                    body = comment['body']
-                    if '🤖' not in body and 'AI Agent' not in body:
-                        user_comments.append({
-                            'author': author,
-                            'body': body,
-                            'created_at': comment['created_at']
-                        })
-
-                # AI 分析
-                analysis_result = ai_provider.analyze_issue(unified_issue, repo_info, user_comments)
-                action = analysis_result.get('action', 'skip')
-
-                logger.info(f"AI Analysis: {action}")
-
-                # 根据结果采取行动
-                if action == "need_info":
-                    questions = analysis_result.get('questions', [])
-                    questions_text = "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions))
-
-                    comment_body = f"""👋 Hi @{issue['user']['login']}!
+                        github_client.add_comment(issue_number, start_comment, repo_owner, repo_name)
+                        checkpoint.record(issue_key, 'started', worker=leases.worker_id)
+
+                    # 添加 analyzing 标签
+                    current_labels = [label['name'] for label in issue.get('labels', [])]
+                    if 'analyzing' not in current_labels:
+                        github_client.add_labels(issue_number, ['analyzing'], repo_owner, repo_name)
+
+                    # 构建仓库信息
+                    repo_info = {
+                        'name': repo_name,
+                        'path_with_namespace': f"{repo_owner}/{repo_name}",
+                        'default_branch': 'main',
+                        'description': f"GitHub repository: {repo_owner}/{repo_name}"
+                    }
+
+                    # 转换为统一格式
+                    unified_issue = {
+                        'iid': issue['number'],
+                        'title': issue['title'],
+                        'description': issue['body'] or '',
+                        'author': {
+                            'username': issue['user']['login']
+                        },
+                        'labels': [label['name'] for label in issue.get('labels', [])]
+                    }
+
+                    # 过滤用户评论
+                    user_comments = []
+                    for comment in comments:
+                        author = comment['user']['login']
+                        body = comment['body']
+                        if '🤖' not in body and 'AI Agent' not in body:
+                            user_comments.append({
+                                'author': author,
+                                'body': body,
+                                'created_at': comment['created_at']
+                            })
+
+                    # AI 分析（中断前已经拿到的决策直接复用）
+                    entry = checkpoint.get(issue_key)
+                    if entry is not None and entry['status'] == 'analyzed':
+                        analysis_result = entry['decision']
+                    else:
+                        analysis_result = ai_provider.analyze_issue(unified_issue, repo_info, user_comments)
+                        checkpoint.record(issue_key, 'analyzed', decision=analysis_result, worker=leases.worker_id)
+                    action = analysis_result.get('action', 'skip')
+
+                    logger.info(f"AI Analysis: {action}")
+
+                    # 根据结果采取行动
+                    if action == "need_info":
+                        questions = analysis_result.get('questions', [])
+                        questions_text = "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions))
+
+                        comment_body = f"""👋 Hi @{issue['user']['login']}!
 
 I've analyzed your issue and need some more information:
 
@@ -163,15 +249,15 @@ I've analyzed your issue and need some more information:
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, comment_body, repo_owner, repo_name)
-                    new_labels = [l for l in current_labels if l != 'analyzing']
-                    new_labels.append('needs-info')
-                    github_client.update_issue_labels(issue_number, new_labels, repo_owner, repo_name)
+                        github_client.add_comment(issue_number, comment_body, repo_owner, repo_name)
+                        new_labels = [l for l in current_labels if l != 'analyzing']
+                        new_labels.append('needs-info')
+                        github_client.update_issue_labels(issue_number, new_labels, repo_owner, repo_name)
 
-                elif action == "can_handle":
-                    plan = analysis_result.get('plan', 'Will work on this issue')
+                    elif action == "can_handle":
+                        plan = analysis_result.get('plan', 'Will work on this issue')
 
-                    comment_body = f"""✅ Great! I can help with this issue.
+                        comment_body = f"""✅ Great! I can help with this issue.
 
 **Analysis:**
 {analysis_result.get('reason', 'This issue can be automated')}
@@ -183,31 +269,44 @@ I'll start working on this shortly!
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, comment_body, repo_owner, repo_name)
-                    new_labels = [l for l in current_labels if l != 'analyzing']
-                    new_labels.append('in-progress')
-                    github_client.update_issue_labels(issue_number, new_labels, repo_owner, repo_name)
+                        github_client.add_comment(issue_number, comment_body, repo_owner, repo_name)
+                        new_labels = [l for l in current_labels if l != 'analyzing']
+                        new_labels.append('in-progress')
+                        github_client.update_issue_labels(issue_number, new_labels, repo_owner, repo_name)
 
-                else:  # skip
-                    comment_body = f"""ℹ️ I've analyzed this issue, but it requires human expertise.
+                    else:  # skip
+                        comment_body = f"""ℹ️ I've analyzed this issue, but it requires human expertise.
 
 **Reason:**
 {analysis_result.get('reason', 'This task requires human review')}
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, comment_body, repo_owner, repo_name)
-                    new_labels = [l for l in current_labels if l != 'analyzing']
-                    new_labels.append('cannot-fix')
-                    github_client.update_issue_labels(issue_number, new_labels, repo_owner, repo_name)
-
-                # 记录已处理
-                processed[issue_key] = fingerprint
-                processed_count += 1
-                logger.info(f"✅ Successfully processed issue #{issue_number}")
-
-            except Exception as e:
-                logger.error(f"Error processing issue #{issue_number}: {e}")
+                        github_client.add_comment(issue_number, comment_body, repo_owner, repo_name)
+                        new_labels = [l for l in current_labels if l != 'analyzing']
+                        new_labels.append('cannot-fix')
+                        github_client.update_issue_labels(issue_number, new_labels, repo_owner, repo_name)
+
+                    # 记录已处理
+                    processed[issue_key] = fingerprint
+                    save_processed_issues({issue_key: fingerprint})
+                    checkpoint.record(issue_key, 'done')
+                    processed_count += 1
+                    logger.info(f"✅ Successfully processed issue #{issue_number}")
+
+                except Exception as e:
+                    logger.error(f"Error processing issue #{issue_number}: {e}")
+                    had_failures = True
+            finally:
+                leases.release(issue_key)
+
+        logger.info(f"Found {found_count} open issues with 'bot' label")
+
+        # 有失败的 issue 时不推进水位线，下一轮还能重新拉到它们
+        if not had_failures:
+            watermarks.advance(repo_key, max_updated_at, full_sync=since is None)
+            watermarks.save()
+            checkpoint.record(repo_key, 'done', processed=processed_count)
 
         return processed_count
 
@@ -223,13 +322,26 @@ def main():
     logger.info("=" * 60)
 
     # 从环境变量获取配置
-    github_token = os.getenv('GITHUB_TOKEN')
+    # 多个 token 用逗号分隔（GITHUB_TOKENS），请求会路由到剩余配额最多的 token
+    github_tokens = [
+        token.strip()
+        for token in os.getenv('GITHUB_TOKENS', os.getenv('GITHUB_TOKEN', '')).split(',')
+        if token.strip()
+    ]
     repositories_str = os.getenv('GITHUB_REPOS', '')  # 格式: owner1/repo1,owner2/repo2
     use_local_proxy = os.getenv('USE_LOCAL_PROXY', '1')
     anthropic_api_key = os.getenv('ANTHROPIC_API_KEY', 'any_value')
 
-    if not github_token:
-        logger.error("GITHUB_TOKEN environment variable not set")
+    app_auth = None
+    if os.getenv('GITHUB_APP_ID'):
+        app_auth = GitHubAppAuth.from_key_file(
+            os.getenv('GITHUB_APP_ID'),
+            os.getenv('GITHUB_APP_PRIVATE_KEY_PATH', ''),
+            cache_file=APP_TOKEN_CACHE_FILE
+        )
+
+    if not github_tokens and not app_auth:
+        logger.error("GITHUB_TOKEN (or GITHUB_TOKENS / GITHUB_APP_ID) environment variable not set")
         sys.exit(1)
 
     if not repositories_str:
@@ -256,7 +368,8 @@ def main():
         logger.info(f"  - {owner}/{repo}")
 
     # 初始化客户端
-    github_client = GitHubClient(token=github_token)
+    http_cache = HTTPCache(HTTP_CACHE_FILE, max_size=HTTP_CACHE_MAX_MB * 1024 * 1024)
+    github_client = GitHubClient(token=github_tokens, cache=http_cache, app_auth=app_auth)
 
     # 初始化 AI Provider
     api_base = "http://localhost:8082" if use_local_proxy == '1' else None
@@ -266,21 +379,36 @@ def main():
         api_base=api_base
     )
 
-    # 加载已处理记录
+    # 加载已处理记录和增量轮询水位线
     processed = load_processed_issues()
+    watermarks = WatermarkStore(WATERMARK_FILE, timedelta(hours=FULL_RESYNC_HOURS))
+    leases = IssueLeaseStore(LEASE_FILE)
+    checkpoint = RunCheckpoint(
+        CHECKPOINT_FILE, resume=RESUME, max_age=timedelta(hours=CHECKPOINT_MAX_AGE_HOURS)
+    )
+    checkpoint.begin()
 
     # 处理每个仓库
     total_processed = 0
     for repo_owner, repo_name in repositories:
-        count = process_repository(github_client, ai_provider, repo_owner, repo_name, processed)
+        # 上次中断的运行中已经处理完的仓库不再重复拉取
+        if checkpoint.is_done(f"{repo_owner}/{repo_name}"):
+            logger.info(f"Repository {repo_owner}/{repo_name} already done in the interrupted run, skipping")
+            continue
+        count = process_repository(
+            github_client, ai_provider, repo_owner, repo_name, processed, watermarks, leases, checkpoint
+        )
         total_processed += count
 
-    # 保存状态
-    save_processed_issues(processed)
+    # 已处理记录和水位线在处理过程中即已写入，运行正常结束后删除检查点
+    checkpoint.finish()
 
     logger.info("\n" + "=" * 60)
     logger.info(f"Finished processing {len(repositories)} repositories")
     logger.info(f"Total issues processed: {total_processed}")
+    logger.info(f"HTTP cache: {http_cache.get_stats()}")
+    logger.info(f"GitHub rate limit: {github_client.get_rate_limit_status()}")
+    logger.info(f"Connections: {github_client.session.get_connection_metrics()}")
     logger.info("=" * 60)
 
 
@@ -15,7 +15,14 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from core.gitlab import GitLabClient
 from core.agent import IssueAgent
-from core.state import StateManager
+from core.pipeline import create_pipeline
+from core.scheduler import create_scheduler
+from core.state import create_state_manager_from_config
+from core.blobstore import create_blob_store
+from core.budget import create_budget
+from core.checkpoint import create_checkpoint
+from core.http_cache import HTTPCache
+from core.transport import create_session_from_config, get_max_workers
 from providers.claude import ClaudeProvider
 
 # 设置日志
@@ -54,9 +61,18 @@ def main():
 
     # 创建 GitLab 客户端
     gitlab_config = config['gitlab']
+    cache_config = config.get('http_cache', {})
+    http_cache = None
+    if cache_config.get('enabled', False):
+        http_cache = HTTPCache(
+            path=cache_config.get('path', 'logs/http_cache.db'),
+            max_size=int(cache_config.get('max_size_mb', 50)) * 1024 * 1024
+        )
+
     gitlab_client = GitLabClient(
         url=gitlab_config['url'],
-        token=gitlab_config['access_token']
+        token=gitlab_config['access_token'],
+        session=create_session_from_config(config, http_cache)
     )
     logger.info(f"GitLab URL: {gitlab_config['url']}")
 
@@ -82,14 +98,22 @@ def main():
         sys.exit(1)
 
     # 创建状态管理器
-    state_manager = StateManager(config.get('state_file', 'state.json'))
+    state_manager = create_state_manager_from_config(config)
 
     # 创建 Agent
-    agent = IssueAgent(gitlab_client, ai_provider, state_manager)
+    agent = IssueAgent(
+        gitlab_client, ai_provider, state_manager, create_blob_store(config),
+        max_workers=get_max_workers(config),
+        scheduler=create_scheduler(config),
+        budget=create_budget(config),
+        checkpoint=create_checkpoint(config)
+    )
+    # 启用 pipeline 时，获取、分析、执行分阶段并发进行
+    runner = create_pipeline(agent, config) or agent
 
     # 处理 issues
     try:
-        results = agent.process_all_issues(
+        results = runner.process_all_issues(
             username=gitlab_config.get('assignee_username'),
             labels=gitlab_config.get('auto_process_labels', ['bot', 'auto-fix', 'ai'])
         )
@@ -102,6 +126,10 @@ def main():
         logger.info(f"Waiting for Info: {results.get('waiting_for_info', 0)}")
         logger.info(f"Skipped: {results.get('skipped', 0)}")
         logger.info(f"Failed: {results.get('failed', 0)}")
+        logger.info(f"Deferred: {results.get('deferred', 0)}")
+        if http_cache:
+            logger.info(f"HTTP cache: {http_cache.get_stats()}")
+        logger.info(f"Connections: {gitlab_client.session.get_connection_metrics()}")
         logger.info("=" * 60)
 
     except Exception as e:
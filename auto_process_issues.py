@@ -6,15 +6,21 @@
 
 import os
 import sys
-import json
 import time
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from core.github import GitHubClient
+from core.github_graphql import GitHubGraphQLClient
+from core.github_app import GitHubAppAuth
+from core.http_cache import HTTPCache
+from core.file_lock import load_json, update_json_file
+from core.leases import IssueLeaseStore
+from core.fingerprint import make_fingerprint, fingerprint_matches, is_legacy
+from core.watermark import WatermarkStore
 from providers.claude import ClaudeProvider
 
 # 设置日志
@@ -31,46 +37,73 @@ logger = logging.getLogger(__name__)
 # 状态文件，记录已处理的 issues
 STATE_FILE = 'logs/processed_issues.json'
 
+# 增量轮询水位线：只拉取上次运行后更新过的 issues，每隔一段时间全量同步一次
+WATERMARK_FILE = 'logs/processed_issues_watermarks.json'
+FULL_RESYNC_HOURS = float(os.getenv('GITHUB_FULL_RESYNC_HOURS', '24'))
+
+# HTTP 条件请求缓存，跨 cron 运行复用 ETag
+HTTP_CACHE_FILE = os.getenv('HTTP_CACHE_FILE', 'logs/http_cache.db')
+HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', '50'))
+
+# GitHub App 认证：设置 GITHUB_APP_ID 和 GITHUB_APP_PRIVATE_KEY_PATH 后，
+# 每个 owner 使用各自 installation 的 token 和配额，token 缓存在这个文件里
+APP_TOKEN_CACHE_FILE = 'logs/github_app_tokens.json'
+
+# 使用 GraphQL 一次查询拿到 issues 和评论，避免每个 issue 单独请求评论
+USE_GRAPHQL = os.getenv('GITHUB_USE_GRAPHQL', '0') == '1'
+
+# 多个进程（webhook、cron）通过这个库里的租约保证同一时间只有一个 worker 处理某个 issue
+LEASE_FILE = 'logs/issue_leases.db'
+LEASE_SECONDS = 900
+
 
 def load_processed_issues():
     """加载已处理的 issues 列表"""
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    return load_json(STATE_FILE)
 
 
-def save_processed_issues(processed):
-    """保存已处理的 issues 列表"""
-    os.makedirs('logs', exist_ok=True)
-    with open(STATE_FILE, 'w') as f:
-        json.dump(processed, f, indent=2)
+def save_processed_issues(updates):
+    """把本次处理的 issues 合并写入状态文件（加文件锁，不覆盖其他进程写入的记录）"""
+    return update_json_file(STATE_FILE, updates)
 
 
 def process_issues():
     """检查并处理带 bot 标签的 issues"""
 
     # 从环境变量获取配置
-    github_token = os.getenv('GITHUB_TOKEN')
+    # 多个 token 用逗号分隔（GITHUB_TOKENS），请求会路由到剩余配额最多的 token
+    github_tokens = [
+        token.strip()
+        for token in os.getenv('GITHUB_TOKENS', os.getenv('GITHUB_TOKEN', '')).split(',')
+        if token.strip()
+    ]
     anthropic_api_key = os.getenv('ANTHROPIC_API_KEY', 'any_value')
     repo_owner = os.getenv('REPO_OWNER', 'submato')
     repo_name = os.getenv('REPO_NAME', 'gitissue-ai-agent')
     use_local_proxy = os.getenv('USE_LOCAL_PROXY', '1')
 
-    if not github_token:
-        logger.error("GITHUB_TOKEN environment variable not set")
+    app_auth = None
+    if os.getenv('GITHUB_APP_ID'):
+        app_auth = GitHubAppAuth.from_key_file(
+            os.getenv('GITHUB_APP_ID'),
+            os.getenv('GITHUB_APP_PRIVATE_KEY_PATH', ''),
+            cache_file=APP_TOKEN_CACHE_FILE
+        )
+
+    if not github_tokens and not app_auth:
+        logger.error("GITHUB_TOKEN (or GITHUB_TOKENS / GITHUB_APP_ID) environment variable not set")
         return
 
     logger.info(f"Checking issues in {repo_owner}/{repo_name}")
 
     # 初始化客户端
+    http_cache = HTTPCache(HTTP_CACHE_FILE, max_size=HTTP_CACHE_MAX_MB * 1024 * 1024)
     github_client = GitHubClient(
-        token=github_token,
+        token=github_tokens,
         repo_owner=repo_owner,
-        repo_name=repo_name
+        repo_name=repo_name,
+        cache=http_cache,
+        app_auth=app_auth
     )
 
     # 初始化 AI Provider
@@ -83,17 +116,43 @@ def process_issues():
 
     # 加载已处理的 issues
     processed = load_processed_issues()
+    leases = IssueLeaseStore(LEASE_FILE)
 
-    try:
-        # 获取所有带 'bot' 标签且 open 状态的 issues
-        issues = github_client.get_repository_issues(
-            labels=['bot'],
-            state='open'
-        )
-
-        logger.info(f"Found {len(issues)} open issues with 'bot' label")
+    # 增量轮询的起始时间（None 表示本轮全量同步）
+    repo_key = f"{repo_owner}/{repo_name}"
+    watermarks = WatermarkStore(WATERMARK_FILE, timedelta(hours=FULL_RESYNC_HOURS))
+    since = watermarks.get_since(repo_key)
+    if since:
+        logger.info(f"Incremental poll: issues updated since {since}")
+    else:
+        logger.info("Full resync of open issues")
 
-        for issue in issues:
+    try:
+        # 逐页获取所有带 'bot' 标签且 open 状态的 issues，拿到第一页就开始处理
+        # GraphQL 模式下评论随 issue 一起返回；REST 模式下评论为 None，需要时再单独获取
+        if USE_GRAPHQL:
+            issues = GitHubGraphQLClient(github_client).iter_issues_with_comments(
+                labels=['bot'],
+                state='open',
+                since=since
+            )
+        else:
+            issues = (
+                (issue, None)
+                for issue in github_client.iter_repository_issues(
+                    labels=['bot'],
+                    state='open',
+                    since=since
+                )
+            )
+
+        found_count = 0
+        max_updated_at = None
+        had_failures = False
+        for issue, comments in issues:
+            found_count += 1
+            if max_updated_at is None or issue['updated_at'] > max_updated_at:
+                max_updated_at = issue['updated_at']
             issue_number = issue['number']
             issue_key = f"{repo_owner}/{repo_name}#{issue_number}"
 
@@ -107,86 +166,104 @@ def process_issues():
                 logger.debug(f"Issue #{issue_number} has status label {current_labels}, skipping")
                 continue
 
-            # 获取评论历史
-            comments = github_client.get_comments(issue_number)
-
             # 生成此 issue 的"状态指纹"（用于判断是否有新变化）
-            # 包含：issue 标题、描述、评论数、标签
-            fingerprint = f"{issue['title']}_{issue['body']}_{len(comments)}_{','.join(sorted(current_labels))}"
+            # 包含：标题和描述的摘要、评论数（issue 自带的总数）、最新评论 ID（已获取评论时）、标签
+            # REST 模式下全部来自列表接口返回的字段，不需要先请求评论
+            fingerprint = make_fingerprint(issue, comments)
 
             # 检查是否已处理过且没有新变化
-            if issue_key in processed and processed[issue_key] == fingerprint:
+            if fingerprint_matches(processed.get(issue_key), issue, fingerprint):
+                # 旧版状态文件保存的是 issue 全文，匹配时顺便换成摘要记录
+                if is_legacy(processed[issue_key]):
+                    processed[issue_key] = fingerprint
+                    save_processed_issues({issue_key: fingerprint})
                 logger.debug(f"Issue #{issue_number} already processed, skipping")
                 continue
 
-            logger.info(f"Processing issue #{issue_number}: {issue['title']}")
+            # 其他进程（webhook 触发的处理、另一个 cron）正在处理这个 issue 时跳过
+            if not leases.claim(issue_key, LEASE_SECONDS):
+                logger.info(f"Issue #{issue_number} is being processed by another worker, skipping")
+                continue
 
-            # 发布开始处理的评论
+            # 认领之后（包括获取评论、读取状态时）出错也要释放租约，否则 issue 会被锁住到租约过期
             try:
-                start_comment = f"""🤖 **AI Agent 已开始处理此 issue，请稍等...**
+                # 认领之前其他进程可能刚处理完
+                if fingerprint_matches(load_processed_issues().get(issue_key), issue, fingerprint):
+                    continue
+
+                # 指纹有变化才获取评论历史
+                if comments is None:
+                    comments = github_client.get_comments(issue_number)
+                    fingerprint = make_fingerprint(issue, comments)
+
+                logger.info(f"Processing issue #{issue_number}: {issue['title']}")
+
+                # 发布开始处理的评论
+                try:
+                    start_comment = f"""🤖 **AI Agent 已开始处理此 issue，请稍等...**
 
 正在分析 issue 内容，很快会给出反馈。
 
 ⏳ *Processing...*
 """
-                github_client.add_comment(issue_number, start_comment)
-                logger.info(f"Posted 'start processing' comment on issue #{issue_number}")
-            except Exception as e:
-                logger.error(f"Failed to post start comment: {e}")
+                    github_client.add_comment(issue_number, start_comment)
+                    logger.info(f"Posted 'start processing' comment on issue #{issue_number}")
+                except Exception as e:
+                    logger.error(f"Failed to post start comment: {e}")
 
-            # 添加 analyzing 标签
-            try:
-                current_labels = [label['name'] for label in issue.get('labels', [])]
-                if 'analyzing' not in current_labels:
-                    github_client.add_labels(issue_number, ['analyzing'])
-                    logger.info(f"Added 'analyzing' label to issue #{issue_number}")
-            except Exception as e:
-                logger.error(f"Failed to add label: {e}")
-
-            # 构建仓库信息
-            repo_info = {
-                'name': repo_name,
-                'path_with_namespace': f"{repo_owner}/{repo_name}",
-                'default_branch': 'main',
-                'description': f"GitHub repository: {repo_owner}/{repo_name}"
-            }
-
-            # 转换为统一格式
-            unified_issue = {
-                'iid': issue['number'],
-                'title': issue['title'],
-                'description': issue['body'] or '',
-                'author': {
-                    'username': issue['user']['login']
-                },
-                'labels': [label['name'] for label in issue.get('labels', [])]
-            }
-
-            # 过滤用户评论
-            user_comments = []
-            for comment in comments:
-                author = comment['user']['login']
-                body = comment['body']
-                if '🤖' not in body and 'AI Agent' not in body and 'Powered by' not in body:
-                    user_comments.append({
-                        'author': author,
-                        'body': body,
-                        'created_at': comment['created_at']
-                    })
-
-            # AI 分析
-            try:
-                analysis_result = ai_provider.analyze_issue(unified_issue, repo_info, user_comments)
-                logger.info(f"AI Analysis for #{issue_number}: {analysis_result.get('action')}")
+                # 添加 analyzing 标签
+                try:
+                    current_labels = [label['name'] for label in issue.get('labels', [])]
+                    if 'analyzing' not in current_labels:
+                        github_client.add_labels(issue_number, ['analyzing'])
+                        logger.info(f"Added 'analyzing' label to issue #{issue_number}")
+                except Exception as e:
+                    logger.error(f"Failed to add label: {e}")
+
+                # 构建仓库信息
+                repo_info = {
+                    'name': repo_name,
+                    'path_with_namespace': f"{repo_owner}/{repo_name}",
+                    'default_branch': 'main',
+                    'description': f"GitHub repository: {repo_owner}/{repo_name}"
+                }
+
+                # 转换为统一格式
+                unified_issue = {
+                    'iid': issue['number'],
+                    'title': issue['title'],
+                    'description': issue['body'] or '',
+                    'author': {
+                        'username': issue['user']['login']
+                    },
+                    'labels': [label['name'] for label in issue.get('labels', [])]
+                }
+
+                # 过滤用户评论
+                user_comments = []
+                for comment in comments:
+                    author = comment['user']['login']
+                    body = comment['body']
+                    if '🤖' not in body and 'AI Agent' not in body and 'Powered by' not in body:
+                        user_comments.append({
+                            'author': author,
+                            'body': body,
+                            'created_at': comment['created_at']
+                        })
+
+                # AI 分析
+                try:
+                    analysis_result = ai_provider.analyze_issue(unified_issue, repo_info, user_comments)
+                    logger.info(f"AI Analysis for #{issue_number}: {analysis_result.get('action')}")
 
-                # 根据分析结果采取行动
-                action = analysis_result.get('action', 'skip')
+                    # 根据分析结果采取行动
+                    action = analysis_result.get('action', 'skip')
 
-                if action == "need_info":
-                    questions = analysis_result.get('questions', [])
-                    questions_text = "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions))
+                    if action == "need_info":
+                        questions = analysis_result.get('questions', [])
+                        questions_text = "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions))
 
-                    comment_body = f"""👋 Hi @{issue['user']['login']}!
+                        comment_body = f"""👋 Hi @{issue['user']['login']}!
 
 I've analyzed your issue and need some more information to proceed:
 
@@ -198,19 +275,19 @@ I've analyzed your issue and need some more information to proceed:
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, comment_body)
+                        github_client.add_comment(issue_number, comment_body)
 
-                    # 更新标签
-                    new_labels = [l for l in current_labels if l != 'analyzing']
-                    new_labels.append('needs-info')
-                    github_client.update_issue_labels(issue_number, new_labels)
+                        # 更新标签
+                        new_labels = [l for l in current_labels if l != 'analyzing']
+                        new_labels.append('needs-info')
+                        github_client.update_issue_labels(issue_number, new_labels)
 
-                    logger.info(f"Posted comment asking for more info on issue #{issue_number}")
+                        logger.info(f"Posted comment asking for more info on issue #{issue_number}")
 
-                elif action == "can_handle":
-                    plan = analysis_result.get('plan', 'Will work on this issue')
+                    elif action == "can_handle":
+                        plan = analysis_result.get('plan', 'Will work on this issue')
 
-                    comment_body = f"""✅ Great! I can help with this issue.
+                        comment_body = f"""✅ Great! I can help with this issue.
 
 **Analysis:**
 {analysis_result.get('reason', 'This issue can be automated')}
@@ -222,15 +299,15 @@ I'll start working on this shortly. Stay tuned for updates!
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, comment_body)
+                        github_client.add_comment(issue_number, comment_body)
 
-                    # 更新标签
-                    new_labels = [l for l in current_labels if l != 'analyzing']
-                    new_labels.append('in-progress')
-                    github_client.update_issue_labels(issue_number, new_labels)
+                        # 更新标签
+                        new_labels = [l for l in current_labels if l != 'analyzing']
+                        new_labels.append('in-progress')
+                        github_client.update_issue_labels(issue_number, new_labels)
 
-                else:  # skip
-                    comment_body = f"""ℹ️ I've analyzed this issue, but it appears to be too complex for automatic handling.
+                    else:  # skip
+                        comment_body = f"""ℹ️ I've analyzed this issue, but it appears to be too complex for automatic handling.
 
 **Reason:**
 {analysis_result.get('reason', 'This task requires human expertise')}
@@ -239,25 +316,26 @@ This issue would benefit from human review and implementation. I'll label it app
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, comment_body)
+                        github_client.add_comment(issue_number, comment_body)
 
-                    # 更新标签
-                    new_labels = [l for l in current_labels if l != 'analyzing']
-                    new_labels.append('cannot-fix')
-                    github_client.update_issue_labels(issue_number, new_labels)
+                        # 更新标签
+                        new_labels = [l for l in current_labels if l != 'analyzing']
+                        new_labels.append('cannot-fix')
+                        github_client.update_issue_labels(issue_number, new_labels)
 
-                # 记录已处理
-                processed[issue_key] = fingerprint
-                save_processed_issues(processed)
+                    # 记录已处理
+                    processed[issue_key] = fingerprint
+                    save_processed_issues({issue_key: fingerprint})
 
-                logger.info(f"✅ Successfully processed issue #{issue_number}")
+                    logger.info(f"✅ Successfully processed issue #{issue_number}")
 
-            except Exception as e:
-                logger.error(f"Error analyzing issue #{issue_number}: {e}")
+                except Exception as e:
+                    logger.error(f"Error analyzing issue #{issue_number}: {e}")
+                    had_failures = True
 
-                # 发布错误评论
-                try:
-                    error_comment = f"""❌ Oops! I encountered an error while processing this issue:
+                    # 发布错误评论
+                    try:
+                        error_comment = f"""❌ Oops! I encountered an error while processing this issue:
 
 ```
 {str(e)}
@@ -267,13 +345,26 @@ The team has been notified and will look into this.
 
 🤖 *Powered by [GitIssue AI Agent](https://github.com/{repo_owner}/{repo_name})*
 """
-                    github_client.add_comment(issue_number, error_comment)
-                except:
-                    pass
+                        github_client.add_comment(issue_number, error_comment)
+                    except:
+                        pass
+            finally:
+                leases.release(issue_key)
+
+        logger.info(f"Found {found_count} open issues with 'bot' label")
+
+        # 有失败的 issue 时不推进水位线，下一轮还能重新拉到它们
+        if not had_failures:
+            watermarks.advance(repo_key, max_updated_at, full_sync=since is None)
+            watermarks.save()
 
     except Exception as e:
         logger.error(f"Error fetching issues: {e}")
 
+    logger.info(f"HTTP cache: {http_cache.get_stats()}")
+    logger.info(f"GitHub rate limit: {github_client.get_rate_limit_status()}")
+    logger.info(f"Connections: {github_client.session.get_connection_metrics()}")
+
 
 if __name__ == "__main__":
     logger.info("=" * 60)
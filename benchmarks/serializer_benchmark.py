@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+状态文件序列化基准测试
+比较标准库 json（indent=2，记录为字典）、core.serializer 当前后端（记录为字典，StateManager 的默认方式）
+和 core.serializer 当前后端（记录为 ProcessedIssue，即 state_records.compact）
+在不同记录数下保存/加载状态文件的耗时、文件大小和加载后占用的内存，
+以及 StateManager 两种记录方式下完整加载状态文件的耗时（应不慢于标准库 json 加载）
+
+用法: python benchmarks/serializer_benchmark.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import serializer
+from core.state import StateManager
+
+
+STATUSES = ("completed", "waiting_for_info", "in_progress", "failed", "skipped")
+
+
+def make_state(count):
+    """生成包含 count 条处理记录的状态"""
+    start = datetime(2024, 1, 1)
+    issues = {}
+    for i in range(count):
+        record = {
+            "status": STATUSES[i % len(STATUSES)],
+            "processed_at": (start + timedelta(seconds=i)).isoformat(),
+            "action": "skip" if i % 3 else "need_info",
+            "reason": "问题描述不完整" if i % 2 else "not a bug"
+        }
+        if i % 4 == 0:
+            record["comment"] = {"$blob": f"{i:064x}", "size": 2048}
+        issues[f"group{i % 300}/project#{i}"] = record
+    return {
+        "processed_issues": issues,
+        "last_run": start.isoformat(),
+        "statistics": {"total": count},
+        "rollups": {}
+    }
+
+
+def stdlib_save(path, state):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+def stdlib_load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fast_save(path, state):
+    serializer.dump_file(path, state)
+
+
+def fast_load(path):
+    return serializer.load_file(path)
+
+
+def typed_state(state):
+    return {**state, "processed_issues": serializer.decode_issues(state["processed_issues"], compact=True)}
+
+
+def typed_load(path):
+    return typed_state(serializer.load_file(path))
+
+
+def manager_load(path, compact_records):
+    return StateManager(path, compact_records=compact_records).state
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def record_memory(load, path):
+    """加载后处理记录占用的内存（字节/条）"""
+    tracemalloc.start()
+    state = load(path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / max(1, len(state["processed_issues"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='状态文件序列化基准测试')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='记录数 (逗号分隔)')
+    args = parser.parse_args()
+
+    variants = [
+        ("json indent=2 / dict", None, stdlib_save, stdlib_load),
+        (f"{serializer.BACKEND} / dict", None, fast_save, fast_load),
+        (f"{serializer.BACKEND} / ProcessedIssue", typed_state, fast_save, typed_load),
+        ("StateManager / dict", None, fast_save, lambda path: manager_load(path, False)),
+        ("StateManager / compact", None, fast_save, lambda path: manager_load(path, True)),
+    ]
+
+    print(f"serializer backend: {serializer.BACKEND}\n")
+    print(f"{'records':>9}  {'variant':<28} {'save s':>8} {'load s':>8} {'size MB':>8} {'B/record':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in (int(size) for size in args.sizes.split(',')):
+            state = make_state(count)
+            for name, prepare, save, load in variants:
+                path = os.path.join(tmp_dir, "state.json")
+                save_time, _ = timed(save, path, prepare(state) if prepare else state)
+                load_time, _ = timed(load, path)
+                size = os.path.getsize(path) / 1024 / 1024
+                # tracemalloc 很慢，只在较小的规模上测内存
+                memory = f"{record_memory(load, path):9.0f}" if count <= 100000 else f"{'-':>9}"
+                print(f"{count:>9}  {name:<28} {save_time:8.3f} {load_time:8.3f} {size:8.1f} {memory}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
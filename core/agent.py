@@ -4,8 +4,15 @@ Issue Agent 核心逻辑
 """
 
 import logging
-from typing import Dict, List
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+from .blobstore import BlobStore
+from .budget import RunBudget
+from .checkpoint import RunCheckpoint
 from .gitlab import GitLabClient
+from .log_buffer import IssueLogBuffer
+from .scheduler import FairScheduler, FifoScheduler
 from .state import StateManager
 from providers.base import AIProvider
 
@@ -13,6 +20,34 @@ from providers.base import AIProvider
 logger = logging.getLogger(__name__)
 
 
+def empty_results() -> Dict:
+    """空的处理结果统计"""
+    return {
+        "total": 0,
+        "completed": 0,
+        "waiting_for_info": 0,
+        "in_progress": 0,
+        "skipped": 0,
+        "failed": 0,
+        "deferred": 0
+    }
+
+
+def count_result(results: Dict, result: Optional[str]):
+    """
+    把单个 issue 的处理结果计入统计
+
+    Args:
+        results: 处理结果统计（原地更新）
+        result: 处理结果状态；issue 已处理或正由其他 worker 处理时为 None
+    """
+    if result is None:
+        return
+    results["total"] += 1
+    if result:
+        results[result] += 1
+
+
 class IssueAgent:
     """Issue 处理 Agent"""
 
@@ -20,7 +55,12 @@ class IssueAgent:
         self,
         gitlab_client: GitLabClient,
         ai_provider: AIProvider,
-        state_manager: StateManager
+        state_manager: StateManager,
+        blob_store: Optional[BlobStore] = None,
+        max_workers: int = 1,
+        scheduler: Optional[FairScheduler] = None,
+        budget: Optional[RunBudget] = None,
+        checkpoint: Optional[RunCheckpoint] = None
     ):
         """
         初始化 Agent
@@ -29,66 +69,317 @@ class IssueAgent:
             gitlab_client: GitLab 客户端
             ai_provider: AI Provider
             state_manager: 状态管理器
+            blob_store: 存放修复指令、评论等长文本的存储（可选，不设置时直接写入状态）
+            max_workers: 同时处理的 issues 数（大于 1 时使用线程池并发处理）
+            scheduler: 按项目公平调度的调度器（可选，不设置时按 API 返回顺序处理）
+            budget: 单次运行的时间和成本预算（可选，快用完时不再开始新的 issue）
+            checkpoint: 运行检查点（可选，中断后下次运行复用已有的 AI 决策、补记已完成的 issues）
         """
         self.gitlab = gitlab_client
         self.ai = ai_provider
         self.state = state_manager
+        self.blobs = blob_store
+        self.max_workers = max(1, max_workers)
+        self.scheduler = scheduler
+        self.budget = budget
+        self.checkpoint = checkpoint
+
+    def _payload(self, **fields) -> Dict:
+        """要写入状态的字段，配置了 blob_store 时长文本换成引用"""
+        if self.blobs is None:
+            return fields
+        return self.blobs.pack(**fields)
 
     def process_all_issues(
         self,
         username: str,
-        labels: List[str] = None
+        labels: List[str] = None,
+        updated_after: str = None
     ) -> Dict:
         """
         处理所有分配给用户的 issues
 
+        issues 按页流式获取，边取边处理，不会先把全部 issues 读进内存。
+        max_workers 大于 1 时多个 issue 并发处理，每个 issue 的日志在处理完后连续输出。
+        设置了 scheduler 时先列出全部新 issues，再按优先级和项目轮转的顺序处理。
+        设置了 budget 时上次运行延期的 issues 最先处理，其余按创建时间从旧到新；
+        预算快用完时不再开始新的 issue，等正在处理的完成后返回，没处理的记为延期（results["deferred"]）。
+        设置了 checkpoint 时，上次运行中断后从检查点恢复，运行正常结束后删除检查点。
+
         Args:
             username: GitLab 用户名
             labels: 过滤标签
+            updated_after: 只处理在此时间（ISO 8601）之后更新过的 issues
 
         Returns:
             处理结果统计
         """
         logger.info(f"🔍 获取分配给 @{username} 的 issues...")
 
-        # 获取所有 issues
-        issues = self.gitlab.get_assigned_issues(username, labels)
-        logger.info(f"📋 找到 {len(issues)} 个 issues")
+        # 处理结果统计
+        results = empty_results()
+        self.start_run()
+
+        issues = self.gitlab.iter_assigned_issues(username, labels, updated_after=updated_after)
+        if self.scheduler is not None or self.budget is not None:
+            found_count = self._process_scheduled(issues, results)
+        elif self.max_workers > 1:
+            found_count = self._process_concurrently(issues, results)
+        else:
+            found_count = 0
+            for issue in issues:
+                found_count += 1
+                count_result(results, self._process_if_new(issue))
+
+        logger.info(f"📋 找到 {found_count} 个 issues，其中 {results['total']} 个是新 issues\n")
+
+        self.finish_run()
+        return results
+
+    def start_run(self):
+        """
+        开始一轮处理：预算开始计时；从检查点恢复时，
+        补记上次已经处理完、但状态还没写盘的 issues（避免重复发评论）
+        """
+        if self.budget is not None:
+            self.budget.start()
+
+        if self.checkpoint is None or not self.checkpoint.begin():
+            return
+
+        recovered = 0
+        for entry in self.checkpoint.units().values():
+            if entry["status"] != "done" or self.state.is_processed(entry["project"], entry["iid"]):
+                continue
+            self.state.mark_processed(
+                entry["project"], entry["iid"],
+                status=entry["result"],
+                action=entry.get("action"),
+                reason="recovered from checkpoint"
+            )
+            recovered += 1
+        if recovered:
+            logger.info(f"♻️  从检查点补记 {recovered} 个已处理的 issues")
+
+    def finish_run(self):
+        """结束一轮处理：把状态变化写盘，再删除检查点（两步之间中断时，下次运行仍会恢复）"""
+        # 延迟写入模式下，把本轮的状态变化一次写盘
+        self.state.flush()
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+
+    def _process_concurrently(self, issues: Iterable[Dict], results: Dict) -> int:
+        """
+        用线程池并发处理 issues
+
+        提交是有界的：在途任务达到 2 * max_workers 时先等待完成，不会一次性排入所有 issues。
+        结果只在当前线程中汇总，不需要加锁。
+
+        Args:
+            issues: issues 迭代器
+            results: 处理结果统计（原地更新）
+
+        Returns:
+            找到的 issues 数
+        """
+        found_count = 0
+        pending = set()
+
+        with IssueLogBuffer() as logs, ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="issue-worker"
+        ) as pool:
+            for issue in issues:
+                found_count += 1
+                if len(pending) >= self.max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        count_result(results, future.result())
+
+                pending.add(pool.submit(self._process_grouped, logs, issue))
+
+            for future in wait(pending).done:
+                count_result(results, future.result())
+
+        return found_count
+
+    def _process_scheduled(self, issues: Iterable[Dict], results: Dict) -> int:
+        """
+        按调度器的顺序处理 issues
 
-        # 过滤未处理的 issues
+        先把所有新 issues 交给调度器，再按调度顺序处理；并发处理时，
+        项目或主机达到并发上限后，调度器会先安排其他项目的 issues。
+        设置了 budget 时，预算快用完后不再取新的 issue，剩下的记为延期。
+
+        Args:
+            issues: issues 迭代器
+            results: 处理结果统计（原地更新）
+
+        Returns:
+            找到的 issues 数
+        """
+        found_count = 0
         new_issues = []
         for issue in issues:
+            found_count += 1
             project_path = issue['references']['full'].split('#')[0]
-            if not self.state.is_processed(project_path, issue['iid']):
-                new_issues.append(issue)
-
-        logger.info(f"🆕 其中 {len(new_issues)} 个是新 issues\n")
-
-        # 处理结果统计
-        results = {
-            "total": len(new_issues),
-            "completed": 0,
-            "waiting_for_info": 0,
-            "in_progress": 0,
-            "skipped": 0,
-            "failed": 0
-        }
-
-        # 处理每个 issue
-        for issue in new_issues:
             try:
-                result = self.process_single_issue(issue)
-                if result:
-                    results[result] += 1
+                if self.state.is_processed(project_path, issue['iid']):
+                    continue
             except Exception as e:
-                logger.error(f"❌ 处理 issue 失败: {e}")
-                results["failed"] += 1
+                # 交给 _process_if_new 重新检查，出错时只影响这个 issue
+                logger.warning(f"⚠️  查询 {issue['references']['full']} 的处理状态失败: {e}")
+            new_issues.append(issue)
+
+        scheduler = self.schedule_issues(new_issues)
+
+        if self.max_workers <= 1:
+            while len(scheduler) and self._can_start(0):
+                issue = scheduler.next()
+                if issue is None:
+                    break
+                try:
+                    count_result(results, self._process_if_new(issue))
+                finally:
+                    scheduler.done(issue)
+        else:
+            running = {}
+            with IssueLogBuffer() as logs, ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="issue-worker"
+            ) as pool:
+                while len(scheduler) or running:
+                    while len(scheduler) and len(running) < self.max_workers:
+                        # 预计超出预算时先不开始新的 issue，等有 issue 处理完再按新的平均用量检查
+                        if not self._can_start(len(running)):
+                            break
+                        issue = scheduler.next()
+                        if issue is None:
+                            break
+                        running[pool.submit(self._process_grouped, logs, issue)] = issue
+
+                    # 没有正在处理的 issue 时预算仍不允许开始新的，剩下的延期
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        scheduler.done(running.pop(future))
+                        count_result(results, future.result())
+
+        if self.budget is not None:
+            self.defer_issues(scheduler.drain(), results)
+        return found_count
+
+    def schedule_issues(self, issues: List[Dict]):
+        """
+        把新 issues 交给调度器
 
-        return results
+        没有设置 scheduler 时按加入顺序处理。设置了 budget 时，
+        上次延期的 issues 排在最前，其余按创建时间从旧到新加入。
+
+        Args:
+            issues: 尚未处理的 issues
+
+        Returns:
+            调度器（FairScheduler 或 FifoScheduler）
+        """
+        scheduler = self.scheduler if self.scheduler is not None else FifoScheduler()
+
+        if self.budget is None:
+            for issue in issues:
+                scheduler.add(issue)
+        else:
+            deferred = set(self.state.get_deferred())
+            issues = sorted(issues, key=lambda issue: (
+                self._issue_key(issue) not in deferred, issue.get('created_at') or ''
+            ))
+            for issue in issues:
+                scheduler.add(issue, -1 if self._issue_key(issue) in deferred else None)
+
+        logger.info(f"🗂️  {len(scheduler)} 个新 issues 按调度顺序处理")
+        return scheduler
+
+    def _can_start(self, in_flight: int) -> bool:
+        """预算是否还允许开始新的 issue（没有设置预算时总是允许）"""
+        return self.budget is None or self.budget.can_start(in_flight)
+
+    def _issue_key(self, issue: Dict) -> str:
+        project_path = issue['references']['full'].split('#')[0]
+        return self.state.get_issue_key(project_path, issue['iid'])
+
+    def defer_issues(self, issues: List[Dict], results: Dict):
+        """
+        记录因预算用完没有处理的 issues，下次运行时最先处理
+
+        Args:
+            issues: 没有处理的 issues
+            results: 处理结果统计（原地更新）
+        """
+        self.state.set_deferred([self._issue_key(issue) for issue in issues])
+        results["deferred"] = len(issues)
+
+        usage = self.budget.get_usage()
+        if issues:
+            logger.warning(
+                f"⏳ 预算已用完（{usage['stop_reason']}），{len(issues)} 个 issues 延期到下次运行"
+            )
+        logger.info(
+            f"💰 本次用时 {usage['seconds']}s，AI 调用 {usage['ai_calls']} 次，"
+            f"{usage['tokens']} tokens"
+        )
+
+    def _process_grouped(self, logs: IssueLogBuffer, issue: Dict) -> Optional[str]:
+        """在 worker 线程中处理 issue，日志在处理完后连续输出"""
+        with logs.group():
+            return self._process_if_new(issue)
+
+    def _process_if_new(self, issue: Dict) -> Optional[str]:
+        """
+        处理尚未处理的 issue：认领 → 复查 → 处理 → 释放
+
+        单个 issue 出错（包括查询状态、认领时的错误，如 SQLite 的 database is locked）
+        只记为 failed，不影响其他 issues。
+
+        Args:
+            issue: Issue 信息
+
+        Returns:
+            处理结果状态；issue 已处理或正由其他 worker 处理时为 None
+        """
+        project_path = issue['references']['full'].split('#')[0]
+        claimed = False
+        try:
+            # 跳过已处理的 issues
+            if self.state.is_processed(project_path, issue['iid']):
+                return None
+
+            # 其他 worker 正在处理时跳过，避免重复调用 AI
+            if not self.state.claim_issue(project_path, issue['iid']):
+                logger.info(f"⏭️  {issue['references']['full']} 正由其他 worker 处理，跳过")
+                return None
+            claimed = True
+
+            # 认领之前其他 worker 可能刚处理完
+            if self.state.is_processed(project_path, issue['iid']):
+                return None
+            started = time.monotonic()
+            try:
+                return self.process_single_issue(issue)
+            finally:
+                if self.budget is not None:
+                    self.budget.record_issue(issue['references']['full'], time.monotonic() - started)
+        except Exception as e:
+            logger.error(f"❌ 处理 issue 失败: {e}")
+            return "failed"
+        finally:
+            if claimed:
+                try:
+                    self.state.release_issue(project_path, issue['iid'])
+                except Exception as e:
+                    # 租约到期后会自动失效
+                    logger.error(f"❌ 释放 issue 租约失败: {e}")
 
     def process_single_issue(self, issue: Dict) -> str:
         """
-        处理单个 issue
+        处理单个 issue：获取项目信息 → AI 分析 → 执行决策
 
         Args:
             issue: Issue 信息
@@ -96,9 +387,24 @@ class IssueAgent:
         Returns:
             处理结果状态
         """
-        # 提取项目路径
+        project_info = self.fetch_issue_context(issue)
+        if project_info is None:
+            return "failed"
+
+        decision = self.analyze(issue, project_info)
+        return self.act(issue, project_info, decision)
+
+    def fetch_issue_context(self, issue: Dict) -> Optional[Dict]:
+        """
+        获取分析 issue 需要的项目信息
+
+        Args:
+            issue: Issue 信息
+
+        Returns:
+            项目信息；获取失败时为 None（已记为 failed）
+        """
         project_path = issue['references']['full'].split('#')[0]
-        issue_iid = issue['iid']
 
         logger.info(f"\n{'='*60}")
         logger.info(f"📌 处理 Issue: {issue['references']['full']}")
@@ -106,42 +412,111 @@ class IssueAgent:
         logger.info(f"👤 作者: @{issue['author']['username']}")
         logger.info(f"{'='*60}\n")
 
-        # 获取项目信息
         try:
-            project_info = self.gitlab.get_project_info(issue['project_id'])
+            return self.gitlab.get_project_info(issue['project_id'])
         except Exception as e:
             logger.error(f"❌ 获取项目信息失败: {e}")
             self.state.mark_processed(
-                project_path, issue_iid,
+                project_path, issue['iid'],
                 status="failed",
                 error=str(e)
             )
-            return "failed"
+            return None
 
-        # AI 分析 issue
-        logger.info("🤔 AI 正在分析...")
-        decision = self.ai.analyze_issue(issue, project_info)
+    def analyze(self, issue: Dict, project_info: Dict) -> Dict:
+        """
+        AI 分析 issue
 
-        action = decision.get("action", "skip")
-        reason = decision.get("reason", "未知原因")
+        Args:
+            issue: Issue 信息
+            project_info: 项目信息
 
-        logger.info(f"💡 决策: {action}")
-        logger.info(f"📝 原因: {reason}\n")
+        Returns:
+            AI 决策
+        """
+        key = issue['references']['full']
+
+        # 中断前已经拿到的决策直接复用，不再调用 AI
+        if self.checkpoint is not None:
+            entry = self.checkpoint.get(key)
+            if entry is not None and entry["status"] == "analyzed":
+                logger.info(f"♻️  {key} 复用检查点中的 AI 决策")
+                return entry["decision"]
+
+        logger.info(f"🤔 AI 正在分析 {key}...")
+        decision = self._call_ai(issue, self.ai.analyze_issue, issue, project_info, min_calls=1)
+        if self.checkpoint is not None:
+            self.checkpoint.record(key, "analyzed", decision=decision)
+
+        logger.info(f"💡 决策: {decision.get('action', 'skip')}")
+        logger.info(f"📝 原因: {decision.get('reason', '未知原因')}\n")
+        return decision
+
+    def _call_ai(self, issue: Dict, method, *args, min_calls: int = 0):
+        """
+        调用 AI Provider 的方法，设置了 budget 时把这次调用的用量计入 issue
+
+        用量取自 provider 在当前线程的累计用量，并发处理时不会算到其他 issue 上。
+
+        Args:
+            issue: Issue 信息
+            method: AI Provider 的方法
+            *args: 方法参数
+            min_calls: 至少计入的调用次数（provider 不统计用量时使用）
+
+        Returns:
+            方法的返回值
+        """
+        if self.budget is None:
+            return method(*args)
+
+        before = self.ai.get_thread_usage()
+        try:
+            return method(*args)
+        finally:
+            after = self.ai.get_thread_usage()
+            self.budget.record_ai_call(
+                issue['references']['full'],
+                calls=max(after["calls"] - before["calls"], min_calls),
+                tokens=(after["input_tokens"] + after["output_tokens"]
+                        - before["input_tokens"] - before["output_tokens"])
+            )
+
+    def act(self, issue: Dict, project_info: Dict, decision: Dict) -> str:
+        """
+        根据 AI 决策执行操作
+
+        Args:
+            issue: Issue 信息
+            project_info: 项目信息
+            decision: AI 决策
+
+        Returns:
+            处理结果状态
+        """
+        project_path = issue['references']['full'].split('#')[0]
+        action = decision.get("action", "skip")
 
-        # 根据决策执行操作
         if action == "need_info":
-            return self._handle_need_info(issue, project_path, project_info, decision)
+            result = self._handle_need_info(issue, project_path, project_info, decision)
 
         elif action == "can_handle":
-            return self._handle_can_handle(issue, project_path, project_info, decision)
+            result = self._handle_can_handle(issue, project_path, project_info, decision)
 
         elif action == "skip":
-            return self._handle_skip(issue, project_path, decision)
+            result = self._handle_skip(issue, project_path, decision)
 
         else:
             logger.warning(f"⚠️  未知的 action: {action}")
             return "skipped"
 
+        if self.checkpoint is not None:
+            self.checkpoint.record(
+                issue['references']['full'], "done",
+                project=project_path, iid=issue['iid'], result=result, action=action
+            )
+        return result
+
     def _handle_need_info(
         self,
         issue: Dict,
@@ -169,8 +544,9 @@ class IssueAgent:
             self.state.mark_processed(
                 project_path, issue['iid'],
                 status="waiting_for_info",
-                comment=comment,
-                questions=questions
+                action="need_info",
+                questions=questions,
+                **self._payload(comment=comment)
             )
             return "waiting_for_info"
 
@@ -179,6 +555,7 @@ class IssueAgent:
             self.state.mark_processed(
                 project_path, issue['iid'],
                 status="failed",
+                action="need_info",
                 error=str(e)
             )
             return "failed"
@@ -196,7 +573,7 @@ class IssueAgent:
         logger.info(f"📋 处理计划:\n{plan}\n")
 
         # 生成详细的修复指令
-        instructions = self.ai.generate_fix_instructions(issue, project_info, plan)
+        instructions = self._call_ai(issue, self.ai.generate_fix_instructions, issue, project_info, plan)
 
         logger.info("🔧 生成的修复指令：")
         logger.info("="*60)
@@ -207,8 +584,8 @@ class IssueAgent:
         self.state.mark_processed(
             project_path, issue['iid'],
             status="in_progress",
-            plan=plan,
-            instructions=instructions
+            action="can_handle",
+            **self._payload(plan=plan, instructions=instructions)
         )
 
         logger.info("\n⚠️  需要手动执行上述操作，或集成到 CI/CD")
@@ -230,6 +607,7 @@ class IssueAgent:
         self.state.mark_processed(
             project_path, issue['iid'],
             status="skipped",
+            action="skip",
             reason=reason
         )
 
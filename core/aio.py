@@ -0,0 +1,80 @@
+"""
+GitLab 客户端的异步版本
+在线程池中调用同步客户端的方法，复用同步客户端的连接池、重试、限速和 HTTP 缓存，
+供 asyncio 流水线在等待网络时继续处理其他 issue
+"""
+
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from .gitlab import GitLabClient
+
+
+_END = object()
+
+
+async def aiter_blocking(iterator: Iterator) -> AsyncIterator:
+    """
+    逐个产出同步迭代器的元素，每次 next() 都在线程池中执行（分页请求不会阻塞事件循环）
+
+    Args:
+        iterator: 同步迭代器
+
+    Yields:
+        迭代器的元素
+    """
+    while True:
+        item = await asyncio.to_thread(next, iterator, _END)
+        if item is _END:
+            return
+        yield item
+
+
+class AsyncClient:
+    """把同步客户端的公开方法包装为协程"""
+
+    def __init__(self, client):
+        """
+        初始化
+
+        Args:
+            client: 同步客户端
+        """
+        self.sync = client
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.sync, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+
+class AsyncGitLabClient(AsyncClient):
+    """GitLabClient 的异步版本（get_project_info、add_comment 等方法返回协程）"""
+
+    def __init__(self, client: GitLabClient):
+        super().__init__(client)
+
+    async def iter_assigned_issues(
+        self,
+        username: str,
+        labels: Optional[List[str]] = None,
+        state: str = "opened",
+        updated_after: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        异步逐个产出分配给用户的 issues（参数同 GitLabClient.iter_assigned_issues）
+
+        Yields:
+            issue 字典
+        """
+        issues = self.sync.iter_assigned_issues(username, labels, state, updated_after)
+        async for issue in aiter_blocking(issues):
+            yield issue
+
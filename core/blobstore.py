@@ -0,0 +1,156 @@
+"""
+内容寻址的压缩存储
+修复指令、评论等较大的文本不直接写进状态文件，而是按内容的 SHA-256 保存为压缩文件，
+状态里只保留引用；相同内容只存一份，需要查看历史时再按引用读取
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from typing import Dict, Optional
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，没有安装时使用 zlib
+    zstandard = None
+
+
+# 状态记录中表示引用的键
+REF_KEY = "$blob"
+
+
+class BlobStore:
+    """按内容哈希存储的压缩文本（zstd 可用时使用 zstd，否则使用 zlib）"""
+
+    def __init__(self, root: str = "logs/blobs", min_size: int = 512):
+        """
+        初始化存储
+
+        Args:
+            root: 存储目录
+            min_size: 文本长度（UTF-8 字节）达到这个值才放进存储，短文本仍直接保存在状态里
+        """
+        self.root = root
+        self.min_size = min_size
+
+    def _path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.{ext}")
+
+    def put(self, text: str) -> str:
+        """
+        保存文本
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            内容的 SHA-256（即引用）
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+
+        # 相同内容已经存过（不管用哪种压缩）就不再写
+        if os.path.exists(self._path(digest, "zst")) or os.path.exists(self._path(digest, "z")):
+            return digest
+
+        if zstandard:
+            path = self._path(digest, "zst")
+            compressed = zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            path = self._path(digest, "z")
+            compressed = zlib.compress(data, 9)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+
+        return digest
+
+    def get(self, digest: str) -> str:
+        """
+        读取文本
+
+        Args:
+            digest: put 返回的引用
+
+        Returns:
+            文本内容
+
+        Raises:
+            KeyError: 引用不存在
+        """
+        path = self._path(digest, "zst")
+        if os.path.exists(path):
+            if not zstandard:
+                raise ImportError("Blob was compressed with zstd: pip install zstandard")
+            with open(path, 'rb') as f:
+                return zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+
+        path = self._path(digest, "z")
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+
+        raise KeyError(digest)
+
+    def pack(self, **fields) -> Dict:
+        """
+        把较长的文本字段换成引用
+
+        Args:
+            **fields: 要写入状态的字段
+
+        Returns:
+            长文本已替换为 {"$blob": 哈希, "size": 字节数} 的字段字典
+        """
+        packed = {}
+        for name, value in fields.items():
+            if isinstance(value, str) and len(value.encode("utf-8")) >= self.min_size:
+                packed[name] = {REF_KEY: self.put(value), "size": len(value.encode("utf-8"))}
+            else:
+                packed[name] = value
+        return packed
+
+    def unpack(self, record: Optional[Dict]) -> Optional[Dict]:
+        """
+        读取记录中引用的文本
+
+        Args:
+            record: 状态中的 issue 记录
+
+        Returns:
+            引用已替换为原文的新字典
+        """
+        if record is None:
+            return None
+        return {
+            name: self.get(value[REF_KEY]) if is_ref(value) else value
+            for name, value in record.items()
+        }
+
+
+def is_ref(value) -> bool:
+    """是否为 BlobStore 引用"""
+    return isinstance(value, dict) and REF_KEY in value
+
+
+def create_blob_store(config: Dict) -> Optional[BlobStore]:
+    """
+    根据配置文件的 blob_store 部分创建存储
+
+    Args:
+        config: 完整配置
+
+    Returns:
+        BlobStore；未启用时为 None
+    """
+    blob_config = config.get('blob_store') or {}
+    if not blob_config.get('enabled', False):
+        return None
+    return BlobStore(
+        root=blob_config.get('path', 'logs/blobs'),
+        min_size=int(blob_config.get('min_size', 512))
+    )
@@ -0,0 +1,186 @@
+"""
+单次运行的时间和成本预算
+cron 每次触发的运行如果拖得太久会和下一次重叠。预算限制一次运行的总时长、AI 调用次数和 token 数，
+快用完时不再开始新的 issue（已经开始的会处理完），剩下的 issues 记为延期，下次运行优先处理
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RunBudget:
+    """一次运行的预算（线程安全）"""
+
+    def __init__(
+        self,
+        max_seconds: Optional[float] = None,
+        max_ai_calls: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ):
+        """
+        初始化预算
+
+        Args:
+            max_seconds: 运行时长上限（秒），None 表示不限制
+            max_ai_calls: AI 调用次数上限，None 表示不限制
+            max_tokens: AI token 用量（输入 + 输出）上限，None 表示不限制
+        """
+        self.max_seconds = max_seconds
+        self.max_ai_calls = max_ai_calls
+        self.max_tokens = max_tokens
+
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """开始计时，清空用量"""
+        with self._lock:
+            self._started_at = time.monotonic()
+            # 全部用量（包括正在处理的 issues）
+            self._ai_calls = 0
+            self._tokens = 0
+            # 已处理完的 issues 的用量，用于估算每个 issue 的平均用量
+            self._issues_done = 0
+            self._done_seconds = 0.0
+            self._done_calls = 0
+            self._done_tokens = 0
+            # 正在处理的 issue -> [AI 调用次数, token 数]
+            self._open: Dict[str, list] = {}
+            # 实际用完的预算项（之后不再开始新的 issue）
+            self.stop_reason: Optional[str] = None
+            # 最近一次 can_start 返回 False 的原因
+            self.last_reason: Optional[str] = None
+
+    def record_ai_call(self, issue: str, calls: int = 1, tokens: int = 0):
+        """
+        记录 issue 的 AI 用量
+
+        Args:
+            issue: issue 键
+            calls: AI 调用次数
+            tokens: token 数（输入 + 输出）
+        """
+        with self._lock:
+            self._ai_calls += calls
+            self._tokens += tokens
+            usage = self._open.setdefault(issue, [0, 0])
+            usage[0] += calls
+            usage[1] += tokens
+
+    def record_issue(self, issue: str, seconds: float):
+        """
+        记录处理完一个 issue，它的用量计入平均值
+
+        Args:
+            issue: issue 键
+            seconds: 处理耗时
+        """
+        with self._lock:
+            calls, tokens = self._open.pop(issue, (0, 0))
+            self._issues_done += 1
+            self._done_seconds += seconds
+            self._done_calls += calls
+            self._done_tokens += tokens
+
+    def can_start(self, in_flight: int = 0) -> bool:
+        """
+        是否还可以开始处理一个新的 issue
+
+        预算实际用完时返回 False，并记入 stop_reason，之后一直返回 False；
+        否则按已处理完的 issues 的平均用量估算正在处理的 issues 还要用多少，
+        加上新 issue 会超出预算时返回 False（不记入 stop_reason，有 issue 处理完后可以再次检查）。
+
+        Args:
+            in_flight: 正在处理的 issues 数
+
+        Returns:
+            是否可以开始
+        """
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = self._spent()
+            reason = self.stop_reason or self._projected(in_flight)
+            self.last_reason = reason or self.last_reason
+            return reason is None
+
+    def _spent(self) -> Optional[str]:
+        """已经用完的预算项"""
+        if self.max_seconds is not None and time.monotonic() - self._started_at >= self.max_seconds:
+            return "deadline"
+        if self.max_ai_calls is not None and self._ai_calls >= self.max_ai_calls:
+            return "ai_calls"
+        if self.max_tokens is not None and self._tokens >= self.max_tokens:
+            return "tokens"
+        return None
+
+    def _projected(self, in_flight: int) -> Optional[str]:
+        """
+        正在处理的 in_flight 个 issues 和一个新 issue 都处理完之后会超出的预算项
+
+        每个 issue 按已处理完的 issues 的平均用量估算，正在处理的 issue 扣除它已经用掉的部分；
+        还没有 issue 处理完时，按每个 issue 调用一次 AI 估算。
+        """
+        done = self._issues_done
+
+        if self.max_seconds is not None:
+            # 正在处理的 issues 和新 issue 并发进行，按一个 issue 的平均耗时估算
+            per_issue = self._done_seconds / done if done else 0.0
+            if time.monotonic() - self._started_at + per_issue >= self.max_seconds:
+                return "deadline"
+
+        if self.max_ai_calls is not None:
+            per_issue = self._done_calls / done if done else 1
+            if self._ai_calls + self._remaining(per_issue, 0, in_flight) > self.max_ai_calls:
+                return "ai_calls"
+
+        if self.max_tokens is not None:
+            per_issue = self._done_tokens / done if done else 0
+            if self._tokens + self._remaining(per_issue, 1, in_flight) > self.max_tokens:
+                return "tokens"
+
+        return None
+
+    def _remaining(self, per_issue: float, field: int, in_flight: int) -> float:
+        """正在处理的 issues 和一个新 issue 预计还要用的量"""
+        remaining = sum(max(per_issue - usage[field], 0) for usage in self._open.values())
+        # 已经开始但还没有用过 AI 的 issues 不在 _open 中
+        remaining += per_issue * max(in_flight - len(self._open), 0)
+        return remaining + per_issue
+
+    def get_usage(self) -> Dict:
+        """
+        已使用的预算
+
+        Returns:
+            {"seconds": 已运行秒数, "ai_calls": AI 调用次数, "tokens": token 数,
+             "stop_reason": 停止原因（预算用完或预计会超出的预算项）}
+        """
+        with self._lock:
+            return {
+                "seconds": round(time.monotonic() - self._started_at, 1),
+                "ai_calls": self._ai_calls,
+                "tokens": self._tokens,
+                "stop_reason": self.stop_reason or self.last_reason
+            }
+
+
+def create_budget(config: Dict) -> Optional[RunBudget]:
+    """
+    根据配置文件的 budget 部分创建预算
+
+    Args:
+        config: 完整配置
+
+    Returns:
+        RunBudget；未启用时为 None
+    """
+    budget_config = config.get('budget') or {}
+    if not budget_config.get('enabled', False):
+        return None
+    max_minutes = budget_config.get('max_minutes')
+    return RunBudget(
+        max_seconds=max_minutes * 60 if max_minutes is not None else None,
+        max_ai_calls=budget_config.get('max_ai_calls'),
+        max_tokens=budget_config.get('max_tokens')
+    )
@@ -0,0 +1,198 @@
+"""
+运行进度检查点
+运行过程中每完成一个单元（仓库、issue 的某个阶段）就向检查点文件追加一行，
+进程崩溃或超时被杀后，下次运行从检查点恢复：跳过已完成的单元、复用已经拿到的 AI 决策，
+不用重新为每个 issue 调用 AI。运行正常结束时删除检查点。
+运行期间持有检查点的文件锁，与仍在进行的运行（如重叠的 cron）重叠时不恢复也不写检查点
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from .file_lock import try_file_lock
+from .serializer import decode, encode
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunCheckpoint:
+    """JSON lines 格式的运行检查点（线程安全）"""
+
+    def __init__(self, path: str, resume: bool = True, max_age: Optional[timedelta] = None):
+        """
+        初始化检查点
+
+        Args:
+            path: 检查点文件路径
+            resume: 恢复模式：上次运行没有正常结束时，从它的检查点继续；为 False 时总是重新开始
+            max_age: 检查点的最长有效期（从上次运行开始时算起），过期的检查点丢弃；None 表示不过期
+        """
+        self.path = path
+        self.resume = resume
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._lock_file = None
+        self._units: Dict[str, Dict] = {}
+        self.resumed = False
+
+    def begin(self) -> bool:
+        """
+        开始一次运行
+
+        另一个仍在进行的运行持有检查点时，本次运行不恢复、不写检查点（进度只保存在内存中），
+        以免接管对方正在处理的 issues，或删除对方还在写的文件。
+
+        Returns:
+            是否从上次没有完成的运行恢复
+        """
+        with self._lock:
+            self._units = {}
+            self.resumed = False
+
+            if self._lock_file is None:
+                self._lock_file = try_file_lock(self.path)
+            if self._lock_file is None:
+                logger.warning(f"Checkpoint {self.path} is held by another running process, "
+                               f"not resuming and not checkpointing this run")
+                return False
+
+            if self.resume and os.path.exists(self.path):
+                started_at = self._load()
+                if started_at is None:
+                    logger.warning(f"Checkpoint {self.path} is unreadable, starting over")
+                elif self.max_age is not None and datetime.now() - started_at > self.max_age:
+                    logger.info(f"Checkpoint {self.path} is older than {self.max_age}, starting over")
+                else:
+                    self.resumed = True
+
+            if self.resumed:
+                self._file = open(self.path, 'ab')
+                logger.info(f"♻️  从检查点恢复：{len(self._units)} 个单元已有进度")
+            else:
+                self._units = {}
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, 'wb')
+                self._write({"started_at": datetime.now().isoformat()})
+            return self.resumed
+
+    def _load(self) -> Optional[datetime]:
+        """
+        读取检查点文件（进程被杀时最后一行可能只写了一半，忽略）
+
+        Returns:
+            上次运行的开始时间；文件为空或损坏时为 None
+        """
+        started_at = None
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = decode(line)
+                except ValueError:
+                    break
+                if "started_at" in entry:
+                    started_at = datetime.fromisoformat(entry["started_at"])
+                else:
+                    self._units[entry["unit"]] = entry
+        return started_at
+
+    def _write(self, entry: Dict):
+        self._file.write(encode(entry) + b'\n')
+        self._file.flush()
+
+    def get(self, unit: str) -> Optional[Dict]:
+        """
+        单元最近一次记录的进度
+
+        Args:
+            unit: 单元标识（如 "owner/repo" 或 "group/project#123"）
+
+        Returns:
+            {"unit", "status", "at", ...附加数据}；没有记录时为 None
+        """
+        with self._lock:
+            return self._units.get(unit)
+
+    def status(self, unit: str) -> Optional[str]:
+        """
+        单元最近一次记录的状态
+
+        Args:
+            unit: 单元标识
+
+        Returns:
+            状态；没有记录时为 None
+        """
+        entry = self.get(unit)
+        return entry["status"] if entry else None
+
+    def is_done(self, unit: str) -> bool:
+        """单元是否已完成"""
+        return self.status(unit) == "done"
+
+    def record(self, unit: str, status: str, **data):
+        """
+        记录单元进度（立即追加到文件）
+
+        Args:
+            unit: 单元标识
+            status: 状态（如 "started"、"analyzed"、"done"）
+            **data: 恢复时需要的附加数据（如 AI 决策）
+        """
+        entry = {"unit": unit, "status": status, "at": datetime.now().isoformat(), **data}
+        with self._lock:
+            self._units[unit] = entry
+            if self._file is not None:
+                self._write(entry)
+
+    def units(self) -> Dict[str, Dict]:
+        """
+        所有单元的最近进度
+
+        Returns:
+            {单元标识: 进度记录}
+        """
+        with self._lock:
+            return dict(self._units)
+
+    def finish(self):
+        """运行正常结束：删除检查点并释放文件锁（没有持有锁时不删除，检查点属于另一个运行）"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                self._lock_file.close()
+                self._lock_file = None
+            self._units = {}
+
+
+def create_checkpoint(config: Dict, resume: Optional[bool] = None) -> Optional[RunCheckpoint]:
+    """
+    根据配置文件的 checkpoint 部分创建检查点
+
+    Args:
+        config: 完整配置
+        resume: 命令行指定的恢复模式（None 时使用配置）
+
+    Returns:
+        RunCheckpoint；未启用时为 None
+    """
+    checkpoint_config = config.get('checkpoint') or {}
+    if not checkpoint_config.get('enabled', False):
+        return None
+    max_age_hours = checkpoint_config.get('max_age_hours')
+    return RunCheckpoint(
+        checkpoint_config.get('file', 'logs/checkpoint.jsonl'),
+        resume=checkpoint_config.get('resume', True) if resume is None else resume,
+        max_age=timedelta(hours=max_age_hours) if max_age_hours is not None else None
+    )
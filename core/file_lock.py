@@ -0,0 +1,113 @@
+"""
+JSON 文件的跨进程更新
+多个进程共用同一个 JSON 状态文件时，在咨询锁（flock）保护下
+“重新读取 - 合并本进程的修改 - 原子替换”，不会互相覆盖对方写入的条目
+"""
+
+import os
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, Optional
+
+from .serializer import dump_file, load_file
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 flock，退化为不加锁
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    在 path + '.lock' 上持有排他锁
+
+    Args:
+        path: 被保护的文件路径
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(f"{path}.lock", 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def try_file_lock(path: str) -> Optional[IO]:
+    """
+    不等待地获取 path + '.lock' 上的排他锁（用于在整个运行期间持有）
+
+    进程退出（包括被杀）时锁自动释放。
+
+    Args:
+        path: 被保护的文件路径
+
+    Returns:
+        持有锁的文件对象，关闭即释放锁；锁被其他进程持有时为 None
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    lock_file = open(f"{path}.lock", 'a')
+    if fcntl:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+    return lock_file
+
+
+def load_json(path: str) -> Dict:
+    """
+    读取 JSON 字典文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        文件内容；文件不存在或内容损坏时为空字典
+    """
+    if os.path.exists(path):
+        try:
+            return load_file(path)
+        except (OSError, ValueError):
+            return {}
+    return {}
+
+
+def write_json_atomic(path: str, data: Dict, pretty: bool = False):
+    """
+    先写临时文件再替换，写到一半被中断也不会损坏原文件
+
+    Args:
+        path: 文件路径
+        data: 要写入的内容
+        pretty: 是否缩进（默认写入紧凑 JSON）
+    """
+    dump_file(path, data, pretty)
+
+
+def update_json_file(path: str, updates: Dict, pretty: bool = False) -> Dict:
+    """
+    在文件锁保护下，把 updates 合并进 JSON 字典文件
+
+    Args:
+        path: 文件路径
+        updates: 本进程修改的条目
+        pretty: 是否缩进（默认写入紧凑 JSON）
+
+    Returns:
+        合并后的完整内容（包含其他进程写入的条目）
+    """
+    with file_lock(path):
+        data = load_json(path)
+        data.update(updates)
+        write_json_atomic(path, data, pretty)
+    return data
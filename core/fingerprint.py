@@ -0,0 +1,80 @@
+"""
+Issue 状态指纹
+用固定长度的摘要记录 issue 上次被处理时的样子（标题/描述摘要、评论数、最新评论 ID、标签），
+判断 issue 是否有新变化，状态文件里不再保存 issue 全文
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Union
+
+
+def _digest(*parts: str) -> str:
+    """多个字符串的 128 位摘要（十六进制）"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def _labels(issue: Dict) -> List[str]:
+    return sorted(label["name"] for label in issue.get("labels", []))
+
+
+def make_fingerprint(issue: Dict, comments: Optional[List[Dict]] = None) -> Dict:
+    """
+    生成 issue 指纹
+
+    Args:
+        issue: GitHub issue（REST 结构，comments 字段为评论总数）
+        comments: 已获取的评论列表（按时间升序，可选；没有时不记录最新评论 ID）
+
+    Returns:
+        指纹记录
+    """
+    return {
+        "digest": _digest(issue["title"] or "", issue["body"] or ""),
+        "comments": issue["comments"],
+        "last_comment_id": comments[-1]["id"] if comments else None,
+        "labels": _labels(issue)
+    }
+
+
+def legacy_fingerprint(issue: Dict) -> str:
+    """旧版状态文件中保存的全文指纹"""
+    return f"{issue['title']}_{issue['body']}_{issue['comments']}_{','.join(_labels(issue))}"
+
+
+def is_legacy(stored: Union[str, Dict, None]) -> bool:
+    """是否为需要迁移的旧版全文指纹"""
+    return isinstance(stored, str)
+
+
+def fingerprint_matches(stored: Union[str, Dict, None], issue: Dict, fingerprint: Dict) -> bool:
+    """
+    判断 issue 自上次处理以来是否没有变化
+
+    旧版全文指纹按旧规则比较，调用方在匹配后用新指纹替换即可完成迁移。
+    最新评论 ID 只在两边都已知时参与比较（REST 列表接口不带评论，先按评论数判断）。
+
+    Args:
+        stored: 状态文件中保存的指纹
+        issue: 当前的 issue
+        fingerprint: 当前 issue 的指纹（make_fingerprint 的结果）
+
+    Returns:
+        是否没有变化
+    """
+    if stored is None:
+        return False
+    if is_legacy(stored):
+        return stored == legacy_fingerprint(issue)
+
+    if (stored.get("digest") != fingerprint["digest"]
+            or stored.get("comments") != fingerprint["comments"]
+            or stored.get("labels") != fingerprint["labels"]):
+        return False
+
+    stored_last = stored.get("last_comment_id")
+    current_last = fingerprint["last_comment_id"]
+    return stored_last is None or current_last is None or stored_last == current_last
@@ -3,44 +3,195 @@ GitHub API 客户端
 负责所有与 GitHub 的交互
 """
 
+import logging
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Union
+from .http_cache import HTTPCache
+from .ratelimit import RateLimiter
+from .token_pool import TokenPool
+from .github_app import GitHubAppAuth
+from .transport import create_session, SERVER_ERROR_STATUSES
+
+
+logger = logging.getLogger(__name__)
 
 
 class GitHubClient:
     """GitHub API 客户端"""
 
-    def __init__(self, token: str, repo_owner: str = None, repo_name: str = None):
+    # GitHub 列表接口允许的最大分页大小
+    MAX_PER_PAGE = 100
+
+    def __init__(
+        self,
+        token: Union[str, List[str]],
+        repo_owner: str = None,
+        repo_name: str = None,
+        per_page: int = MAX_PER_PAGE,
+        cache: Optional[HTTPCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 3,
+        app_auth: Optional[GitHubAppAuth] = None,
+        session: Optional[requests.Session] = None
+    ):
         """
         初始化 GitHub 客户端
 
         Args:
-            token: Personal Access Token
+            token: Personal Access Token，或多个 token 组成的列表（按剩余配额轮换使用）；
+                   使用 app_auth 时可以为 None
             repo_owner: 仓库所有者（可选，用于特定仓库操作）
             repo_name: 仓库名称（可选，用于特定仓库操作）
+            per_page: 列表接口每页条数（最大 100）
+            cache: HTTP 条件请求缓存（可选）
+            rate_limiter: 单 token 时使用的速率限制调度器（可在多个客户端间共享，默认新建）
+            max_retries: 触发速率限制后的最大重试次数
+            app_auth: GitHub App 认证（设置后按仓库 owner 使用各自的 installation token）
+            session: 自定义 Session（默认由 create_session 创建；传入时忽略 cache）
         """
+        if token is None:
+            tokens = []
+        elif isinstance(token, str):
+            tokens = [token]
+        else:
+            tokens = list(token)
+
         self.base_url = "https://api.github.com"
-        self.token = token
+        self.token = tokens[0] if tokens else None
         self.repo_owner = repo_owner
         self.repo_name = repo_name
+        self.per_page = min(per_page, self.MAX_PER_PAGE)
         self.headers = {
-            "Authorization": f"Bearer {token}",
             "Accept": "application/vnd.github+json",
             "X-GitHub-Api-Version": "2022-11-28"
         }
-        self.session = requests.Session()
+        self.session = session or create_session(cache, retry_statuses=SERVER_ERROR_STATUSES)
         self.session.headers.update(self.headers)
+        self.app_auth = app_auth
+        self.token_pool = TokenPool(tokens, rate_limiter) if tokens or not app_auth else None
+        self.max_retries = max_retries
 
-    def get_repository_issues(
+    def _request(
+        self,
+        method: str,
+        url: str,
+        write: Optional[bool] = None,
+        resource: str = "core",
+        owner: Optional[str] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        发送请求（所有 API 调用都经过这里）
+
+        每次请求选用剩余配额最多的 token（App 模式下为 owner 的 installation token），
+        并由该 token 的调度器控制节奏。token 返回 401 时移出轮换或重新签发；
+        触发速率限制（403/429）时优先切换到其他有余量的 token，
+        都没有余量时等待到重置时间后重试，而不是直接失败。
+
+        Args:
+            method: HTTP 方法
+            url: 请求 URL
+            write: 是否计入内容创建限制（默认非 GET 请求都算）
+            resource: 主配额类别（core/graphql）
+            owner: 仓库所有者（App 模式下用于选择 installation，默认从 URL 中解析）
+            **kwargs: 传给 requests 的其他参数
+
+        Returns:
+            响应对象
+        """
+        if write is None:
+            write = method.upper() != "GET"
+
+        tokens = self.app_auth or self.token_pool
+        owner = owner or self._owner_from_url(url)
+        extra_headers = kwargs.pop("headers", None) or {}
+
+        # 每个 token 至少有一次机会，再加上限流后的重试次数
+        attempts = self.max_retries + len(tokens)
+        for attempt in range(attempts):
+            token, limiter = tokens.acquire(resource, owner=owner)
+            limiter.acquire(write=write, resource=resource)
+
+            headers = {"Authorization": f"Bearer {token}", **extra_headers}
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            limiter.update(response)
+
+            if response.status_code == 401 and tokens.invalidate(token):
+                logger.warning(f"GitHub token {TokenPool.mask(token)} rejected (401), switching token")
+                continue
+
+            delay = limiter.get_retry_delay(response)
+            if delay is None or attempt == attempts - 1:
+                break
+
+            limiter.block(delay)
+            if tokens.has_headroom(resource, exclude=token):
+                logger.warning(
+                    f"GitHub rate limit hit ({response.status_code}) on token {TokenPool.mask(token)}, "
+                    f"switching token"
+                )
+            else:
+                logger.warning(
+                    f"GitHub rate limit hit ({response.status_code}) on {method} {url}, "
+                    f"retrying in {delay:.0f}s"
+                )
+
+        response.raise_for_status()
+        return response
+
+    def get_rate_limit_status(self) -> Dict:
+        """
+        获取速率限制指标
+
+        Returns:
+            每个 token 的剩余配额、重置时间、限流次数等
+        """
+        return (self.app_auth or self.token_pool).get_metrics()
+
+    def _owner_from_url(self, url: str) -> Optional[str]:
+        """从 /repos/{owner}/{repo}/... 形式的 URL 中解析 owner"""
+        path = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        parts = path.strip('/').split('/')
+        if len(parts) >= 2 and parts[0] == "repos":
+            return parts[1]
+        return None
+
+    def _iter_pages(self, url: str, params: Optional[Dict] = None) -> Iterator[List[Dict]]:
+        """
+        按页遍历列表接口，跟随 Link 头中的 rel="next"
+
+        Args:
+            url: 列表接口 URL
+            params: 第一页的查询参数（后续页的参数已包含在 next 链接中）
+
+        Yields:
+            每一页的结果列表
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", self.per_page)
+
+        while url:
+            response = self._request("GET", url, params=params)
+            yield response.json()
+
+            # next 链接已经带上了 per_page/page 等参数
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+    def iter_repository_issues(
         self,
         owner: str = None,
         repo: str = None,
         labels: Optional[List[str]] = None,
         state: str = "open",
-        assignee: str = None
-    ) -> List[Dict]:
+        assignee: str = None,
+        since: Optional[str] = None
+    ) -> Iterator[Dict]:
         """
-        获取仓库的 issues
+        逐个产出仓库的 issues（自动分页，每页 per_page 条）
+
+        拿到一页就开始产出，调用方处理完当前页后才会请求下一页，
+        因此不需要等全部 issues 下载完就可以开始分析。
 
         Args:
             owner: 仓库所有者（默认使用初始化时的值）
@@ -48,9 +199,10 @@ class GitHubClient:
             labels: 过滤标签列表
             state: issue 状态 (open/closed/all)
             assignee: 分配给的用户（可选）
+            since: 只返回在此时间（ISO 8601）之后更新过的 issues（可选）
 
-        Returns:
-            issues 列表
+        Yields:
+            issue 字典（已过滤 pull requests）
         """
         owner = owner or self.repo_owner
         repo = repo or self.repo_name
@@ -67,12 +219,39 @@ class GitHubClient:
         if assignee:
             params["assignee"] = assignee
 
-        response = self.session.get(url, params=params)
-        response.raise_for_status()
+        if since:
+            params["since"] = since
+
+        for page in self._iter_pages(url, params):
+            # 过滤掉 pull requests（GitHub API 将 PR 也作为 issue 返回）
+            for issue in page:
+                if "pull_request" not in issue:
+                    yield issue
+
+    def get_repository_issues(
+        self,
+        owner: str = None,
+        repo: str = None,
+        labels: Optional[List[str]] = None,
+        state: str = "open",
+        assignee: str = None,
+        since: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        获取仓库的所有 issues（会读完所有分页）
+
+        Args:
+            owner: 仓库所有者（默认使用初始化时的值）
+            repo: 仓库名称（默认使用初始化时的值）
+            labels: 过滤标签列表
+            state: issue 状态 (open/closed/all)
+            assignee: 分配给的用户（可选）
+            since: 只返回在此时间（ISO 8601）之后更新过的 issues（可选）
 
-        # 过滤掉 pull requests（GitHub API 将 PR 也作为 issue 返回）
-        issues = response.json()
-        return [issue for issue in issues if "pull_request" not in issue]
+        Returns:
+            issues 列表
+        """
+        return list(self.iter_repository_issues(owner, repo, labels, state, assignee, since))
 
     def get_issue_by_number(
         self,
@@ -99,8 +278,7 @@ class GitHubClient:
 
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}"
 
-        response = self.session.get(url)
-        response.raise_for_status()
+        response = self._request("GET", url)
         return response.json()
 
     def add_comment(
@@ -131,23 +309,24 @@ class GitHubClient:
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}/comments"
         data = {"body": body}
 
-        response = self.session.post(url, json=data)
-        response.raise_for_status()
+        response = self._request("POST", url, json=data)
         return response.json()
 
     def get_comments(
         self,
         issue_number: int,
         owner: str = None,
-        repo: str = None
+        repo: str = None,
+        since: Optional[str] = None
     ) -> List[Dict]:
         """
-        获取 issue 的所有评论
+        获取 issue 的所有评论（会读完所有分页）
 
         Args:
             issue_number: Issue 编号
             owner: 仓库所有者
             repo: 仓库名称
+            since: 只返回在此时间（ISO 8601）之后更新过的评论（可选）
 
         Returns:
             评论列表
@@ -159,10 +338,12 @@ class GitHubClient:
             raise ValueError("Must provide owner and repo")
 
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}/comments"
+        params = {"since": since} if since else None
 
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        comments = []
+        for page in self._iter_pages(url, params):
+            comments.extend(page)
+        return comments
 
     def add_labels(
         self,
@@ -192,8 +373,7 @@ class GitHubClient:
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}/labels"
         data = {"labels": labels}
 
-        response = self.session.post(url, json=data)
-        response.raise_for_status()
+        response = self._request("POST", url, json=data)
         return response.json()
 
     def remove_label(
@@ -220,8 +400,7 @@ class GitHubClient:
 
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}/labels/{label}"
 
-        response = self.session.delete(url)
-        response.raise_for_status()
+        self._request("DELETE", url)
 
     def update_issue_labels(
         self,
@@ -251,8 +430,7 @@ class GitHubClient:
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}/labels"
         data = {"labels": labels}
 
-        response = self.session.put(url, json=data)
-        response.raise_for_status()
+        response = self._request("PUT", url, json=data)
         return response.json()
 
     def create_pull_request(
@@ -292,8 +470,7 @@ class GitHubClient:
             "body": body
         }
 
-        response = self.session.post(url, json=data)
-        response.raise_for_status()
+        response = self._request("POST", url, json=data)
         return response.json()
 
     def close_issue(
@@ -322,8 +499,7 @@ class GitHubClient:
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}"
         data = {"state": "closed"}
 
-        response = self.session.patch(url, json=data)
-        response.raise_for_status()
+        response = self._request("PATCH", url, json=data)
         return response.json()
 
     def get_repository_info(
@@ -349,6 +525,5 @@ class GitHubClient:
 
         url = f"{self.base_url}/repos/{owner}/{repo}"
 
-        response = self.session.get(url)
-        response.raise_for_status()
+        response = self._request("GET", url)
         return response.json()
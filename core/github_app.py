@@ -0,0 +1,257 @@
+"""
+GitHub App 认证
+用 App ID + 私钥签发 JWT，换取各个 owner（组织/用户）的 installation token。
+每个 installation 有独立的速率限制配额，多组织运行时互不影响。
+installation token 在内存和磁盘上缓存，快过期时自动刷新。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from .ratelimit import RateLimiter
+from .transport import create_session
+
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubAppAuth:
+    """GitHub App installation token 提供者（线程安全）"""
+
+    # token 剩余有效期少于这个秒数时提前刷新
+    REFRESH_MARGIN = 300
+
+    def __init__(
+        self,
+        app_id: str,
+        private_key: str,
+        base_url: str = "https://api.github.com",
+        cache_file: Optional[str] = "logs/github_app_tokens.json",
+        session: Optional[requests.Session] = None,
+        clock=time.time
+    ):
+        """
+        初始化 App 认证
+
+        Args:
+            app_id: GitHub App ID
+            private_key: App 私钥（PEM 格式内容）
+            base_url: API 地址（测试时可指向本地桩服务）
+            cache_file: installation token 磁盘缓存文件（为 None 时只缓存在内存）
+            session: 请求 token 使用的 Session（默认由 create_session 创建）
+            clock: 时钟
+        """
+        self.app_id = str(app_id)
+        self.private_key = private_key
+        self.base_url = base_url.rstrip('/')
+        self.cache_file = cache_file
+        self.session = session or create_session()
+        self._clock = clock
+        # _lock 只保护内存中的缓存，不在持有时发请求；刷新 token 时持有对应 owner 的锁，
+        # 同一个 owner 只请求一次，其他 owner 的请求不受影响
+        self._lock = threading.Lock()
+        self._owner_locks: Dict[str, threading.Lock] = {}
+
+        # owner -> {"token", "expires_at", "installation_id"}
+        self._tokens: Dict[str, Dict] = self._load_cache()
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    @classmethod
+    def from_key_file(cls, app_id: str, key_path: str, **kwargs) -> "GitHubAppAuth":
+        """
+        从私钥文件创建
+
+        Args:
+            app_id: GitHub App ID
+            key_path: 私钥文件路径
+            **kwargs: 其他初始化参数
+
+        Returns:
+            GitHubAppAuth 实例
+        """
+        with open(key_path, 'r', encoding='utf-8') as f:
+            return cls(app_id, f.read(), **kwargs)
+
+    def _load_cache(self) -> Dict:
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return {}
+        return {}
+
+    def _save_cache(self):
+        """保存 token 缓存（调用方持有锁），文件只对当前用户可读写"""
+        if not self.cache_file:
+            return
+
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fd = os.open(self.cache_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._tokens, f, indent=2)
+
+    def create_jwt(self) -> str:
+        """
+        签发 App JWT（有效期 9 分钟，签发时间回拨 60 秒以容忍时钟偏差）
+
+        Returns:
+            JWT 字符串
+        """
+        try:
+            import jwt
+        except ImportError:
+            raise ImportError(
+                "GitHub App authentication requires PyJWT with crypto support: "
+                "pip install 'pyjwt[crypto]'"
+            )
+
+        now = int(self._clock())
+        payload = {"iat": now - 60, "exp": now + 540, "iss": self.app_id}
+        return jwt.encode(payload, self.private_key, algorithm="RS256")
+
+    def _app_headers(self) -> Dict:
+        return {
+            "Authorization": f"Bearer {self.create_jwt()}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28"
+        }
+
+    def get_installation_id(self, owner: str) -> int:
+        """
+        查找 App 在 owner 下的 installation
+
+        Args:
+            owner: 组织名或用户名
+
+        Returns:
+            installation ID
+        """
+        headers = self._app_headers()
+
+        # 先按组织查，找不到再按用户查
+        response = self.session.get(f"{self.base_url}/orgs/{owner}/installation", headers=headers)
+        if response.status_code == 404:
+            response = self.session.get(f"{self.base_url}/users/{owner}/installation", headers=headers)
+
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def get_token(self, owner: str) -> str:
+        """
+        获取 owner 的 installation token（优先使用缓存）
+
+        Args:
+            owner: 组织名或用户名
+
+        Returns:
+            installation token
+        """
+        with self._lock:
+            token = self._fresh_token(owner)
+            if token:
+                return token
+            owner_lock = self._owner_locks.setdefault(owner, threading.Lock())
+
+        with owner_lock:
+            # 等锁期间其他线程可能已经刷新
+            with self._lock:
+                token = self._fresh_token(owner)
+                if token:
+                    return token
+                cached = self._tokens.get(owner)
+                installation_id = cached.get("installation_id") if cached else None
+
+            if not installation_id:
+                installation_id = self.get_installation_id(owner)
+
+            response = self.session.post(
+                f"{self.base_url}/app/installations/{installation_id}/access_tokens",
+                headers=self._app_headers()
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            expires_at = datetime.fromisoformat(data["expires_at"].replace("Z", "+00:00")).timestamp()
+            with self._lock:
+                self._tokens[owner] = {
+                    "token": data["token"],
+                    "expires_at": expires_at,
+                    "installation_id": installation_id
+                }
+                self._save_cache()
+
+            logger.info(f"Refreshed GitHub App installation token for {owner}")
+            return data["token"]
+
+    def _fresh_token(self, owner: str) -> Optional[str]:
+        """缓存中还不需要刷新的 token（调用方持有锁）"""
+        cached = self._tokens.get(owner)
+        if cached and cached.get("expires_at", 0) - self._clock() > self.REFRESH_MARGIN:
+            return cached["token"]
+        return None
+
+    def acquire(self, resource: str = "core", owner: Optional[str] = None) -> Tuple[str, RateLimiter]:
+        """
+        返回 owner 的 installation token 及其调度器（与 TokenPool.acquire 接口一致）
+
+        Args:
+            resource: 主配额类别（每个 installation 各自计数）
+            owner: 组织名或用户名
+
+        Returns:
+            (token, 该 installation 的调度器)
+        """
+        if not owner:
+            raise ValueError("GitHub App authentication requires the repository owner")
+
+        token = self.get_token(owner)
+        with self._lock:
+            limiter = self._limiters.setdefault(owner, RateLimiter())
+        return token, limiter
+
+    def has_headroom(self, resource: str = "core", exclude: Optional[str] = None) -> bool:
+        """每个 owner 只有一个 installation token，没有可切换的 token"""
+        return False
+
+    def invalidate(self, token: str) -> bool:
+        """
+        丢弃被拒绝（401）的 token，下次请求时重新签发
+
+        Args:
+            token: 被拒绝的 token
+
+        Returns:
+            是否有缓存被丢弃（即重试时会换成新 token）
+        """
+        with self._lock:
+            for owner, cached in list(self._tokens.items()):
+                if cached.get("token") == token:
+                    del self._tokens[owner]
+                    self._save_cache()
+                    return True
+        return False
+
+    def __len__(self) -> int:
+        return 1
+
+    def get_metrics(self) -> Dict:
+        """
+        获取每个 installation 的配额指标
+
+        Returns:
+            以 owner 为键的指标字典
+        """
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {owner: limiter.get_metrics() for owner, limiter in limiters.items()}
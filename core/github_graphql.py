@@ -0,0 +1,181 @@
+"""
+GitHub GraphQL 批量获取
+一次分页查询同时拿到 issues、标签和最近的评论，
+避免每个 issue 再单独请求一次评论列表
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .github import GitHubClient
+
+
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $labels: [String!], $states: [IssueState!],
+      $since: DateTime, $cursor: String, $pageSize: Int!, $commentCount: Int!) {
+  repository(owner: $owner, name: $name) {
+    issues(first: $pageSize, after: $cursor,
+           filterBy: {labels: $labels, states: $states, since: $since},
+           orderBy: {field: CREATED_AT, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        databaseId
+        title
+        body
+        state
+        url
+        createdAt
+        updatedAt
+        author { login }
+        labels(first: 50) { nodes { name } }
+        comments(last: $commentCount) {
+          totalCount
+          nodes { databaseId body createdAt author { login } }
+        }
+      }
+    }
+  }
+}
+"""
+
+# REST 的 state 参数到 GraphQL IssueState 的映射
+_STATES = {
+    "open": ["OPEN"],
+    "closed": ["CLOSED"],
+    "all": ["OPEN", "CLOSED"]
+}
+
+
+class GitHubGraphQLClient:
+    """基于 GraphQL 的 issue 批量获取，返回与 REST 接口相同结构的字典"""
+
+    def __init__(self, github_client: GitHubClient, page_size: int = 100, comment_count: int = 50):
+        """
+        初始化
+
+        Args:
+            github_client: REST 客户端（复用其 session、认证和速率限制）
+            page_size: 每页 issue 数量（最大 100）
+            comment_count: 每个 issue 附带的最近评论数（最大 100）
+        """
+        self.github = github_client
+        self.url = f"{github_client.base_url}/graphql"
+        self.page_size = min(page_size, 100)
+        self.comment_count = min(comment_count, 100)
+
+    def query(self, query: str, variables: Dict, owner: Optional[str] = None) -> Dict:
+        """
+        执行 GraphQL 查询
+
+        Args:
+            query: 查询语句
+            variables: 查询变量
+            owner: 查询的仓库所有者（App 认证时用于选择 installation token）
+
+        Returns:
+            data 字段
+
+        Raises:
+            RuntimeError: 返回了 GraphQL 错误
+        """
+        # GraphQL 查询用 POST 发送，但不属于内容创建请求
+        response = self.github._request(
+            "POST",
+            self.url,
+            write=False,
+            resource="graphql",
+            owner=owner or self.github.repo_owner,
+            json={"query": query, "variables": variables}
+        )
+        result = response.json()
+
+        if result.get("errors"):
+            messages = "; ".join(error.get("message", "") for error in result["errors"])
+            raise RuntimeError(f"GitHub GraphQL error: {messages}")
+
+        return result["data"]
+
+    def iter_issues_with_comments(
+        self,
+        owner: str = None,
+        repo: str = None,
+        labels: Optional[List[str]] = None,
+        state: str = "open",
+        since: Optional[str] = None
+    ) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        逐个产出仓库的 issues 及其最近的评论
+
+        issue 字典的结构与 GitHubClient.get_repository_issues 相同
+        （其中 comments 为评论总数），评论字典的结构与 get_comments 相同。
+
+        Args:
+            owner: 仓库所有者（默认使用 REST 客户端初始化时的值）
+            repo: 仓库名称（默认使用 REST 客户端初始化时的值）
+            labels: 过滤标签列表
+            state: issue 状态 (open/closed/all)
+            since: 只返回在此时间（ISO 8601）之后更新过的 issues（可选）
+
+        Yields:
+            (issue, 最近 comment_count 条评论) 元组
+        """
+        owner = owner or self.github.repo_owner
+        repo = repo or self.github.repo_name
+
+        if not owner or not repo:
+            raise ValueError("Must provide owner and repo")
+
+        variables = {
+            "owner": owner,
+            "name": repo,
+            "labels": labels or None,
+            "states": _STATES[state],
+            "since": since,
+            "cursor": None,
+            "pageSize": self.page_size,
+            "commentCount": self.comment_count
+        }
+
+        while True:
+            data = self.query(ISSUES_QUERY, variables, owner=owner)
+            issues = data["repository"]["issues"]
+
+            for node in issues["nodes"]:
+                yield self._to_rest_issue(node), [
+                    self._to_rest_comment(comment) for comment in node["comments"]["nodes"]
+                ]
+
+            if not issues["pageInfo"]["hasNextPage"]:
+                break
+            variables["cursor"] = issues["pageInfo"]["endCursor"]
+
+    @staticmethod
+    def _login(actor: Optional[Dict]) -> Dict:
+        # 账号被删除时 author 为 null，REST 接口显示为 ghost
+        return {"login": actor["login"] if actor else "ghost"}
+
+    def _to_rest_issue(self, node: Dict) -> Dict:
+        """转换为 REST 接口的 issue 结构"""
+        return {
+            "id": node["databaseId"],
+            "number": node["number"],
+            "title": node["title"],
+            # REST 接口对空描述返回 null
+            "body": node["body"] or None,
+            "state": node["state"].lower(),
+            "html_url": node["url"],
+            "created_at": node["createdAt"],
+            "updated_at": node["updatedAt"],
+            "user": self._login(node["author"]),
+            "labels": [{"name": label["name"]} for label in node["labels"]["nodes"]],
+            "comments": node["comments"]["totalCount"]
+        }
+
+    def _to_rest_comment(self, node: Dict) -> Dict:
+        """转换为 REST 接口的评论结构"""
+        return {
+            "id": node["databaseId"],
+            "body": node["body"],
+            "created_at": node["createdAt"],
+            "user": self._login(node["author"])
+        }
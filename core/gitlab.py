@@ -4,57 +4,136 @@ GitLab API 客户端
 """
 
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
 from urllib.parse import quote
+from .http_cache import HTTPCache
+from .transport import create_session
 
 
 class GitLabClient:
     """GitLab API 客户端"""
 
-    def __init__(self, url: str, token: str):
+    # GitLab 列表接口允许的最大分页大小
+    MAX_PER_PAGE = 100
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        per_page: int = MAX_PER_PAGE,
+        cache: Optional[HTTPCache] = None,
+        session: Optional[requests.Session] = None
+    ):
         """
         初始化 GitLab 客户端
 
         Args:
             url: GitLab 实例 URL (如 https://gitlab.com)
             token: Personal Access Token
+            per_page: 列表接口每页条数（最大 100）
+            cache: HTTP 条件请求缓存（可选）
+            session: 自定义 Session（默认由 create_session 创建；传入时忽略 cache）
         """
         self.base_url = url.rstrip('/')
         self.token = token
+        self.per_page = min(per_page, self.MAX_PER_PAGE)
         self.headers = {"PRIVATE-TOKEN": token}
-        self.session = requests.Session()
+        self.session = session or create_session(cache)
         self.session.headers.update(self.headers)
 
-    def get_assigned_issues(
+    def _iter_pages(self, url: str, params: Optional[Dict] = None) -> Iterator[List[Dict]]:
+        """
+        按页遍历列表接口
+
+        优先跟随 Link 头中的 rel="next"（keyset 分页只提供这个），
+        没有时退回到 offset 分页的 X-Next-Page 头。
+
+        Args:
+            url: 列表接口 URL
+            params: 第一页的查询参数
+
+        Yields:
+            每一页的结果列表
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", self.per_page)
+
+        while url:
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            yield response.json()
+
+            next_url = response.links.get("next", {}).get("url")
+            next_page = response.headers.get("X-Next-Page")
+
+            if next_url:
+                # next 链接已经带上了全部查询参数
+                url, params = next_url, None
+            elif next_page and params is not None:
+                params["page"] = next_page
+            else:
+                break
+
+    def iter_assigned_issues(
         self,
         username: str,
         labels: Optional[List[str]] = None,
-        state: str = "opened"
-    ) -> List[Dict]:
+        state: str = "opened",
+        updated_after: Optional[str] = None
+    ) -> Iterator[Dict]:
         """
-        获取分配给特定用户的所有 issues（跨项目）
+        逐个产出分配给特定用户的 issues（跨项目，自动分页）
+
+        按创建时间升序遍历，运行期间新建的 issue 只会出现在末尾，
+        不会把已读过的页往后挤。
 
         Args:
             username: GitLab 用户名
             labels: 过滤标签列表
             state: issue 状态 (opened/closed)
+            updated_after: 只返回在此时间（ISO 8601）之后更新过的 issues
 
-        Returns:
-            issues 列表
+        Yields:
+            issue 字典
         """
         url = f"{self.base_url}/api/v4/issues"
         params = {
             "assignee_username": username,
             "state": state,
-            "scope": "all"
+            "scope": "all",
+            "order_by": "created_at",
+            "sort": "asc"
         }
 
         if labels:
             params["labels"] = ",".join(labels)
 
-        response = self.session.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        if updated_after:
+            params["updated_after"] = updated_after
+
+        for page in self._iter_pages(url, params):
+            yield from page
+
+    def get_assigned_issues(
+        self,
+        username: str,
+        labels: Optional[List[str]] = None,
+        state: str = "opened",
+        updated_after: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        获取分配给特定用户的所有 issues（跨项目，会读完所有分页）
+
+        Args:
+            username: GitLab 用户名
+            labels: 过滤标签列表
+            state: issue 状态 (opened/closed)
+            updated_after: 只返回在此时间（ISO 8601）之后更新过的 issues
+
+        Returns:
+            issues 列表
+        """
+        return list(self.iter_assigned_issues(username, labels, state, updated_after))
 
     def get_project_info(self, project_id: str) -> Dict:
         """
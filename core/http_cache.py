@@ -0,0 +1,269 @@
+"""
+HTTP 条件请求缓存
+按 URL + 参数保存 ETag / Last-Modified 和响应内容，
+再次请求时发送 If-None-Match / If-Modified-Since，
+服务端返回 304 时直接使用缓存的响应体（GitHub 的 304 不计入速率限制）
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .leases import connect
+from .serializer import decode, encode
+
+
+# 这些头描述的是原始传输编码，缓存的是已解码的内容，不能原样回放
+_HOP_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+
+# 用于区分不同身份的认证头（不同 token 看到的内容可能不同）
+_AUTH_HEADERS = ("Authorization", "PRIVATE-TOKEN")
+
+
+class HTTPCache:
+    """基于 SQLite 的磁盘缓存，总大小超出上限时按最近最少使用淘汰"""
+
+    def __init__(self, path: str = "logs/http_cache.db", max_size: int = 50 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            path: 缓存数据库文件路径
+            max_size: 缓存内容总大小上限（字节）
+        """
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "not_modified": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+        # 多个进程（如 cron 重叠的运行）可能共用一个缓存文件
+        self._conn = connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        读取缓存条目，并刷新其最近访问时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            条目字典或 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, status, headers, body FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                (time.time(), key)
+            )
+            self._conn.commit()
+
+        etag, last_modified, status, headers, body = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "status": status,
+            "headers": decode(headers),
+            "body": body
+        }
+
+    def set(
+        self,
+        key: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        status: int,
+        headers: Dict,
+        body: bytes
+    ):
+        """
+        写入缓存条目，超出大小上限时淘汰最久未访问的条目
+
+        Args:
+            key: 缓存键
+            etag: ETag 响应头
+            last_modified: Last-Modified 响应头
+            status: 状态码
+            headers: 需要回放的响应头
+            body: 响应内容
+        """
+        size = len(body)
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO entries
+                    (key, etag, last_modified, status, headers, body, size, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, etag, last_modified, status, encode(headers).decode("utf-8"), body, size, time.time())
+            )
+            self.stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """淘汰最久未访问的条目，直到总大小不超过上限（调用方持有锁）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at ASC"
+        )
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            to_delete.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+        self.stats["evictions"] += len(to_delete)
+
+    def count(self, name: str):
+        """
+        累加一项缓存计数（多个线程共用一个缓存）
+
+        Args:
+            name: 计数名称（hits/misses/not_modified）
+        """
+        with self._lock:
+            self.stats[name] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """
+        获取缓存计数
+
+        Returns:
+            hits（有缓存可用于条件请求）、misses（无缓存）、
+            not_modified（服务端返回 304，直接使用缓存）等计数
+        """
+        with self._lock:
+            return self.stats.copy()
+
+
+class CachingSession(requests.Session):
+    """对 GET 请求自动发送条件请求头并使用 HTTPCache 的 Session"""
+
+    def __init__(self, cache: Optional[HTTPCache] = None):
+        """
+        初始化 Session
+
+        Args:
+            cache: HTTP 缓存（为 None 时等同于普通 Session）
+        """
+        super().__init__()
+        self.cache = cache
+
+    def _cache_key(self, url: str, params, headers: Optional[Dict]) -> str:
+        """根据完整 URL（含参数）和认证身份生成缓存键"""
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        full_url = requests.Request("GET", url, params=params).prepare().url
+
+        merged = CaseInsensitiveDict(self.headers)
+        merged.update(headers or {})
+        identity = "".join(merged.get(name, "") for name in _AUTH_HEADERS)
+        identity_hash = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+        return f"{identity_hash} {full_url}"
+
+    def request(self, method, url, **kwargs):
+        if self.cache is None or method.upper() != "GET":
+            return super().request(method, url, **kwargs)
+
+        key = self._cache_key(url, kwargs.get("params"), kwargs.get("headers"))
+        entry = self.cache.get(key)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry:
+            self.cache.count("hits")
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        else:
+            self.cache.count("misses")
+
+        response = super().request(method, url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self.cache.count("not_modified")
+            return self._build_cached_response(response, entry)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            self.cache.set(
+                key,
+                etag,
+                last_modified,
+                response.status_code,
+                {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS},
+                response.content
+            )
+
+        return response
+
+    @staticmethod
+    def _build_cached_response(not_modified: requests.Response, entry: Dict) -> requests.Response:
+        """用缓存内容和 304 响应中的最新响应头（如速率限制）构造完整响应"""
+        headers = CaseInsensitiveDict(entry["headers"])
+        headers.update(
+            {k: v for k, v in not_modified.headers.items() if k.lower() not in _HOP_HEADERS}
+        )
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = "OK"
+        response.headers = headers
+        response._content = entry["body"]
+        response.encoding = requests.utils.get_encoding_from_headers(headers)
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response.connection = not_modified.connection
+        response.from_cache = True
+        return response
@@ -0,0 +1,130 @@
+"""
+Issue 处理租约
+webhook 触发的进程和 cron 轮询可能同时看到同一个 issue，
+处理前先在共享的 SQLite 库（WAL 模式，多进程安全）中认领租约，
+同一时间只有一个 worker 分析某个 issue；进程崩溃时租约到期后自动失效
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+def default_worker_id() -> str:
+    """当前进程的 worker 标识（主机名:PID）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def connect(path: str, busy_timeout: float = 30.0) -> sqlite3.Connection:
+    """
+    打开多进程共享的 SQLite 数据库
+
+    使用 WAL 日志（读写互不阻塞），并在数据库被其他进程锁住时等待而不是立即报错。
+
+    Args:
+        path: 数据库文件路径
+        busy_timeout: 等待其他进程释放写锁的秒数
+
+    Returns:
+        数据库连接
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+    return conn
+
+
+class IssueLeaseStore:
+    """基于 SQLite 的 issue 租约表（多进程、多线程安全）"""
+
+    def __init__(self, path: str = "logs/issue_leases.db", worker_id: Optional[str] = None):
+        """
+        初始化租约表
+
+        Args:
+            path: 数据库文件路径（所有 worker 使用同一个文件）
+            worker_id: 当前 worker 标识（默认为 主机名:PID）
+        """
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self._lock = threading.Lock()
+
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS claims (
+                    issue_key TEXT PRIMARY KEY,
+                    worker_id TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def claim(self, issue_key: str, lease_seconds: float = 900, worker_id: Optional[str] = None) -> bool:
+        """
+        认领 issue
+
+        没有租约、租约已过期或租约本来就属于当前 worker 时认领成功（并续期）。
+
+        Args:
+            issue_key: issue 唯一键 (如 "owner/repo#123")
+            lease_seconds: 租约有效期（秒），应大于处理一个 issue 的最长时间
+            worker_id: worker 标识（默认使用初始化时的值）
+
+        Returns:
+            是否认领成功
+        """
+        worker_id = worker_id or self.worker_id
+        now = time.time()
+
+        # 单条 upsert 语句完成“检查 + 写入”，不会有两个进程同时认领成功
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO claims (issue_key, worker_id, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (issue_key) DO UPDATE
+                    SET worker_id = excluded.worker_id, expires_at = excluded.expires_at
+                    WHERE claims.expires_at <= ? OR claims.worker_id = excluded.worker_id
+                """,
+                (issue_key, worker_id, now + lease_seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, issue_key: str, worker_id: Optional[str] = None):
+        """
+        释放租约（只释放属于当前 worker 的租约）
+
+        Args:
+            issue_key: issue 唯一键
+            worker_id: worker 标识（默认使用初始化时的值）
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM claims WHERE issue_key = ? AND worker_id = ?",
+                (issue_key, worker_id or self.worker_id)
+            )
+
+    def get_owner(self, issue_key: str) -> Optional[str]:
+        """
+        查询持有有效租约的 worker
+
+        Args:
+            issue_key: issue 唯一键
+
+        Returns:
+            worker 标识；没有有效租约时为 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT worker_id FROM claims WHERE issue_key = ? AND expires_at > ?",
+                (issue_key, time.time())
+            ).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,76 @@
+"""
+按 issue 分组的日志输出
+并发处理多个 issue 时，各 worker 线程的日志先缓存在本线程，
+一个 issue 处理完后再一次性按原顺序输出，同一个 issue 的日志在文件和控制台中保持连续
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+
+class _BufferFilter(logging.Filter):
+    """挂在根 logger 的 handler 上：当前线程正在分组时，把日志记录放进缓存而不是立即输出"""
+
+    def __init__(self, handler: logging.Handler, local: threading.local):
+        super().__init__()
+        self.handler = handler
+        self.local = local
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            return True
+        buffer.append((self.handler, record))
+        return False
+
+
+class IssueLogBuffer:
+    """
+    按 issue 分组输出日志
+
+    用法:
+        with IssueLogBuffer() as logs:
+            # 在 worker 线程中
+            with logs.group():
+                process(issue)
+    """
+
+    def __init__(self, logger: logging.Logger = None):
+        """
+        初始化
+
+        Args:
+            logger: 挂载缓存的 logger（默认为根 logger，各模块的日志都会传播到这里）
+        """
+        self.logger = logger or logging.getLogger()
+        self._local = threading.local()
+        self._emit_lock = threading.Lock()
+        self._filters: List[_BufferFilter] = []
+
+    def __enter__(self) -> "IssueLogBuffer":
+        for handler in self.logger.handlers:
+            log_filter = _BufferFilter(handler, self._local)
+            handler.addFilter(log_filter)
+            self._filters.append(log_filter)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for log_filter in self._filters:
+            log_filter.handler.removeFilter(log_filter)
+        self._filters = []
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        """在当前线程中缓存日志，退出时（包括出错时）一次性输出"""
+        buffer: List[Tuple[logging.Handler, logging.LogRecord]] = []
+        self._local.buffer = buffer
+        try:
+            yield
+        finally:
+            self._local.buffer = None
+            # 输出时当前线程已不在分组中，记录会通过 filter 正常交给 handler
+            with self._emit_lock:
+                for handler, record in buffer:
+                    handler.handle(record)
@@ -0,0 +1,295 @@
+"""
+分阶段的 asyncio 处理流水线
+列出 issues → 获取项目信息 → AI 分析 → 执行决策（评论/标签），
+各阶段之间用有界队列连接，每个阶段有独立的并发数：
+分析 issue N 时可以同时为 issue N+1 请求项目信息、为 issue N-1 发送评论，
+吞吐量取决于最慢的阶段，而不是各阶段耗时之和
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .agent import IssueAgent, count_result, empty_results
+from .aio import AsyncGitLabClient
+
+
+logger = logging.getLogger(__name__)
+
+# 阶段结束标记
+_DONE = object()
+
+
+class IssuePipeline:
+    """基于 IssueAgent 的异步流水线（各阶段复用 IssueAgent 的处理逻辑）"""
+
+    def __init__(
+        self,
+        agent: IssueAgent,
+        fetch_concurrency: int = 4,
+        analyze_concurrency: int = 4,
+        act_concurrency: int = 2,
+        queue_size: Optional[int] = None
+    ):
+        """
+        初始化流水线
+
+        Args:
+            agent: Issue Agent（提供状态管理、AI 分析和决策处理）
+            fetch_concurrency: 同时获取项目信息的 issues 数
+            analyze_concurrency: 同时进行 AI 分析的 issues 数
+            act_concurrency: 同时执行决策（发评论、改标签）的 issues 数
+            queue_size: 阶段之间的队列容量（默认为下游并发数的 2 倍）
+        """
+        self.agent = agent
+        self.gitlab = AsyncGitLabClient(agent.gitlab)
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.analyze_concurrency = max(1, analyze_concurrency)
+        self.act_concurrency = max(1, act_concurrency)
+        self.queue_size = queue_size
+
+    def process_all_issues(
+        self,
+        username: str,
+        labels: List[str] = None,
+        updated_after: str = None
+    ) -> Dict:
+        """
+        处理所有分配给用户的 issues（同步入口，参数和返回值同 IssueAgent.process_all_issues）
+
+        Args:
+            username: GitLab 用户名
+            labels: 过滤标签
+            updated_after: 只处理在此时间（ISO 8601）之后更新过的 issues
+
+        Returns:
+            处理结果统计
+        """
+        return asyncio.run(self.run(username, labels, updated_after))
+
+    async def run(
+        self,
+        username: str,
+        labels: List[str] = None,
+        updated_after: str = None
+    ) -> Dict:
+        """
+        运行流水线
+
+        Args:
+            username: GitLab 用户名
+            labels: 过滤标签
+            updated_after: 只处理在此时间（ISO 8601）之后更新过的 issues
+
+        Returns:
+            处理结果统计
+        """
+        logger.info(f"🔍 获取分配给 @{username} 的 issues...")
+
+        results = empty_results()
+        self._results = results
+        self._found = 0
+        self._in_flight = 0
+        self._scheduler = None
+        self._slot_freed = asyncio.Event()
+        self.agent.start_run()
+
+        # 各阶段的阻塞调用都在线程池中执行，线程数要够所有阶段同时使用
+        workers = 1 + self.fetch_concurrency + self.analyze_concurrency + self.act_concurrency
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        loop.set_default_executor(executor)
+
+        to_fetch = self._queue(self.fetch_concurrency)
+        to_analyze = self._queue(self.analyze_concurrency)
+        to_act = self._queue(self.act_concurrency)
+
+        try:
+            await asyncio.gather(
+                self._list(username, labels, updated_after, to_fetch),
+                self._stage(self._fetch, to_fetch, to_analyze,
+                            self.fetch_concurrency, self.analyze_concurrency),
+                self._stage(self._analyze, to_analyze, to_act,
+                            self.analyze_concurrency, self.act_concurrency),
+                self._stage(self._act, to_act, None, self.act_concurrency, 0)
+            )
+        finally:
+            executor.shutdown(wait=True)
+
+        logger.info(f"📋 找到 {self._found} 个 issues，其中 {results['total']} 个是新 issues\n")
+
+        self.agent.finish_run()
+        return results
+
+    def _queue(self, consumers: int) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self.queue_size or consumers * 2)
+
+    async def _list(self, username: str, labels: Optional[List[str]], updated_after: Optional[str],
+                    outbox: asyncio.Queue):
+        """
+        列出 issues 并把新 issue 送入流水线（单个协程，队列满时暂停翻页）
+
+        agent 设置了 scheduler 或 budget 时先列出全部新 issues，再按调度顺序送入，
+        项目或主机达到并发上限时等待有 issue 处理完；预算快用完时不再送入，剩下的记为延期。
+        """
+        scheduled = self.agent.scheduler is not None or self.agent.budget is not None
+        new_issues = []
+        try:
+            async for issue in self.gitlab.iter_assigned_issues(
+                username, labels, updated_after=updated_after
+            ):
+                self._found += 1
+
+                project_path = issue['references']['full'].split('#')[0]
+                if self.agent.state.is_processed(project_path, issue['iid']):
+                    continue
+
+                if scheduled:
+                    new_issues.append(issue)
+                else:
+                    await self._submit(issue, outbox)
+
+            if scheduled:
+                scheduler = self.agent.schedule_issues(new_issues)
+                self._scheduler = scheduler
+                budget = self.agent.budget
+                while len(scheduler):
+                    # 预计超出预算时等有 issue 处理完再按新的平均用量检查；没有正在处理的 issue 时停止
+                    if budget is not None and not budget.can_start(self._in_flight):
+                        if not self._in_flight:
+                            break
+                        self._slot_freed.clear()
+                        await self._slot_freed.wait()
+                        continue
+                    issue = scheduler.next()
+                    if issue is None:
+                        self._slot_freed.clear()
+                        await self._slot_freed.wait()
+                        continue
+                    if not await self._submit(issue, outbox):
+                        scheduler.done(issue)
+                if budget is not None:
+                    self.agent.defer_issues(scheduler.drain(), self._results)
+        finally:
+            for _ in range(self.fetch_concurrency):
+                await outbox.put(_DONE)
+
+    async def _submit(self, issue: Dict, outbox: asyncio.Queue) -> bool:
+        """
+        认领 issue 并送入流水线
+
+        Returns:
+            是否已送入（正由其他 worker 处理或刚被处理完时为 False）
+        """
+        state = self.agent.state
+        project_path = issue['references']['full'].split('#')[0]
+
+        # 其他 worker 正在处理时跳过，避免重复调用 AI
+        if not state.claim_issue(project_path, issue['iid']):
+            logger.info(f"⏭️  {issue['references']['full']} 正由其他 worker 处理，跳过")
+            return False
+
+        # 认领之前其他 worker 可能刚处理完
+        if state.is_processed(project_path, issue['iid']):
+            state.release_issue(project_path, issue['iid'])
+            return False
+
+        self._in_flight += 1
+        await outbox.put({"issue": issue, "project_path": project_path, "started": time.monotonic()})
+        return True
+
+    async def _stage(
+        self,
+        handler: Callable[[Dict], Awaitable[Optional[Dict]]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        concurrency: int,
+        downstream: int
+    ):
+        """
+        运行一个阶段：concurrency 个协程从 inbox 取任务，handler 返回的任务放入 outbox
+
+        上游的所有协程结束后，为下游的每个协程放入结束标记。
+        """
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is _DONE:
+                    return
+                try:
+                    job = await handler(job)
+                except Exception as e:
+                    # 单个 issue 出错只记为 failed，不影响其他 issues
+                    logger.error(f"❌ 处理 issue 失败: {e}")
+                    self._finish(job, "failed")
+                    continue
+                if job is not None and outbox is not None:
+                    await outbox.put(job)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            if outbox is not None:
+                for _ in range(downstream):
+                    await outbox.put(_DONE)
+
+    async def _fetch(self, job: Dict) -> Optional[Dict]:
+        """获取项目信息"""
+        project_info = await asyncio.to_thread(self.agent.fetch_issue_context, job["issue"])
+        if project_info is None:
+            self._finish(job, "failed")
+            return None
+        job["project_info"] = project_info
+        return job
+
+    async def _analyze(self, job: Dict) -> Dict:
+        """AI 分析"""
+        job["decision"] = await asyncio.to_thread(
+            self.agent.analyze, job["issue"], job["project_info"]
+        )
+        return job
+
+    async def _act(self, job: Dict) -> None:
+        """执行决策"""
+        result = await asyncio.to_thread(
+            self.agent.act, job["issue"], job["project_info"], job["decision"]
+        )
+        self._finish(job, result)
+
+    def _finish(self, job: Dict, result: Optional[str]):
+        """释放租约、调度名额并计入统计（只在事件循环线程中调用，不需要加锁）"""
+        self.agent.state.release_issue(job["project_path"], job["issue"]['iid'])
+        self._in_flight -= 1
+        if self.agent.budget is not None:
+            self.agent.budget.record_issue(
+                job["issue"]['references']['full'], time.monotonic() - job["started"]
+            )
+        if self._scheduler is not None:
+            self._scheduler.done(job["issue"])
+        self._slot_freed.set()
+        count_result(self._results, result)
+
+
+def create_pipeline(agent: IssueAgent, config: Dict) -> Optional[IssuePipeline]:
+    """
+    根据配置文件的 pipeline 部分创建流水线
+
+    Args:
+        agent: Issue Agent
+        config: 完整配置
+
+    Returns:
+        IssuePipeline；未启用时为 None（使用 IssueAgent.process_all_issues）
+    """
+    pipeline_config = config.get('pipeline') or {}
+    if not pipeline_config.get('enabled', False):
+        return None
+    return IssuePipeline(
+        agent,
+        fetch_concurrency=int(pipeline_config.get('fetch_concurrency', 4)),
+        analyze_concurrency=int(pipeline_config.get('analyze_concurrency', 4)),
+        act_concurrency=int(pipeline_config.get('act_concurrency', 2)),
+        queue_size=pipeline_config.get('queue_size')
+    )
@@ -0,0 +1,274 @@
+"""
+GitHub 速率限制调度器
+所有 GitHubClient 请求都经过这里：按主配额（X-RateLimit-*）控制读请求节奏，
+按内容创建的二级限制对写请求限流，触发限制时精确等待到重置时间
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶：capacity 个令牌，每秒补充 rate 个"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发数量）
+            clock: 单调时钟
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        """
+        预订一个令牌
+
+        Returns:
+            需要等待的秒数（令牌已经预订，等待后直接使用）
+        """
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """GitHub 主配额 + 内容创建限制的请求调度器（线程安全）"""
+
+    # GitHub 文档：内容创建请求每分钟不超过 80 个、每小时不超过 500 个
+    WRITES_PER_MINUTE = 80
+    WRITES_PER_HOUR = 500
+
+    def __init__(
+        self,
+        reserve: int = 50,
+        pace_threshold: float = 0.1,
+        min_write_interval: float = 1.0,
+        max_wait: float = 3700,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        初始化调度器
+
+        Args:
+            reserve: 主配额保留数量，剩余不超过此值时等待到重置时间
+            pace_threshold: 剩余配额低于总量的这个比例时，把剩余请求均匀分布到重置前
+            min_write_interval: 两次写请求之间的最小间隔（秒）
+            max_wait: 单次最长等待时间（秒），超过则直接报错
+            sleep: 睡眠函数
+            clock: 墙钟（与 X-RateLimit-Reset 的 epoch 秒对齐）
+        """
+        self.reserve = reserve
+        self.pace_threshold = pace_threshold
+        self.min_write_interval = min_write_interval
+        self.max_wait = max_wait
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # 按 X-RateLimit-Resource（core/graphql/search）分别记录主配额
+        self._budgets: Dict[str, Dict] = {}
+        self._minute_bucket = TokenBucket(self.WRITES_PER_MINUTE / 60, self.WRITES_PER_MINUTE)
+        self._hour_bucket = TokenBucket(self.WRITES_PER_HOUR / 3600, self.WRITES_PER_HOUR)
+        self._next_write_at = 0.0
+        self._next_read_at: Dict[str, float] = {}
+        self._blocked_until = 0.0
+
+        self.metrics = {
+            "requests": 0,
+            "writes": 0,
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+            "rate_limited": 0
+        }
+
+    def acquire(self, write: bool = False, resource: str = "core"):
+        """
+        在发出请求前调用，必要时阻塞等待
+
+        Args:
+            write: 是否为内容创建类请求（评论、标签等）
+            resource: 主配额类别
+        """
+        with self._lock:
+            now = self._clock()
+            wait = max(self._primary_wait(resource, now), self._blocked_until - now)
+
+            if write:
+                write_wait = max(
+                    self._minute_bucket.reserve(),
+                    self._hour_bucket.reserve(),
+                    self._next_write_at - now
+                )
+                wait = max(wait, write_wait)
+                self._next_write_at = now + wait + self.min_write_interval
+                self.metrics["writes"] += 1
+
+            self.metrics["requests"] += 1
+            if wait > 0:
+                self.metrics["throttled"] += 1
+                self.metrics["throttled_seconds"] += wait
+
+        if wait > 0:
+            self._wait(wait, "write throttle" if write else f"{resource} budget")
+
+    def _primary_wait(self, resource: str, now: float) -> float:
+        """根据主配额计算读请求需要等待的时间（调用方持有锁）"""
+        budget = self._budgets.get(resource)
+        if not budget or budget["reset"] <= now:
+            return 0.0
+
+        remaining = budget["remaining"]
+        if remaining <= self.reserve:
+            return budget["reset"] - now + 1
+
+        # 配额偏低时，把剩余请求均匀分布到重置之前
+        if remaining < budget["limit"] * self.pace_threshold:
+            interval = (budget["reset"] - now) / (remaining - self.reserve)
+            next_at = max(self._next_read_at.get(resource, 0.0), now)
+            self._next_read_at[resource] = next_at + interval
+            return next_at - now
+
+        return 0.0
+
+    def update(self, response):
+        """
+        根据响应头更新主配额
+
+        Args:
+            response: requests.Response
+        """
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+
+        resource = headers.get("X-RateLimit-Resource", "core")
+        try:
+            budget = {
+                "limit": int(headers.get("X-RateLimit-Limit", 0)),
+                "remaining": int(headers["X-RateLimit-Remaining"]),
+                "reset": float(headers.get("X-RateLimit-Reset", 0))
+            }
+        except ValueError:
+            return
+
+        with self._lock:
+            self._budgets[resource] = budget
+
+    def get_retry_delay(self, response) -> Optional[float]:
+        """
+        判断响应是否触发了速率限制
+
+        Args:
+            response: requests.Response
+
+        Returns:
+            重试前需要等待的秒数；不是速率限制错误时返回 None
+        """
+        if response.status_code not in (403, 429):
+            return None
+
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = 60.0
+        elif response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", 0))
+            delay = max(reset - self._clock(), 0) + 1
+        elif "rate limit" in response.text.lower():
+            # 二级限制没有给出 Retry-After 时，GitHub 建议至少等待一分钟
+            delay = 60.0
+        else:
+            return None
+
+        with self._lock:
+            self.metrics["rate_limited"] += 1
+        return delay
+
+    def block(self, delay: float):
+        """
+        触发速率限制后，在 delay 秒内阻塞后续请求（由下一次 acquire 等待）
+
+        Args:
+            delay: 阻塞秒数
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + delay)
+
+    def headroom(self, resource: str = "core") -> float:
+        """
+        当前可以不等待直接使用的主配额数量
+
+        Args:
+            resource: 主配额类别
+
+        Returns:
+            剩余配额减去保留数量；尚未收到响应头时为无穷大，被阻塞时为 0
+        """
+        with self._lock:
+            now = self._clock()
+            if self._blocked_until > now:
+                return 0.0
+
+            budget = self._budgets.get(resource)
+            if not budget or budget["reset"] <= now:
+                return float("inf")
+            return max(budget["remaining"] - self.reserve, 0)
+
+    def available_at(self, resource: str = "core") -> float:
+        """
+        配额用尽时，预计可以再次发出请求的时间（epoch 秒）
+
+        Args:
+            resource: 主配额类别
+
+        Returns:
+            重置时间与阻塞结束时间中较晚的一个
+        """
+        with self._lock:
+            budget = self._budgets.get(resource)
+            reset = budget["reset"] if budget and budget["remaining"] <= self.reserve else 0.0
+            return max(reset, self._blocked_until)
+
+    def _wait(self, seconds: float, reason: str):
+        if seconds > self.max_wait:
+            raise RuntimeError(
+                f"GitHub rate limit requires waiting {seconds:.0f}s ({reason}), "
+                f"exceeds max_wait {self.max_wait:.0f}s"
+            )
+        if seconds >= 5:
+            logger.info(f"Rate limiter: sleeping {seconds:.1f}s ({reason})")
+        self._sleep(seconds)
+
+    def get_metrics(self) -> Dict:
+        """
+        获取调度器指标
+
+        Returns:
+            各类主配额的剩余量/重置时间，以及限流次数和累计等待时间
+        """
+        with self._lock:
+            metrics = self.metrics.copy()
+            metrics["budgets"] = {
+                resource: budget.copy() for resource, budget in self._budgets.items()
+            }
+        return metrics
@@ -0,0 +1,171 @@
+"""
+统计汇总
+每次 issue 状态变化时，按小时/天的时间桶累加计数（按状态、项目、决策分别计数），
+并保留最近处理的若干条记录；查询只读取时间桶，耗时与历史记录总量无关
+"""
+
+import re
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+# 小时桶保留 7 天，天桶保留约一年
+HOUR_BUCKETS = 24 * 7
+DAY_BUCKETS = 400
+
+# 保留的最近处理记录条数
+RECENT_LIMIT = 20
+
+# 可以分组统计的维度
+DIMENSIONS = ("status", "project", "action")
+
+
+def bucket_keys(at: str) -> Dict[str, str]:
+    """
+    ISO 8601 时间对应的时间桶（直接截取字符串，不解析时间）
+
+    Args:
+        at: ISO 8601 时间
+
+    Returns:
+        {"hour": "YYYY-MM-DDTHH", "day": "YYYY-MM-DD"}
+    """
+    return {"hour": at[:13], "day": at[:10]}
+
+
+def choose_buckets(since: datetime, now: Optional[datetime] = None) -> Tuple[str, str]:
+    """
+    选择查询使用的时间桶粒度
+
+    起始时间在小时桶保留范围内时按小时统计，否则按天统计。
+
+    Args:
+        since: 统计起始时间
+        now: 当前时间
+
+    Returns:
+        (粒度, 起始桶)
+    """
+    now = now or datetime.now()
+    if now - since <= timedelta(hours=HOUR_BUCKETS - 1):
+        return "hour", bucket_keys(since.isoformat())["hour"]
+    return "day", bucket_keys(since.isoformat())["day"]
+
+
+def parse_since(value: str, now: Optional[datetime] = None) -> datetime:
+    """
+    解析命令行的 --since 参数
+
+    Args:
+        value: 相对时间（如 "24h"、"7d"）或 ISO 8601 日期/时间
+
+    Returns:
+        起始时间
+    """
+    now = now or datetime.now()
+    match = re.fullmatch(r"(\d+)([hd])", value.strip())
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        return now - (timedelta(hours=amount) if unit == "h" else timedelta(days=amount))
+    return datetime.fromisoformat(value)
+
+
+def make_event(key: str, record: Dict) -> Dict:
+    """
+    根据 issue 记录生成一次状态变化事件
+
+    Args:
+        key: issue 唯一键 (如 "group/project#123")
+        record: 变化后的记录
+
+    Returns:
+        事件字典
+    """
+    return {
+        "key": key,
+        "project": key.rpartition("#")[0],
+        "status": record["status"],
+        "action": record.get("action") or "none",
+        "at": record.get("updated_at") or record["processed_at"],
+        "processed_at": record.get("processed_at")
+    }
+
+
+class StatsRollup:
+    """保存在状态字典里的统计汇总（JSON 状态文件使用）"""
+
+    def __init__(self, data: Dict):
+        """
+        初始化
+
+        Args:
+            data: 持久化的汇总数据（状态文件中的 rollups 字段，会被原地修改）
+        """
+        self.data = data
+        for granularity in ("hour", "day"):
+            data.setdefault(granularity, {})
+        self._recent = deque(data.get("recent", []), maxlen=RECENT_LIMIT)
+
+    def record(self, event: Dict):
+        """
+        记录一次状态变化
+
+        Args:
+            event: make_event 生成的事件
+        """
+        limits = {"hour": HOUR_BUCKETS, "day": DAY_BUCKETS}
+        for granularity, bucket in bucket_keys(event["at"]).items():
+            buckets = self.data[granularity]
+            counts = buckets.get(bucket)
+            if counts is None:
+                counts = buckets[bucket] = {"total": 0, **{dim: {} for dim in DIMENSIONS}}
+                # 时间桶按时间顺序插入，超出数量时丢弃最早的
+                while len(buckets) > limits[granularity]:
+                    del buckets[next(iter(buckets))]
+
+            counts["total"] += 1
+            for dim in DIMENSIONS:
+                counts[dim][event[dim]] = counts[dim].get(event[dim], 0) + 1
+
+        self._recent.append([event["key"], event["status"], event["processed_at"]])
+        self.data["recent"] = list(self._recent)
+
+    def summarize(self, since: datetime, by: str = "status") -> Dict:
+        """
+        统计 since 之后的状态变化
+
+        Args:
+            since: 起始时间
+            by: 分组维度 (status/project/action)
+
+        Returns:
+            {"total": 总数, "by": {分组值: 数量}, "granularity": 使用的时间桶粒度}
+        """
+        granularity, start = choose_buckets(since)
+        total = 0
+        groups: Dict[str, int] = {}
+        for bucket, counts in self.data[granularity].items():
+            if bucket < start:
+                continue
+            total += counts["total"]
+            for value, count in counts[by].items():
+                groups[value] = groups.get(value, 0) + count
+        return {"total": total, "by": groups, "granularity": granularity}
+
+    def recent(self, limit: int = 5) -> List[Tuple[str, str, str]]:
+        """
+        最近处理的 issues（同一 issue 取最新一次变化的状态）
+
+        按 (processed_at, issue 键) 倒序排列，与 SQLite 后端的顺序一致。
+
+        Args:
+            limit: 条数
+
+        Returns:
+            [(issue 键, 状态, 处理时间)]，最新的在前
+        """
+        latest = {}
+        for key, status, processed_at in self._recent:
+            latest[key] = (key, status, processed_at)
+        return sorted(latest.values(), key=lambda item: (item[2], item[0]), reverse=True)[:limit]
@@ -0,0 +1,232 @@
+"""
+按项目公平调度 issues
+同一个项目突然出现大量 issue 时，按 API 顺序处理会让其他项目一直排队。
+调度器按标签分优先级，同一优先级内在各项目之间轮转，
+并限制每个项目、每个主机同时处理的 issues 数，小项目的等待时间不受大项目积压影响
+"""
+
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional
+from urllib.parse import urlparse
+
+
+def issue_project(issue: Dict) -> str:
+    """issue 所属项目（GitLab 的 references.full，GitHub 的 repository_url）"""
+    references = issue.get('references')
+    if references:
+        return references['full'].split('#')[0]
+    return issue.get('repository_url', '')
+
+
+def issue_host(issue: Dict) -> str:
+    """issue 所在的主机"""
+    return urlparse(issue.get('web_url') or issue.get('html_url') or '').netloc
+
+
+def issue_labels(issue: Dict) -> List[str]:
+    """issue 的标签名（GitLab 为字符串列表，GitHub 为字典列表）"""
+    return [
+        label if isinstance(label, str) else label.get('name', '')
+        for label in issue.get('labels', [])
+    ]
+
+
+class FairScheduler:
+    """按优先级 + 项目轮转 + 并发上限调度 issues（只在一个线程中使用）"""
+
+    def __init__(
+        self,
+        priority_labels: Optional[List[str]] = None,
+        max_per_project: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        project_of: Callable[[Dict], str] = issue_project,
+        host_of: Callable[[Dict], str] = issue_host
+    ):
+        """
+        初始化调度器
+
+        Args:
+            priority_labels: 按优先级从高到低排列的标签（如 ["ai", "auto-fix"]），
+                             issue 按其中排位最靠前的标签分级，没有这些标签的排在最后
+            max_per_project: 每个项目同时处理的 issues 数上限（None 表示不限制）
+            max_per_host: 每个主机同时处理的 issues 数上限（None 表示不限制）
+            project_of: 取 issue 所属项目的函数
+            host_of: 取 issue 所在主机的函数
+        """
+        self.priority_labels = list(priority_labels or [])
+        self.max_per_project = None if max_per_project is None else max(1, max_per_project)
+        self.max_per_host = None if max_per_host is None else max(1, max_per_host)
+        self.project_of = project_of
+        self.host_of = host_of
+
+        # 优先级 -> {项目: 待处理 issues}；项目按轮转顺序排列，刚被调度的项目移到末尾
+        self._queues: Dict[int, "OrderedDict[str, Deque[Dict]]"] = {}
+        self._pending = 0
+        self._project_running: Dict[str, int] = {}
+        self._host_running: Dict[str, int] = {}
+
+    def priority(self, issue: Dict) -> int:
+        """
+        issue 的优先级（越小越先处理）
+
+        Args:
+            issue: issue 字典
+
+        Returns:
+            priority_labels 中排位最靠前的匹配标签的下标；没有匹配时为 len(priority_labels)
+        """
+        labels = set(issue_labels(issue))
+        for rank, label in enumerate(self.priority_labels):
+            if label in labels:
+                return rank
+        return len(self.priority_labels)
+
+    def add(self, issue: Dict, priority: Optional[int] = None):
+        """
+        加入待处理的 issue
+
+        Args:
+            issue: issue 字典
+            priority: 指定优先级（如上次运行延期的 issues 用 -1 排在最前），默认按标签计算
+        """
+        if priority is None:
+            priority = self.priority(issue)
+        projects = self._queues.setdefault(priority, OrderedDict())
+        projects.setdefault(self.project_of(issue), deque()).append(issue)
+        self._pending += 1
+
+    def next(self) -> Optional[Dict]:
+        """
+        取出下一个可以开始处理的 issue
+
+        从最高优先级开始，按轮转顺序找第一个没有达到并发上限的项目。
+
+        Returns:
+            issue；没有待处理的 issue，或所有待处理的 issue 都受并发上限限制时为 None
+        """
+        for rank in sorted(self._queues):
+            projects = self._queues[rank]
+            for project, queue in projects.items():
+                if not self._has_capacity(project, self.host_of(queue[0])):
+                    continue
+
+                issue = queue.popleft()
+                if queue:
+                    projects.move_to_end(project)
+                else:
+                    del projects[project]
+                if not projects:
+                    del self._queues[rank]
+
+                self._pending -= 1
+                self._acquire(project, self.host_of(issue), 1)
+                return issue
+        return None
+
+    def done(self, issue: Dict):
+        """
+        标记 next() 取出的 issue 已处理完，释放并发名额
+
+        Args:
+            issue: issue 字典
+        """
+        self._acquire(self.project_of(issue), self.host_of(issue), -1)
+
+    def _has_capacity(self, project: str, host: str) -> bool:
+        if self.max_per_project is not None and self._project_running.get(project, 0) >= self.max_per_project:
+            return False
+        if self.max_per_host is not None and self._host_running.get(host, 0) >= self.max_per_host:
+            return False
+        return True
+
+    def _acquire(self, project: str, host: str, delta: int):
+        self._project_running[project] = self._project_running.get(project, 0) + delta
+        self._host_running[host] = self._host_running.get(host, 0) + delta
+
+    def drain(self) -> List[Dict]:
+        """
+        取出所有待处理的 issues（按调度顺序，不占用并发名额），用于预算用完时记录延期的 issues
+
+        Returns:
+            issues 列表
+        """
+        issues = []
+        for rank in sorted(self._queues):
+            for queue in self._queues[rank].values():
+                issues.extend(queue)
+        self._queues.clear()
+        self._pending = 0
+        return issues
+
+    @property
+    def running(self) -> int:
+        """正在处理的 issues 数"""
+        return sum(self._project_running.values())
+
+    def __len__(self) -> int:
+        """待处理（尚未被 next() 取出）的 issues 数"""
+        return self._pending
+
+
+class FifoScheduler:
+    """按加入顺序调度 issues，没有并发上限（接口同 FairScheduler，只在一个线程中使用）"""
+
+    def __init__(self):
+        self._queue: Deque[Dict] = deque()
+        self._running = 0
+
+    def add(self, issue: Dict, priority: Optional[int] = None):
+        """
+        加入待处理的 issue
+
+        Args:
+            issue: issue 字典
+            priority: 忽略（按加入顺序处理）
+        """
+        self._queue.append(issue)
+
+    def next(self) -> Optional[Dict]:
+        """取出下一个 issue；没有待处理的 issue 时为 None"""
+        if not self._queue:
+            return None
+        self._running += 1
+        return self._queue.popleft()
+
+    def done(self, issue: Dict):
+        """标记 next() 取出的 issue 已处理完"""
+        self._running -= 1
+
+    def drain(self) -> List[Dict]:
+        """取出所有待处理的 issues"""
+        issues = list(self._queue)
+        self._queue.clear()
+        return issues
+
+    @property
+    def running(self) -> int:
+        """正在处理的 issues 数"""
+        return self._running
+
+    def __len__(self) -> int:
+        """待处理的 issues 数"""
+        return len(self._queue)
+
+
+def create_scheduler(config: Dict) -> Optional[FairScheduler]:
+    """
+    根据配置文件的 scheduler 部分创建调度器
+
+    Args:
+        config: 完整配置
+
+    Returns:
+        FairScheduler；未启用时为 None（按 API 顺序处理）
+    """
+    scheduler_config = config.get('scheduler') or {}
+    if not scheduler_config.get('enabled', False):
+        return None
+    return FairScheduler(
+        priority_labels=scheduler_config.get('priority_labels'),
+        max_per_project=scheduler_config.get('max_per_project'),
+        max_per_host=scheduler_config.get('max_per_host')
+    )
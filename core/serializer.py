@@ -0,0 +1,306 @@
+"""
+JSON 序列化
+安装了 orjson 或 msgspec 时使用它们编解码（比标准库 json 快数倍），否则使用标准库；
+处理记录默认保持为字典，可选转换为 ProcessedIssue（常用字段存放在 __slots__ 中），
+比嵌套字典占用更少内存，但逐条转换会让加载比标准库 json 还慢
+"""
+
+import gc
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # 可选依赖
+    msgspec = None
+
+
+# 当前使用的编解码实现
+BACKEND = "orjson" if orjson else "msgspec" if msgspec else "json"
+
+
+class ProcessedIssue:
+    """
+    一条 issue 处理记录
+
+    常用字段保存在 __slots__ 中，其他字段保存在 extra 字典里（没有其他字段时为 None）；
+    status/action 取值很少，解码时驻留（intern）为共享字符串。
+    支持字典式访问（record["status"]、record.get()、record.update()、dict(record)），
+    原来把记录当作字典使用的代码不需要修改。
+    """
+
+    __slots__ = ("status", "processed_at", "updated_at", "action", "reason", "error", "extra")
+
+    FIELDS = ("status", "processed_at", "updated_at", "action", "reason", "error")
+
+    def __init__(
+        self,
+        status: str,
+        processed_at: str,
+        updated_at: Optional[str] = None,
+        action: Optional[str] = None,
+        reason: Optional[str] = None,
+        error: Optional[str] = None,
+        extra: Optional[Dict] = None
+    ):
+        self.status = sys.intern(status)
+        self.processed_at = processed_at
+        self.updated_at = updated_at
+        self.action = sys.intern(action) if isinstance(action, str) else action
+        self.reason = reason
+        self.error = error
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Union[Dict, "ProcessedIssue"]) -> "ProcessedIssue":
+        """
+        从字典创建记录
+
+        Args:
+            data: 记录字典（至少包含 status 和 processed_at）
+
+        Returns:
+            ProcessedIssue
+        """
+        if isinstance(data, ProcessedIssue):
+            return data
+
+        get = data.get
+        record = cls(
+            data["status"],
+            data["processed_at"],
+            get("updated_at"),
+            get("action"),
+            get("reason"),
+            get("error")
+        )
+        # 只有存在常用字段以外的字段时才建 extra 字典
+        if not _FIELD_SET.issuperset(data):
+            record.extra = {name: value for name, value in data.items() if name not in _FIELD_SET}
+        return record
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        data = {"status": self.status, "processed_at": self.processed_at}
+        if self.updated_at is not None:
+            data["updated_at"] = self.updated_at
+        if self.action is not None:
+            data["action"] = self.action
+        if self.reason is not None:
+            data["reason"] = self.reason
+        if self.error is not None:
+            data["error"] = self.error
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def keys(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def items(self) -> Iterator:
+        for name in self.keys():
+            yield name, self[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.keys())
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self.FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                raise KeyError(name)
+            return value
+        if self.extra is None:
+            raise KeyError(name)
+        return self.extra[name]
+
+    def __setitem__(self, name: str, value: Any):
+        if name in self.FIELDS:
+            setattr(self, name, value)
+        elif self.extra is None:
+            self.extra = {name: value}
+        else:
+            self.extra[name] = value
+
+    def __contains__(self, name: str) -> bool:
+        if name in self.FIELDS:
+            return getattr(self, name) is not None
+        return self.extra is not None and name in self.extra
+
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def update(self, other: Dict = (), **kwargs):
+        for name, value in dict(other, **kwargs).items():
+            self[name] = value
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ProcessedIssue, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ProcessedIssue({self.to_dict()!r})"
+
+
+_FIELD_SET = frozenset(ProcessedIssue.FIELDS)
+
+
+@contextmanager
+def _gc_paused():
+    """
+    编解码大文件时暂停循环垃圾回收
+
+    编解码会在短时间内创建上百万个对象，反复触发的分代回收会让耗时翻倍；
+    这些对象不含循环引用，暂停期间不会积累垃圾。
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _default(obj: Any) -> Any:
+    """编码时把 ProcessedIssue 转换为字典"""
+    if isinstance(obj, ProcessedIssue):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if msgspec:
+    _msgspec_encoder = msgspec.json.Encoder(enc_hook=_default)
+    _msgspec_decoder = msgspec.json.Decoder()
+
+
+def encode(obj: Any, pretty: bool = False) -> bytes:
+    """
+    编码为 UTF-8 JSON
+
+    Args:
+        obj: 要编码的对象
+        pretty: 是否缩进两个空格（便于人工查看），否则输出紧凑格式
+
+    Returns:
+        JSON 字节串
+    """
+    if orjson:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if msgspec:
+        data = _msgspec_encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+    if pretty:
+        return json.dumps(obj, default=_default, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+
+
+def decode(data: Union[bytes, str]) -> Any:
+    """
+    解码 JSON
+
+    Args:
+        data: JSON 字节串或字符串
+
+    Returns:
+        解码结果
+
+    Raises:
+        ValueError: 不是合法的 JSON
+    """
+    if orjson:
+        return orjson.loads(data)
+    if msgspec:
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # 与 json/orjson 一致，调用方只需要捕获 ValueError
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    """
+    读取 JSON 文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        文件内容
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    with _gc_paused():
+        return decode(data)
+
+
+def dump_file(path: str, obj: Any, pretty: bool = False):
+    """
+    写入 JSON 文件（先写临时文件再替换，写到一半被中断也不会损坏原文件）
+
+    Args:
+        path: 文件路径
+        obj: 要写入的对象
+        pretty: 是否缩进
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with _gc_paused():
+        data = encode(obj, pretty)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def make_record(data: Dict, compact: bool = False) -> Union[Dict, ProcessedIssue]:
+    """
+    创建一条处理记录
+
+    Args:
+        data: 记录字典
+        compact: 是否转换为 ProcessedIssue
+
+    Returns:
+        compact 为 True 时为 ProcessedIssue，否则为 data 本身
+    """
+    return ProcessedIssue.from_dict(data) if compact else data
+
+
+def decode_issues(
+    issues: Dict[str, Dict],
+    compact: bool = False
+) -> Dict[str, Union[Dict, ProcessedIssue]]:
+    """
+    把解码得到的处理记录字典转换为 StateManager 使用的记录
+
+    Args:
+        issues: {issue 键: 记录字典}
+        compact: 是否转换为 ProcessedIssue（省内存，但加载更慢）；为 False 时原样返回
+
+    Returns:
+        {issue 键: 记录}
+    """
+    if not compact:
+        return issues
+    with _gc_paused():
+        return {key: ProcessedIssue.from_dict(data) for key, data in issues.items()}
@@ -3,47 +3,269 @@
 跟踪已处理的 issues，避免重复处理
 """
 
-import json
+import atexit
+import functools
+import logging
 import os
-from datetime import datetime
-from typing import Dict, Optional
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .rollup import StatsRollup, make_event
+from .serializer import decode, decode_issues, dump_file, encode, load_file, make_record
+
+
+logger = logging.getLogger(__name__)
+
+# 统计信息里计数的字段（不在其中的状态只计入 total）
+STATISTICS_KEYS = ("total", "completed", "waiting_for_info", "in_progress", "failed")
+
+
+def synchronized(method):
+    """在 self._lock 保护下执行方法（多个 worker 线程共用一个状态管理器）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class StateManager:
-    """管理 agent 的状态"""
+    """管理 agent 的状态（线程安全）"""
 
-    def __init__(self, state_file: str = "state.json"):
+    def __init__(
+        self,
+        state_file: str = "state.json",
+        write_behind: bool = False,
+        flush_interval: float = 30.0,
+        flush_every: int = 50,
+        journal: bool = False,
+        compact_bytes: int = 1024 * 1024,
+        compact_records: bool = False
+    ):
         """
         初始化状态管理器
 
         Args:
             state_file: 状态文件路径
+            write_behind: 延迟写入模式：状态变化先只改内存，按时间间隔/变化次数/退出时批量写盘，
+                          写入紧凑 JSON
+            flush_interval: 延迟写入模式下，距上次写盘超过这个秒数时写盘
+            flush_every: 延迟写入模式下，累计这么多次变化时写盘
+            journal: 日志模式：每次状态变化只向 state_file.journal 追加一行，
+                     启动时在快照上重放日志，日志超过 compact_bytes 时合并进新快照
+            compact_bytes: 日志模式下触发合并的日志大小（字节）
+            compact_records: 处理记录保存为 ProcessedIssue（记录很多时省内存，但加载更慢），否则为字典
         """
         self.state_file = state_file
+        self.journal_file = f"{state_file}.journal"
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.journal = journal
+        self.compact_bytes = compact_bytes
+        self.compact_records = compact_records
+        self._journal = None
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # 可重入：SIGTERM 处理器可能在持有锁的主线程中调用 flush
+        self._lock = threading.RLock()
+
         self.state = self._load_state()
+        self._init_rollup()
+
+        # 上次运行留下的日志（包括关闭日志模式之前的）总是先重放
+        clean = self._replay_journal()
+        if clean is not None and (not journal or not clean
+                                  or os.path.getsize(self.journal_file) >= compact_bytes):
+            self._compact()
+
+        if write_behind:
+            atexit.register(self.flush)
+            self._flush_on_sigterm()
 
     def _load_state(self) -> Dict:
         """加载状态文件"""
         if os.path.exists(self.state_file):
-            with open(self.state_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            state = load_file(self.state_file)
+            state["processed_issues"] = decode_issues(state["processed_issues"], self.compact_records)
+            return state
+        return self._empty_state()
+
+    @staticmethod
+    def _empty_state() -> Dict:
+        """空状态"""
         return {
             "processed_issues": {},
             "last_run": None,
-            "statistics": {
-                "total": 0,
-                "completed": 0,
-                "waiting_for_info": 0,
-                "in_progress": 0,
-                "failed": 0
-            }
+            "statistics": dict.fromkeys(STATISTICS_KEYS, 0),
+            "rollups": {},
+            # 每种状态最早的 processed_at（不晚于实际值），没有过期记录时清理不需要遍历
+            "oldest": {}
         }
 
+    def _init_rollup(self):
+        """加载统计汇总；旧状态文件没有汇总数据时，按已有记录回填一次"""
+        missing = "rollups" not in self.state
+        self._rollup = StatsRollup(self.state.setdefault("rollups", {}))
+        if missing:
+            records = sorted(
+                self.state["processed_issues"].items(),
+                key=lambda item: item[1]["processed_at"]
+            )
+            for key, data in records:
+                self._rollup.record(make_event(key, data))
+
     def _save_state(self):
-        """保存状态到文件"""
+        """保存状态到文件（先写临时文件再替换，写到一半被中断也不会损坏原文件）"""
         self.state["last_run"] = datetime.now().isoformat()
-        with open(self.state_file, 'w', encoding='utf-8') as f:
-            json.dump(self.state, f, indent=2, ensure_ascii=False)
+
+        # 每次变化都写盘的默认模式保留缩进格式，便于人工查看
+        dump_file(self.state_file, self.state, pretty=not (self.write_behind or self.journal))
+
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _replay_journal(self) -> Optional[bool]:
+        """
+        在快照上重放日志
+
+        Returns:
+            没有日志时为 None；否则为日志是否完整（进程被杀时最后一行可能只写了一半）
+        """
+        if not os.path.exists(self.journal_file):
+            return None
+
+        clean = True
+        count = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = decode(line)
+                except ValueError:
+                    clean = False
+                    break
+                if not line.endswith(b'\n'):
+                    clean = False
+
+                if entry["op"] == "set":
+                    record = make_record(entry["value"], self.compact_records)
+                    self.state["processed_issues"][entry["key"]] = record
+                    self._note_oldest(record)
+                    self._rollup.record(make_event(entry["key"], record))
+                elif entry["op"] == "delete":
+                    for key in entry["keys"]:
+                        self.state["processed_issues"].pop(key, None)
+                    if "oldest" in entry:
+                        self.state["oldest"] = entry["oldest"]
+                elif entry["op"] == "oldest":
+                    self.state["oldest"] = entry["oldest"]
+                elif entry["op"] == "deferred":
+                    self.state["deferred"] = entry["keys"]
+                self.state["statistics"] = entry["statistics"]
+                self.state["last_run"] = entry["at"]
+                count += 1
+
+        if not clean:
+            logger.warning(f"State journal {self.journal_file} ends with a partial line, ignored")
+        logger.debug(f"Replayed {count} state journal entries")
+        return clean
+
+    def _append_journal(self, entry: Dict):
+        """向日志追加一行，超过大小阈值时合并进快照"""
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'ab')
+
+        entry["statistics"] = self.state["statistics"]
+        entry["at"] = datetime.now().isoformat()
+        self._journal.write(encode(entry) + b'\n')
+        self._journal.flush()
+
+        if self._journal.tell() >= self.compact_bytes:
+            self._compact()
+
+    def _compact(self):
+        """把当前状态写成新快照并清空日志"""
+        self._save_state()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        # 快照写好之后才删除日志；两步之间崩溃时，重放日志的结果不变
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+    def _changed(self, key: Optional[str] = None, deleted: Optional[List[str]] = None):
+        """
+        记录一次状态变化：立即写盘、追加日志，或在延迟写入模式下按需批量写盘
+
+        Args:
+            key: 新增或修改的 issue 键
+            deleted: 删除的 issue 键列表
+        """
+        if self.journal:
+            if deleted is not None:
+                self._append_journal({"op": "delete", "keys": deleted, "oldest": self.state.get("oldest")})
+            else:
+                self._append_journal({
+                    "op": "set",
+                    "key": key,
+                    "value": self.state["processed_issues"][key]
+                })
+            return
+
+        if not self.write_behind:
+            self._save_state()
+            return
+
+        self._pending += 1
+        if (self._pending >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self._save_state()
+
+    @synchronized
+    def flush(self):
+        """把尚未写盘的状态变化写入文件"""
+        if self._pending:
+            self._save_state()
+
+    def _flush_on_sigterm(self):
+        """收到 SIGTERM（如 cron/容器停止）时先写盘，再交给原来的处理方式"""
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+        except ValueError:
+            return
+        if previous == signal.SIG_IGN:
+            return
+
+        def handler(signum, frame):
+            self.flush()
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                raise SystemExit(128 + signum)
+
+        try:
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError:
+            # 只能在主线程注册信号处理器，其他线程中依赖 atexit
+            pass
+
+    def _note_oldest(self, data: Dict):
+        """
+        用新写入的记录更新每种状态最早的 processed_at
+
+        删除记录时不更新（保留的值只会偏早，下次清理时多遍历一次并重新计算）；
+        旧状态文件没有 oldest 时忽略，首次清理时计算。
+        """
+        oldest = self.state.get("oldest")
+        if oldest is None:
+            return
+        current = oldest.get(data["status"])
+        if current is None or data["processed_at"] < current:
+            oldest[data["status"]] = data["processed_at"]
 
     def get_issue_key(self, project_path: str, issue_iid: int) -> str:
         """
@@ -58,6 +280,7 @@ class StateManager:
         """
         return f"{project_path}#{issue_iid}"
 
+    @synchronized
     def is_processed(self, project_path: str, issue_iid: int) -> bool:
         """
         检查 issue 是否已处理
@@ -72,6 +295,23 @@ class StateManager:
         key = self.get_issue_key(project_path, issue_iid)
         return key in self.state["processed_issues"]
 
+    @synchronized
+    def get_issue(self, project_path: str, issue_iid: int) -> Optional[Dict]:
+        """
+        获取 issue 的处理记录
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            记录字典的副本或 None
+        """
+        key = self.get_issue_key(project_path, issue_iid)
+        issue_data = self.state["processed_issues"].get(key)
+        return dict(issue_data) if issue_data else None
+
+    @synchronized
     def get_issue_status(self, project_path: str, issue_iid: int) -> Optional[str]:
         """
         获取 issue 处理状态
@@ -87,6 +327,7 @@ class StateManager:
         issue_data = self.state["processed_issues"].get(key)
         return issue_data.get("status") if issue_data else None
 
+    @synchronized
     def mark_processed(
         self,
         project_path: str,
@@ -105,19 +346,22 @@ class StateManager:
         """
         key = self.get_issue_key(project_path, issue_iid)
 
-        self.state["processed_issues"][key] = {
+        self.state["processed_issues"][key] = make_record({
             "status": status,
             "processed_at": datetime.now().isoformat(),
             **kwargs
-        }
+        }, self.compact_records)
+        self._note_oldest(self.state["processed_issues"][key])
 
         # 更新统计
+        self._rollup.record(make_event(key, self.state["processed_issues"][key]))
         self.state["statistics"]["total"] += 1
         if status in self.state["statistics"]:
             self.state["statistics"][status] += 1
 
-        self._save_state()
+        self._changed(key)
 
+    @synchronized
     def update_issue_status(
         self,
         project_path: str,
@@ -143,15 +387,18 @@ class StateManager:
                 "updated_at": datetime.now().isoformat(),
                 **kwargs
             })
+            self._note_oldest(self.state["processed_issues"][key])
 
             # 更新统计
+            self._rollup.record(make_event(key, self.state["processed_issues"][key]))
             if old_status in self.state["statistics"]:
                 self.state["statistics"][old_status] -= 1
             if status in self.state["statistics"]:
                 self.state["statistics"][status] += 1
 
-            self._save_state()
+            self._changed(key)
 
+    @synchronized
     def get_statistics(self) -> Dict:
         """
         获取处理统计信息
@@ -161,6 +408,34 @@ class StateManager:
         """
         return self.state["statistics"].copy()
 
+    @synchronized
+    def get_rollup(self, since: datetime, by: str = "status") -> Dict:
+        """
+        按时间桶汇总 since 之后的状态变化（不遍历处理记录）
+
+        Args:
+            since: 起始时间
+            by: 分组维度 (status/project/action)
+
+        Returns:
+            {"total": 总数, "by": {分组值: 数量}, "granularity": 时间桶粒度}
+        """
+        return self._rollup.summarize(since, by)
+
+    @synchronized
+    def get_recent_issues(self, limit: int = 5) -> List[Tuple[str, str, str]]:
+        """
+        最近处理的 issues（按处理时间倒序，时间相同时按 issue 键倒序）
+
+        Args:
+            limit: 条数
+
+        Returns:
+            [(issue 键, 状态, 处理时间)]，最新的在前
+        """
+        return self._rollup.recent(limit)
+
+    @synchronized
     def get_all_processed_issues(self) -> Dict:
         """
         获取所有已处理的 issues
@@ -170,25 +445,213 @@ class StateManager:
         """
         return self.state["processed_issues"].copy()
 
-    def clear_old_issues(self, days: int = 30):
+    @synchronized
+    def clear_old_issues(
+        self,
+        days: Optional[int] = 30,
+        policies: Optional[Dict[str, Optional[int]]] = None
+    ) -> int:
         """
-        清除旧的已处理 issues（可选功能）
+        清除旧的已处理 issues
+
+        状态中记录了每种状态最早的 processed_at，没有过期记录时（每次运行都清理时的常见情况）
+        不遍历任何记录；有过期记录时遍历一次，同时重新计算最早时间。
 
         Args:
-            days: 保留最近 N 天的记录
+            days: 保留最近 N 天的记录（为 None 时，没有单独策略的状态不清理）
+            policies: 按状态单独设置的保留天数（如 {"failed": 7, "skipped": 90}），
+                      值为 None 表示永久保留
+
+        Returns:
+            删除的记录数
         """
-        from datetime import timedelta
+        policies = policies or {}
+        now = datetime.now()
+        cutoffs: Dict[str, Optional[str]] = {}
+
+        def cutoff(status: str) -> Optional[str]:
+            """状态的过期时间（ISO 8601 字符串可以直接按字典序比较）；永久保留时为 None"""
+            if status not in cutoffs:
+                keep_days = policies.get(status, days)
+                cutoffs[status] = (
+                    None if keep_days is None else (now - timedelta(days=keep_days)).isoformat()
+                )
+            return cutoffs[status]
+
+        oldest = self.state.get("oldest")
+        if oldest is not None and not any(
+            cutoff(status) is not None and processed_at < cutoff(status)
+            for status, processed_at in oldest.items()
+        ):
+            return 0
 
-        cutoff = datetime.now() - timedelta(days=days)
         keys_to_remove = []
-
+        new_oldest: Dict[str, str] = {}
         for key, data in self.state["processed_issues"].items():
-            processed_at = datetime.fromisoformat(data["processed_at"])
-            if processed_at < cutoff:
+            status, processed_at = data["status"], data["processed_at"]
+            limit = cutoff(status)
+            if limit is not None and processed_at < limit:
                 keys_to_remove.append(key)
+            elif status not in new_oldest or processed_at < new_oldest[status]:
+                new_oldest[status] = processed_at
 
         for key in keys_to_remove:
             del self.state["processed_issues"][key]
+        self.state["oldest"] = new_oldest
 
         if keys_to_remove:
+            self._changed(deleted=keys_to_remove)
+        elif self.journal:
+            self._append_journal({"op": "oldest", "oldest": new_oldest})
+        elif self.write_behind:
+            self._pending += 1
+        else:
             self._save_state()
+        return len(keys_to_remove)
+
+    @synchronized
+    def get_deferred(self) -> List[str]:
+        """
+        上次运行因预算用完而延期的 issues
+
+        Returns:
+            issue 键列表
+        """
+        return list(self.state.get("deferred", []))
+
+    @synchronized
+    def set_deferred(self, keys: List[str]):
+        """
+        记录延期的 issues（覆盖上次的记录）
+
+        Args:
+            keys: issue 键列表
+        """
+        if not keys and not self.state.get("deferred"):
+            return
+        self.state["deferred"] = list(keys)
+
+        if self.journal:
+            self._append_journal({"op": "deferred", "keys": self.state["deferred"]})
+        elif self.write_behind:
+            self._pending += 1
+        else:
+            self._save_state()
+
+    def claim_issue(self, project_path: str, issue_iid: int, lease_seconds: float = 900) -> bool:
+        """
+        认领 issue（JSON 状态文件只供单个进程使用，总是成功；
+        多个进程共享状态时使用 SQLiteStateManager）
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+            lease_seconds: 租约有效期（秒）
+
+        Returns:
+            是否认领成功
+        """
+        return True
+
+    def release_issue(self, project_path: str, issue_iid: int):
+        """
+        释放 issue 租约
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+        """
+
+    @synchronized
+    def reset(self):
+        """清除所有处理记录和统计"""
+        self.state = self._empty_state()
+        self._init_rollup()
+        self._compact()
+
+
+def create_state_manager(
+    state_file: str = "state.json",
+    backend: Optional[str] = None,
+    **options
+) -> StateManager:
+    """
+    根据后端类型创建状态管理器
+
+    Args:
+        state_file: 状态文件路径
+        backend: json、sqlite 或 sharded（默认按路径判断：.db/.sqlite/.sqlite3 使用 SQLite，
+                 目录或以 / 结尾的路径使用分片存储）
+        **options: JSON 后端的选项（write_behind/flush_interval/flush_every/journal/compact_bytes/compact_records）；
+                   分片存储支持 write_behind/flush_interval/flush_every/max_open_shards/compact_records；
+                   SQLite 后端忽略所有选项（设置了 write_behind 或 journal 时记录警告）
+
+    Returns:
+        StateManager 实例
+    """
+    if backend is None:
+        if state_file.endswith((".db", ".sqlite", ".sqlite3")):
+            backend = "sqlite"
+        elif state_file.endswith(("/", os.sep)) or os.path.isdir(state_file):
+            backend = "sharded"
+        else:
+            backend = "json"
+
+    if backend == "sqlite":
+        from .state_sqlite import SQLiteStateManager
+        # 每次状态变化都在事务中直接提交，这些选项没有意义
+        if options.pop("write_behind", False):
+            logger.warning("Write-behind mode is not supported by the sqlite state backend, ignored")
+        if options.pop("journal", False):
+            logger.warning("Journal mode is not supported by the sqlite state backend, ignored")
+        return SQLiteStateManager(state_file)
+    if backend == "sharded":
+        from .state_sharded import ShardedStateManager
+        if options.pop("journal", False):
+            logger.warning("Journal mode is not supported by the sharded state backend, ignored")
+        options.pop("compact_bytes", None)
+        return ShardedStateManager(state_file.rstrip("/" + os.sep) or state_file, **options)
+    options.pop("max_open_shards", None)
+    if backend == "json":
+        return StateManager(state_file, **options)
+
+    raise ValueError(f"Unknown state backend: {backend}")
+
+
+def create_state_manager_from_config(config: Dict) -> StateManager:
+    """
+    根据配置文件创建状态管理器
+
+    Args:
+        config: 完整配置（state_file / state_backend / state_write_behind / state_journal / state_shards / state_records）
+
+    Returns:
+        StateManager 实例
+    """
+    options = {}
+    write_behind = config.get('state_write_behind') or {}
+    if write_behind.get('enabled', False):
+        options = {
+            "write_behind": True,
+            "flush_interval": write_behind.get('flush_interval', 30.0),
+            "flush_every": write_behind.get('flush_every', 50)
+        }
+
+    journal = config.get('state_journal') or {}
+    if journal.get('enabled', False):
+        options["journal"] = True
+        options["compact_bytes"] = int(journal.get('compact_kb', 1024)) * 1024
+
+    shards = config.get('state_shards') or {}
+    if 'max_open' in shards:
+        options["max_open_shards"] = int(shards['max_open'])
+
+    records = config.get('state_records') or {}
+    if records.get('compact', False):
+        options["compact_records"] = True
+
+    return create_state_manager(
+        config.get('state_file', 'state.json'),
+        config.get('state_backend'),
+        **options
+    )
@@ -0,0 +1,495 @@
+"""
+分片状态管理器
+每个项目的处理记录单独保存在一个分片文件里（文件名取项目路径的哈希），
+索引文件只保存统计、项目列表和每个分片的处理时间范围，统计汇总单独保存并批量写盘。分片在第一次访问时才加载，
+内存中只保留最近使用的若干个分片，启动时间和内存占用随活跃项目数增长，而不是随历史总量增长
+"""
+
+import atexit
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .file_lock import load_json, write_json_atomic
+from .rollup import StatsRollup, make_event
+from .serializer import decode_issues, load_file, make_record
+from .state import StateManager, STATISTICS_KEYS, synchronized
+
+
+INDEX_FILE = "index.json"
+ROLLUP_FILE = "rollups.json"
+SHARD_DIR = "shards"
+
+
+def shard_name(project_path: str) -> str:
+    """项目对应的分片文件名（不含扩展名）"""
+    return hashlib.sha1(project_path.encode("utf-8")).hexdigest()[:16]
+
+
+def shard_range(shard: Dict[str, Dict]) -> Optional[List[str]]:
+    """分片中最早和最晚的 processed_at；分片为空时为 None"""
+    if not shard:
+        return None
+    times = [data["processed_at"] for data in shard.values()]
+    return [min(times), max(times)]
+
+
+class ShardedStateManager(StateManager):
+    """按项目分片、按需加载的状态管理器（线程安全）"""
+
+    def __init__(
+        self,
+        state_dir: str = "state.d",
+        write_behind: bool = False,
+        flush_interval: float = 30.0,
+        flush_every: int = 50,
+        max_open_shards: int = 64,
+        compact_records: bool = False
+    ):
+        """
+        初始化状态管理器
+
+        Args:
+            state_dir: 状态目录（包含 index.json 和 shards/）
+            write_behind: 延迟写入模式（同 StateManager）
+            flush_interval: 延迟写入模式下，距上次写盘超过这个秒数时写盘（统计汇总在两种模式下都按这个间隔写盘）
+            flush_every: 延迟写入模式下，累计这么多次变化时写盘（统计汇总在两种模式下都按这个次数写盘）
+            max_open_shards: 内存中最多保留的分片数，超出时丢弃最久未使用的（有未写盘的变化时先写盘）
+            compact_records: 处理记录保存为 ProcessedIssue（同 StateManager）
+        """
+        self.state_file = state_dir
+        self.state_dir = state_dir
+        self.index_file = os.path.join(state_dir, INDEX_FILE)
+        self.rollup_file = os.path.join(state_dir, ROLLUP_FILE)
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.journal = False
+        self.max_open_shards = max(1, max_open_shards)
+        self.compact_records = compact_records
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+        # 项目路径 -> {issue 键: 记录}，按最近使用排序
+        self._shards: "OrderedDict[str, Dict[str, Dict]]" = OrderedDict()
+        self._dirty_shards = set()
+
+        self.state = self._load_state()
+        self._rollup_pending = 0
+        self._rollup_saved_at = time.monotonic()
+        self._rollup = StatsRollup(self._load_rollups())
+
+        # 统计汇总总是批量写盘，退出时写入剩下的变化
+        atexit.register(self.flush)
+        if write_behind:
+            self._flush_on_sigterm()
+
+    def _load_state(self) -> Dict:
+        """加载索引文件（不加载任何分片）"""
+        if os.path.exists(self.index_file):
+            state = load_file(self.index_file)
+            # 旧索引没有时间范围，对应的分片在清理时读取一次并补上
+            state.setdefault("ranges", {})
+            return state
+        return self._empty_state()
+
+    def _load_rollups(self) -> Dict:
+        """加载统计汇总（旧版本保存在索引文件中，下次写盘时移到单独的文件）"""
+        legacy = self.state.pop("rollups", None)
+        if os.path.exists(self.rollup_file):
+            return load_file(self.rollup_file)
+        if legacy:
+            self._rollup_pending += 1
+        return legacy or {}
+
+    def _save_rollups(self):
+        """保存统计汇总文件"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        write_json_atomic(self.rollup_file, self._rollup.data)
+        self._rollup_pending = 0
+        self._rollup_saved_at = time.monotonic()
+
+    @staticmethod
+    def _empty_state() -> Dict:
+        """空索引"""
+        return {
+            "projects": {},
+            "last_run": None,
+            "statistics": dict.fromkeys(STATISTICS_KEYS, 0),
+            # 项目路径 -> [最早 processed_at, 最晚 processed_at]，清理时只读取可能有过期记录的分片
+            "ranges": {}
+        }
+
+    def _save_state(self):
+        """保存索引文件"""
+        self.state["last_run"] = datetime.now().isoformat()
+        os.makedirs(self.state_dir, exist_ok=True)
+        write_json_atomic(self.index_file, self.state)
+
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _shard_path(self, project_path: str) -> str:
+        return os.path.join(self.state_dir, SHARD_DIR, f"{self.state['projects'][project_path]}.json")
+
+    def _read_shard(self, project_path: str) -> Dict[str, Dict]:
+        """从文件读取分片（不放入缓存）"""
+        return decode_issues(
+            load_json(self._shard_path(project_path)).get("issues", {}),
+            self.compact_records
+        )
+
+    def _write_shard(self, project_path: str, shard: Dict[str, Dict]):
+        """把分片写入文件"""
+        path = self._shard_path(project_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_json_atomic(path, {"project": project_path, "issues": shard})
+
+    def _shard(self, project_path: str, create: bool = False) -> Optional[Dict[str, Dict]]:
+        """
+        获取项目的分片，第一次访问时从文件加载
+
+        Args:
+            project_path: 项目路径
+            create: 项目还没有分片时是否创建
+
+        Returns:
+            分片字典；项目没有记录且 create 为 False 时为 None
+        """
+        shard = self._shards.get(project_path)
+        if shard is not None:
+            self._shards.move_to_end(project_path)
+            return shard
+
+        if project_path in self.state["projects"]:
+            shard = self._read_shard(project_path)
+        elif create:
+            self.state["projects"][project_path] = shard_name(project_path)
+            shard = {}
+        else:
+            return None
+
+        self._shards[project_path] = shard
+        while len(self._shards) > self.max_open_shards:
+            evicted_path, evicted = self._shards.popitem(last=False)
+            if evicted_path in self._dirty_shards:
+                self._write_shard(evicted_path, evicted)
+                self._dirty_shards.discard(evicted_path)
+        return shard
+
+    def _iter_shards(self) -> Iterator[Tuple[str, Dict[str, Dict]]]:
+        """依次访问所有分片（未打开的分片读取后不放入缓存）"""
+        for project_path in list(self.state["projects"]):
+            shard = self._shards.get(project_path)
+            yield project_path, shard if shard is not None else self._read_shard(project_path)
+
+    def _note_range(self, project_path: str, shard: Dict[str, Dict], processed_at: str):
+        """记录分片中的一个 processed_at，更新分片的时间范围"""
+        ranges = self.state["ranges"]
+        if project_path in ranges:
+            low, high = ranges[project_path]
+            ranges[project_path] = [min(low, processed_at), max(high, processed_at)]
+        else:
+            ranges[project_path] = shard_range(shard)
+
+    def _write_dirty(self, rollups: bool = True):
+        """
+        把有变化的分片和索引写盘
+
+        Args:
+            rollups: 是否同时写入统计汇总
+        """
+        for project_path in self._dirty_shards:
+            if project_path in self._shards:
+                self._write_shard(project_path, self._shards[project_path])
+        self._dirty_shards.clear()
+        self._save_state()
+        if rollups and self._rollup_pending:
+            self._save_rollups()
+
+    def _shard_changed(self, project_path: str):
+        """记录一次分片变化：立即写盘，或在延迟写入模式下按需批量写盘（统计汇总总是批量写盘）"""
+        self._dirty_shards.add(project_path)
+        self._rollup_pending += 1
+        if not self.write_behind:
+            self._write_dirty(
+                rollups=self._rollup_pending >= self.flush_every
+                or time.monotonic() - self._rollup_saved_at >= self.flush_interval
+            )
+            return
+
+        self._pending += 1
+        if (self._pending >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self._write_dirty()
+
+    @synchronized
+    def flush(self):
+        """把尚未写盘的状态变化写入文件"""
+        if self._pending or self._dirty_shards or self._rollup_pending:
+            self._write_dirty()
+
+    @synchronized
+    def is_processed(self, project_path: str, issue_iid: int) -> bool:
+        """
+        检查 issue 是否已处理（没有记录的项目不会加载任何文件）
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            是否已处理
+        """
+        shard = self._shard(project_path)
+        return shard is not None and self.get_issue_key(project_path, issue_iid) in shard
+
+    @synchronized
+    def get_issue(self, project_path: str, issue_iid: int) -> Optional[Dict]:
+        """
+        获取 issue 的处理记录
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            记录字典的副本或 None
+        """
+        shard = self._shard(project_path)
+        issue_data = shard.get(self.get_issue_key(project_path, issue_iid)) if shard else None
+        return dict(issue_data) if issue_data else None
+
+    @synchronized
+    def get_issue_status(self, project_path: str, issue_iid: int) -> Optional[str]:
+        """
+        获取 issue 处理状态
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            状态字符串或 None
+        """
+        issue_data = self.get_issue(project_path, issue_iid)
+        return issue_data.get("status") if issue_data else None
+
+    @synchronized
+    def mark_processed(
+        self,
+        project_path: str,
+        issue_iid: int,
+        status: str,
+        **kwargs
+    ):
+        """
+        标记 issue 为已处理
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+            status: 状态 (completed/waiting_for_info/in_progress/failed)
+            **kwargs: 其他要保存的信息
+        """
+        shard = self._shard(project_path, create=True)
+        key = self.get_issue_key(project_path, issue_iid)
+        shard[key] = make_record({
+            "status": status,
+            "processed_at": datetime.now().isoformat(),
+            **kwargs
+        }, self.compact_records)
+
+        # 更新统计
+        self._note_range(project_path, shard, shard[key]["processed_at"])
+        self._rollup.record(make_event(key, shard[key]))
+        self.state["statistics"]["total"] += 1
+        if status in self.state["statistics"]:
+            self.state["statistics"][status] += 1
+
+        self._shard_changed(project_path)
+
+    @synchronized
+    def update_issue_status(
+        self,
+        project_path: str,
+        issue_iid: int,
+        status: str,
+        **kwargs
+    ):
+        """
+        更新 issue 状态
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+            status: 新状态
+            **kwargs: 要更新的其他信息
+        """
+        shard = self._shard(project_path)
+        key = self.get_issue_key(project_path, issue_iid)
+        if shard is None or key not in shard:
+            return
+
+        old_status = shard[key]["status"]
+        shard[key].update({
+            "status": status,
+            "updated_at": datetime.now().isoformat(),
+            **kwargs
+        })
+
+        # 更新统计
+        self._note_range(project_path, shard, shard[key]["processed_at"])
+        self._rollup.record(make_event(key, shard[key]))
+        if old_status in self.state["statistics"]:
+            self.state["statistics"][old_status] -= 1
+        if status in self.state["statistics"]:
+            self.state["statistics"][status] += 1
+
+        self._shard_changed(project_path)
+
+    @synchronized
+    def get_all_processed_issues(self) -> Dict:
+        """
+        获取所有已处理的 issues（会读取全部分片）
+
+        Returns:
+            已处理 issues 字典
+        """
+        issues = {}
+        for _, shard in self._iter_shards():
+            issues.update(shard)
+        return issues
+
+    @synchronized
+    def clear_old_issues(
+        self,
+        days: Optional[int] = 30,
+        policies: Optional[Dict[str, Optional[int]]] = None
+    ) -> int:
+        """
+        清除旧的已处理 issues（只读取最早记录已经过期的分片，清空的分片连同文件一起删除）
+
+        Args:
+            days: 保留最近 N 天的记录（为 None 时，没有单独策略的状态不清理）
+            policies: 按状态单独设置的保留天数，值为 None 表示永久保留
+
+        Returns:
+            删除的记录数
+        """
+        policies = policies or {}
+        now = datetime.now()
+        cutoffs: Dict[str, Optional[str]] = {}
+
+        def cutoff(status: str) -> Optional[str]:
+            if status not in cutoffs:
+                keep_days = policies.get(status, days)
+                cutoffs[status] = None if keep_days is None else (now - timedelta(days=keep_days)).isoformat()
+            return cutoffs[status]
+
+        # 保留天数最短的策略对应最晚的截止时间，最早记录不早于它的分片不会有过期记录
+        keep = [value for value in (days, *policies.values()) if value is not None]
+        if not keep:
+            return 0
+        latest_cutoff = (now - timedelta(days=min(keep))).isoformat()
+
+        ranges = self.state["ranges"]
+        removed = 0
+        ranges_added = False
+        for project_path in list(self.state["projects"]):
+            if project_path in ranges and ranges[project_path][0] >= latest_cutoff:
+                continue
+
+            shard = self._shards.get(project_path)
+            if shard is None:
+                shard = self._read_shard(project_path)
+
+            expired = [
+                key for key, data in shard.items()
+                if cutoff(data["status"]) is not None and data["processed_at"] < cutoff(data["status"])
+            ]
+            if not expired:
+                if project_path not in ranges:
+                    ranges[project_path] = shard_range(shard)
+                    ranges_added = True
+                continue
+
+            for key in expired:
+                del shard[key]
+            removed += len(expired)
+
+            if not shard:
+                os.remove(self._shard_path(project_path))
+                del self.state["projects"][project_path]
+                ranges.pop(project_path, None)
+                self._shards.pop(project_path, None)
+                self._dirty_shards.discard(project_path)
+                continue
+
+            ranges[project_path] = shard_range(shard)
+            if project_path in self._shards:
+                self._dirty_shards.add(project_path)
+            else:
+                self._write_shard(project_path, shard)
+
+        if removed:
+            self._write_dirty(rollups=False)
+        elif ranges_added:
+            self._save_state()
+        return removed
+
+    @synchronized
+    def reset(self):
+        """清除所有处理记录和统计"""
+        self.state = self._empty_state()
+        self._rollup = StatsRollup({})
+        self._shards.clear()
+        self._dirty_shards.clear()
+        shutil.rmtree(os.path.join(self.state_dir, SHARD_DIR), ignore_errors=True)
+        self._save_state()
+        self._save_rollups()
+
+    @synchronized
+    def import_json_state(self, json_file: str) -> int:
+        """
+        导入 JSON 状态文件中的记录（已有的同名记录会被覆盖），并按全部记录重建统计汇总
+
+        Args:
+            json_file: StateManager 使用的 JSON 状态文件
+
+        Returns:
+            导入的记录数
+        """
+        state = load_file(json_file)
+
+        by_project: Dict[str, Dict[str, Dict]] = {}
+        for key, data in decode_issues(state.get("processed_issues", {}), self.compact_records).items():
+            by_project.setdefault(key.rpartition("#")[0], {})[key] = data
+
+        for project_path, records in by_project.items():
+            shard = self._shard(project_path, create=True)
+            shard.update(records)
+            self.state["ranges"][project_path] = shard_range(shard)
+            self._write_shard(project_path, shard)
+            self._dirty_shards.discard(project_path)
+
+        self.state["statistics"].update(state.get("statistics", {}))
+
+        self._rollup = StatsRollup({})
+        records = sorted(
+            self.get_all_processed_issues().items(),
+            key=lambda item: item[1]["processed_at"]
+        )
+        for key, data in records:
+            self._rollup.record(make_event(key, data))
+
+        self._save_state()
+        self._save_rollups()
+        return sum(len(records) for records in by_project.values())
@@ -0,0 +1,507 @@
+"""
+SQLite 状态管理器
+与 StateManager 接口相同，每个 issue 一行（按项目路径 + IID 索引），
+状态变化只写入对应的一行，不随已处理 issues 数量增长而变慢。
+数据库使用 WAL 模式，多个进程（webhook、cron）可以同时读写，
+并通过同一个库里的租约表保证同一时间只有一个 worker 处理某个 issue
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .leases import IssueLeaseStore, connect
+from .serializer import decode, encode, load_file
+from .rollup import DIMENSIONS, HOUR_BUCKETS, DAY_BUCKETS, bucket_keys, choose_buckets, make_event
+from .state import StateManager, STATISTICS_KEYS
+
+
+class SQLiteStateManager(StateManager):
+    """基于 SQLite 的状态管理器（线程安全、多进程安全）"""
+
+    def __init__(self, state_file: str = "state.db", worker_id: Optional[str] = None):
+        """
+        初始化状态管理器
+
+        Args:
+            state_file: 数据库文件路径
+            worker_id: 认领 issue 时使用的 worker 标识（默认为 主机名:PID）
+        """
+        self.state_file = state_file
+        self._lock = threading.Lock()
+
+        self._conn = connect(state_file)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS issues (
+                    project_path TEXT NOT NULL,
+                    iid INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    processed_at TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (project_path, iid)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_issues_status ON issues (status)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_issues_processed_at ON issues (processed_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_issues_status_processed_at "
+                "ON issues (status, processed_at)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS statistics (
+                    name TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollups (
+                    granularity TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (granularity, bucket, dimension, value)
+                )
+                """
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO statistics (name, count) VALUES (?, 0)",
+                [(name,) for name in STATISTICS_KEYS]
+            )
+
+            # 升级前创建的库没有汇总数据，按已有记录回填一次
+            if (self._conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None
+                    and self._conn.execute("SELECT 1 FROM issues LIMIT 1").fetchone() is not None):
+                self._backfill_rollups()
+
+        self.leases = IssueLeaseStore(state_file, worker_id)
+
+    def _touch(self):
+        """记录最近一次写入时间（调用方在事务中）"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_run', ?)",
+            (datetime.now().isoformat(),)
+        )
+
+    def _increment(self, name: str, delta: int):
+        """更新统计计数，不在统计字段中的状态忽略（调用方在事务中）"""
+        self._conn.execute(
+            "UPDATE statistics SET count = count + ? WHERE name = ?",
+            (delta, name)
+        )
+
+    def _record_rollup(self, project_path: str, issue_iid: int, record: Dict):
+        """把一次状态变化累加到时间桶，并删除超出保留范围的时间桶（调用方在事务中）"""
+        event = make_event(self.get_issue_key(project_path, issue_iid), record)
+
+        rows = []
+        for granularity, bucket in bucket_keys(event["at"]).items():
+            rows.append((granularity, bucket, "total", ""))
+            rows.extend((granularity, bucket, dim, event[dim]) for dim in DIMENSIONS)
+        self._conn.executemany(
+            """
+            INSERT INTO rollups (granularity, bucket, dimension, value, count) VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (granularity, bucket, dimension, value) DO UPDATE SET count = count + 1
+            """,
+            rows
+        )
+
+        now = datetime.now()
+        self._conn.execute(
+            "DELETE FROM rollups WHERE granularity = 'hour' AND bucket < ?",
+            (bucket_keys((now - timedelta(hours=HOUR_BUCKETS)).isoformat())["hour"],)
+        )
+        self._conn.execute(
+            "DELETE FROM rollups WHERE granularity = 'day' AND bucket < ?",
+            (bucket_keys((now - timedelta(days=DAY_BUCKETS)).isoformat())["day"],)
+        )
+
+    def _backfill_rollups(self):
+        """按现有记录重建汇总（调用方在事务中）"""
+        self._conn.execute("DELETE FROM rollups")
+        rows = self._conn.execute(
+            "SELECT project_path, iid, status, processed_at, data FROM issues ORDER BY processed_at"
+        ).fetchall()
+        for project_path, iid, *row in rows:
+            self._record_rollup(project_path, iid, self._row_to_issue(row))
+
+    def is_processed(self, project_path: str, issue_iid: int) -> bool:
+        """
+        检查 issue 是否已处理
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            是否已处理
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM issues WHERE project_path = ? AND iid = ?",
+                (project_path, issue_iid)
+            ).fetchone()
+        return row is not None
+
+    def get_issue(self, project_path: str, issue_iid: int) -> Optional[Dict]:
+        """
+        获取 issue 的处理记录
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            记录字典或 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, processed_at, data FROM issues WHERE project_path = ? AND iid = ?",
+                (project_path, issue_iid)
+            ).fetchone()
+        return self._row_to_issue(row) if row else None
+
+    def get_issue_status(self, project_path: str, issue_iid: int) -> Optional[str]:
+        """
+        获取 issue 处理状态
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+
+        Returns:
+            状态字符串或 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM issues WHERE project_path = ? AND iid = ?",
+                (project_path, issue_iid)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark_processed(
+        self,
+        project_path: str,
+        issue_iid: int,
+        status: str,
+        **kwargs
+    ):
+        """
+        标记 issue 为已处理
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+            status: 状态 (completed/waiting_for_info/in_progress/failed)
+            **kwargs: 其他要保存的信息
+        """
+        processed_at = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO issues (project_path, iid, status, processed_at, data)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    project_path,
+                    issue_iid,
+                    status,
+                    processed_at,
+                    encode(kwargs).decode("utf-8")
+                )
+            )
+            self._record_rollup(
+                project_path, issue_iid,
+                {"status": status, "processed_at": processed_at, **kwargs}
+            )
+            self._increment("total", 1)
+            self._increment(status, 1)
+            self._touch()
+
+    def update_issue_status(
+        self,
+        project_path: str,
+        issue_iid: int,
+        status: str,
+        **kwargs
+    ):
+        """
+        更新 issue 状态
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+            status: 新状态
+            **kwargs: 要更新的其他信息
+        """
+        with self._lock, self._conn:
+            # 先拿写锁再读旧状态，避免其他进程在读和写之间修改同一行
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT status, data FROM issues WHERE project_path = ? AND iid = ?",
+                (project_path, issue_iid)
+            ).fetchone()
+            if row is None:
+                return
+
+            old_status, data = row
+            data = decode(data)
+            data.update(kwargs)
+            data["updated_at"] = datetime.now().isoformat()
+
+            self._conn.execute(
+                "UPDATE issues SET status = ?, data = ? WHERE project_path = ? AND iid = ?",
+                (status, encode(data).decode("utf-8"), project_path, issue_iid)
+            )
+            self._record_rollup(project_path, issue_iid, {"status": status, **data})
+            self._increment(old_status, -1)
+            self._increment(status, 1)
+            self._touch()
+
+    def get_statistics(self) -> Dict:
+        """
+        获取处理统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT name, count FROM statistics").fetchall()
+        return dict(rows)
+
+    def get_rollup(self, since: datetime, by: str = "status") -> Dict:
+        """
+        按时间桶汇总 since 之后的状态变化（不遍历处理记录）
+
+        Args:
+            since: 起始时间
+            by: 分组维度 (status/project/action)
+
+        Returns:
+            {"total": 总数, "by": {分组值: 数量}, "granularity": 时间桶粒度}
+        """
+        granularity, start = choose_buckets(since)
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT dimension, value, SUM(count) FROM rollups
+                WHERE granularity = ? AND bucket >= ? AND dimension IN ('total', ?)
+                GROUP BY dimension, value
+                """,
+                (granularity, start, by)
+            ).fetchall()
+
+        total = 0
+        groups = {}
+        for dimension, value, count in rows:
+            if dimension == "total":
+                total = count
+            else:
+                groups[value] = count
+        return {"total": total, "by": groups, "granularity": granularity}
+
+    def get_recent_issues(self, limit: int = 5) -> List[Tuple[str, str, str]]:
+        """
+        最近处理的 issues（通过 processed_at 索引读取，时间相同时按 issue 键倒序，与 JSON 后端一致）
+
+        Args:
+            limit: 条数
+
+        Returns:
+            [(issue 键, 状态, 处理时间)]，最新的在前
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT project_path, iid, status, processed_at FROM issues "
+                "ORDER BY processed_at DESC, project_path || '#' || iid DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            (self.get_issue_key(project_path, iid), status, processed_at)
+            for project_path, iid, status, processed_at in rows
+        ]
+
+    def _row_to_issue(self, row) -> Dict:
+        """数据库行转换为与 JSON 状态文件相同结构的字典"""
+        status, processed_at, data = row
+        return {"status": status, "processed_at": processed_at, **decode(data)}
+
+    def get_all_processed_issues(self) -> Dict:
+        """
+        获取所有已处理的 issues
+
+        Returns:
+            已处理 issues 字典
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT project_path, iid, status, processed_at, data FROM issues"
+            ).fetchall()
+        return {
+            self.get_issue_key(project_path, iid): self._row_to_issue(row)
+            for project_path, iid, *row in rows
+        }
+
+    def clear_old_issues(
+        self,
+        days: Optional[int] = 30,
+        policies: Optional[Dict[str, Optional[int]]] = None
+    ) -> int:
+        """
+        清除旧的已处理 issues（通过 (status, processed_at) 索引只访问过期记录）
+
+        Args:
+            days: 保留最近 N 天的记录（为 None 时，没有单独策略的状态不清理）
+            policies: 按状态单独设置的保留天数，值为 None 表示永久保留
+
+        Returns:
+            删除的记录数
+        """
+        policies = policies or {}
+        now = datetime.now()
+
+        def cutoff(keep_days: int) -> str:
+            return (now - timedelta(days=keep_days)).isoformat()
+
+        removed = 0
+        with self._lock, self._conn:
+            for status, keep_days in policies.items():
+                if keep_days is not None:
+                    removed += self._conn.execute(
+                        "DELETE FROM issues WHERE status = ? AND processed_at < ?",
+                        (status, cutoff(keep_days))
+                    ).rowcount
+
+            if days is not None:
+                placeholders = ", ".join("?" * len(policies))
+                removed += self._conn.execute(
+                    f"DELETE FROM issues WHERE processed_at < ? AND status NOT IN ({placeholders})",
+                    (cutoff(days), *policies)
+                ).rowcount
+
+            if removed:
+                self._touch()
+        return removed
+
+    def get_deferred(self) -> List[str]:
+        """
+        上次运行因预算用完而延期的 issues
+
+        Returns:
+            issue 键列表
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'deferred'").fetchone()
+        return decode(row[0]) if row else []
+
+    def set_deferred(self, keys: List[str]):
+        """
+        记录延期的 issues（覆盖上次的记录）
+
+        Args:
+            keys: issue 键列表
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('deferred', ?)",
+                (encode(list(keys)).decode("utf-8"),)
+            )
+
+    def reset(self):
+        """清除所有处理记录和统计"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM issues")
+            self._conn.execute("DELETE FROM statistics")
+            self._conn.execute("DELETE FROM rollups")
+            self._conn.execute("DELETE FROM meta WHERE key = 'deferred'")
+            self._conn.executemany(
+                "INSERT INTO statistics (name, count) VALUES (?, 0)",
+                [(name,) for name in STATISTICS_KEYS]
+            )
+            self._touch()
+
+    def import_json_state(self, json_file: str) -> int:
+        """
+        从 JSON 状态文件一次性导入（覆盖同名记录和统计）
+
+        Args:
+            json_file: StateManager 使用的 state.json
+
+        Returns:
+            导入的 issue 数量
+        """
+        state = load_file(json_file)
+
+        rows = []
+        for key, issue in state.get("processed_issues", {}).items():
+            project_path, _, iid = key.rpartition("#")
+            data = dict(issue)
+            status = data.pop("status")
+            processed_at = data.pop("processed_at", None) or datetime.now().isoformat()
+            rows.append((
+                project_path,
+                int(iid),
+                status,
+                processed_at,
+                encode(data).decode("utf-8")
+            ))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO issues (project_path, iid, status, processed_at, data)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO statistics (name, count) VALUES (?, ?)",
+                list(state.get("statistics", {}).items())
+            )
+            self._backfill_rollups()
+            self._touch()
+
+        return len(rows)
+
+    def claim_issue(self, project_path: str, issue_iid: int, lease_seconds: float = 900) -> bool:
+        """
+        认领 issue，同一时间只有一个 worker 能认领成功
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+            lease_seconds: 租约有效期（秒）
+
+        Returns:
+            是否认领成功
+        """
+        return self.leases.claim(self.get_issue_key(project_path, issue_iid), lease_seconds)
+
+    def release_issue(self, project_path: str, issue_iid: int):
+        """
+        释放 issue 租约
+
+        Args:
+            project_path: 项目路径
+            issue_iid: Issue IID
+        """
+        self.leases.release(self.get_issue_key(project_path, issue_iid))
+
+    def flush(self):
+        """每次状态变化都已在事务中提交，无需额外写盘"""
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,125 @@
+"""
+GitHub token 池
+每个 token 有独立的速率限制调度器，请求总是发给剩余配额最多的 token，
+某个 token 失效或被限流时自动切换到其他 token，整体吞吐随 token 数量增加
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .ratelimit import RateLimiter
+
+
+class TokenPool:
+    """按剩余配额路由请求的 token 池（线程安全）"""
+
+    def __init__(self, tokens: List[str], rate_limiter: Optional[RateLimiter] = None):
+        """
+        初始化 token 池
+
+        Args:
+            tokens: token 列表
+            rate_limiter: 只有一个 token 时可以传入共享的调度器
+        """
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            raise ValueError("Must provide at least one token")
+
+        self.tokens = tokens
+        self.limiters: Dict[str, RateLimiter] = {}
+        for token in tokens:
+            if rate_limiter and len(tokens) == 1:
+                self.limiters[token] = rate_limiter
+            else:
+                self.limiters[token] = RateLimiter()
+
+        self._invalid = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tokens) - len(self._invalid)
+
+    def acquire(self, resource: str = "core", owner: Optional[str] = None) -> Tuple[str, RateLimiter]:
+        """
+        选出剩余配额最多的 token
+
+        所有 token 都没有余量时，返回最早恢复的那个（由其调度器负责等待）。
+
+        Args:
+            resource: 主配额类别
+            owner: 仓库所有者（token 池不区分 owner，仅为与 GitHubAppAuth 接口一致）
+
+        Returns:
+            (token, 该 token 的调度器)
+
+        Raises:
+            RuntimeError: 所有 token 都已失效
+        """
+        with self._lock:
+            valid = [token for token in self.tokens if token not in self._invalid]
+        if not valid:
+            raise RuntimeError("All GitHub tokens are invalid (401)")
+
+        best = max(valid, key=lambda token: self.limiters[token].headroom(resource))
+        if self.limiters[best].headroom(resource) > 0:
+            return best, self.limiters[best]
+
+        earliest = min(valid, key=lambda token: self.limiters[token].available_at(resource))
+        return earliest, self.limiters[earliest]
+
+    def has_headroom(self, resource: str = "core", exclude: Optional[str] = None) -> bool:
+        """
+        除 exclude 之外是否还有可以立即使用的 token
+
+        Args:
+            resource: 主配额类别
+            exclude: 排除的 token
+
+        Returns:
+            是否存在有余量的 token
+        """
+        with self._lock:
+            valid = [token for token in self.tokens if token not in self._invalid]
+        return any(
+            self.limiters[token].headroom(resource) > 0
+            for token in valid if token != exclude
+        )
+
+    def invalidate(self, token: str) -> bool:
+        """
+        将 token 移出轮换（如返回 401）
+
+        最后一个可用的 token 不会被移出，避免一次偶发的 401 让客户端永久不可用。
+
+        Args:
+            token: 失效的 token
+
+        Returns:
+            是否已移出（即重试时会换成其他 token）
+        """
+        with self._lock:
+            if token in self._invalid:
+                return True
+            if len(self.tokens) - len(self._invalid) <= 1:
+                return False
+            self._invalid.add(token)
+            return True
+
+    @staticmethod
+    def mask(token: str) -> str:
+        """日志和指标里只显示 token 的末尾几位"""
+        return f"...{token[-4:]}"
+
+    def get_metrics(self) -> Dict:
+        """
+        获取每个 token 的配额指标
+
+        Returns:
+            以脱敏 token 为键的指标字典
+        """
+        metrics = {}
+        for token in self.tokens:
+            token_metrics = self.limiters[token].get_metrics()
+            token_metrics["invalid"] = token in self._invalid
+            metrics[self.mask(token)] = token_metrics
+        return metrics
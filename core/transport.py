@@ -0,0 +1,202 @@
+"""
+HTTP 传输层
+GitHubClient / GitLabClient 共用的 Session 工厂：连接池大小与并发数匹配，
+幂等请求遇到 5xx/429 和连接错误时按带抖动的指数退避自动重试，
+所有请求都有连接/读取超时，并统计每个主机的连接复用情况
+"""
+
+import inspect
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .http_cache import CachingSession, HTTPCache
+
+
+# 默认重试的状态码
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# GitHubClient 由 RateLimiter 处理 429（需要切换 token、更新配额），传输层只重试 5xx
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+# (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (5, 30)
+
+# urllib3 2.x 才支持 backoff_jitter
+_RETRY_SUPPORTS_JITTER = "backoff_jitter" in inspect.signature(Retry.__init__).parameters
+
+
+class ForcelistRetry(Retry):
+    """
+    只重试 status_forcelist 中的状态码
+
+    urllib3 默认对带 Retry-After 的 413/429/503 一律在连接层等待并重试，
+    GitHubClient 的 429 会因此绕过 RateLimiter、token 切换和限流统计；
+    这里去掉这条规则，Retry-After 只用于决定 status_forcelist 内状态码的等待时间。
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset()
+
+
+class APISession(CachingSession):
+    """带默认超时和连接复用统计的 Session"""
+
+    def __init__(
+        self,
+        cache: Optional[HTTPCache] = None,
+        timeout: Union[float, Tuple[float, float], None] = DEFAULT_TIMEOUT
+    ):
+        """
+        初始化 Session
+
+        Args:
+            cache: HTTP 缓存（可选）
+            timeout: 请求没有指定 timeout 时使用的默认值
+        """
+        super().__init__(cache)
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+    def get_connection_metrics(self) -> Dict[str, Dict]:
+        """
+        获取每个主机的连接复用统计
+
+        Returns:
+            以主机名为键的字典：requests 为请求数，connections 为新建连接数，
+            reused 为复用已有连接的请求数
+        """
+        metrics: Dict[str, Dict] = {}
+        # 同一个 adapter 同时挂载在 http:// 和 https:// 上，只统计一次
+        adapters = {id(adapter): adapter for adapter in self.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{pool.host}:{pool.port}" if pool.port else pool.host
+                entry = metrics.setdefault(host, {"requests": 0, "connections": 0})
+                entry["requests"] += pool.num_requests
+                entry["connections"] += pool.num_connections
+
+        for entry in metrics.values():
+            entry["reused"] = max(entry["requests"] - entry["connections"], 0)
+        return metrics
+
+
+def create_retry(
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    retry_statuses: Iterable[int] = RETRY_STATUSES
+) -> Retry:
+    """
+    创建重试策略
+
+    只重试幂等方法（GET/HEAD/PUT/DELETE/OPTIONS/TRACE），POST 创建评论等请求
+    不会被自动重放；重试 retry_statuses 中的状态码时，服务端返回了 Retry-After 就按其等待，
+    不在 retry_statuses 中的状态码（如 GitHub 的 429）即使带 Retry-After 也直接返回给调用方。
+
+    Args:
+        max_retries: 最多重试次数
+        backoff_factor: 指数退避基数（第 n 次重试等待约 backoff_factor * 2^(n-1) 秒）
+        retry_statuses: 需要重试的状态码
+
+    Returns:
+        ForcelistRetry
+    """
+    kwargs = {}
+    if _RETRY_SUPPORTS_JITTER:
+        kwargs["backoff_jitter"] = backoff_factor
+
+    return ForcelistRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=tuple(retry_statuses),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        # 重试用完后返回最后一个响应，由调用方 raise_for_status
+        raise_on_status=False,
+        **kwargs
+    )
+
+
+def create_session(
+    cache: Optional[HTTPCache] = None,
+    pool_maxsize: int = 10,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    timeout: Union[float, Tuple[float, float], None] = DEFAULT_TIMEOUT,
+    retry_statuses: Iterable[int] = RETRY_STATUSES
+) -> APISession:
+    """
+    创建 API 客户端使用的 Session
+
+    Args:
+        cache: HTTP 缓存（可选）
+        pool_maxsize: 每个主机保持的最大连接数（应不小于并发处理的线程数）
+        max_retries: 幂等请求的最多重试次数
+        backoff_factor: 指数退避基数（秒）
+        timeout: 默认超时，(连接超时, 读取超时) 或单个秒数
+        retry_statuses: 需要重试的状态码
+
+    Returns:
+        APISession
+    """
+    session = APISession(cache, timeout=timeout)
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_maxsize,
+        pool_maxsize=pool_maxsize,
+        max_retries=create_retry(max_retries, backoff_factor, retry_statuses)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def get_max_workers(config: Dict) -> int:
+    """
+    配置文件 processing 部分的并发处理数
+
+    Args:
+        config: 完整配置
+
+    Returns:
+        同时处理的 issues 数（至少为 1）
+    """
+    processing = config.get('processing') or {}
+    return max(1, int(processing.get('max_workers', 1)))
+
+
+def create_session_from_config(config: Dict, cache: Optional[HTTPCache] = None) -> APISession:
+    """
+    根据配置文件的 http 部分创建 Session
+
+    连接池大小不小于 processing.max_workers，并发处理时每个 worker 都能拿到连接。
+
+    Args:
+        config: 完整配置
+        cache: HTTP 缓存（可选）
+
+    Returns:
+        APISession
+    """
+    http_config = config.get('http', {}) or {}
+    return create_session(
+        cache=cache,
+        pool_maxsize=max(http_config.get('pool_maxsize', 10), get_max_workers(config)),
+        max_retries=http_config.get('max_retries', 3),
+        backoff_factor=http_config.get('backoff_factor', 0.5),
+        timeout=(
+            http_config.get('connect_timeout', DEFAULT_TIMEOUT[0]),
+            http_config.get('read_timeout', DEFAULT_TIMEOUT[1])
+        )
+    )
@@ -0,0 +1,85 @@
+"""
+增量轮询水位线
+按仓库记录上次看到的最大 updated_at，下次只拉取之后更新过的 issues；
+定期做一次全量同步，兜底增量查询可能漏掉的变化
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from .file_lock import file_lock, load_json, write_json_atomic
+
+
+class WatermarkStore:
+    """按仓库保存 issue 更新时间水位线"""
+
+    def __init__(self, path: str, full_resync_interval: timedelta = timedelta(hours=24)):
+        """
+        初始化水位线存储
+
+        Args:
+            path: 水位线文件路径
+            full_resync_interval: 全量同步间隔
+        """
+        self.path = path
+        self.full_resync_interval = full_resync_interval
+        self.marks: Dict[str, Dict] = load_json(path)
+        # 本进程推进过、还没保存的仓库
+        self._dirty = set()
+
+    def save(self):
+        """
+        保存到文件
+
+        在文件锁保护下重新读取文件，只合并本进程推进过的仓库（每个字段取较晚的时间），
+        再原子替换：多个进程同时运行时不会覆盖或回退对方的水位线，写到一半中断也不会损坏文件
+        """
+        with file_lock(self.path):
+            marks = load_json(self.path)
+            for repo_key in self._dirty:
+                merged = dict(marks.get(repo_key) or {})
+                for name, value in self.marks[repo_key].items():
+                    if value and value > (merged.get(name) or ""):
+                        merged[name] = value
+                marks[repo_key] = merged
+            write_json_atomic(self.path, marks, pretty=True)
+        self.marks = marks
+        self._dirty.clear()
+
+    def get_since(self, repo_key: str) -> Optional[str]:
+        """
+        获取增量查询的起始时间
+
+        Args:
+            repo_key: 仓库标识 (如 "owner/repo")
+
+        Returns:
+            ISO 8601 时间；没有水位线或到了全量同步时间时返回 None
+        """
+        mark = self.marks.get(repo_key)
+        if not mark or not mark.get("since") or not mark.get("last_full_sync"):
+            return None
+
+        last_full_sync = datetime.fromisoformat(mark["last_full_sync"])
+        if datetime.now() - last_full_sync >= self.full_resync_interval:
+            return None
+
+        return mark["since"]
+
+    def advance(self, repo_key: str, max_updated_at: Optional[str], full_sync: bool):
+        """
+        本轮处理成功后推进水位线
+
+        Args:
+            repo_key: 仓库标识
+            max_updated_at: 本轮看到的最大 updated_at（没有看到 issue 时为 None）
+            full_sync: 本轮是否为全量同步
+        """
+        mark = self.marks.setdefault(repo_key, {})
+        self._dirty.add(repo_key)
+
+        if max_updated_at and max_updated_at > mark.get("since", ""):
+            mark["since"] = max_updated_at
+
+        if full_sync:
+            mark["last_full_sync"] = datetime.now().isoformat()
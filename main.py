@@ -14,7 +14,14 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from core.gitlab import GitLabClient
 from core.agent import IssueAgent
-from core.state import StateManager
+from core.pipeline import create_pipeline
+from core.scheduler import create_scheduler
+from core.state import create_state_manager_from_config
+from core.blobstore import create_blob_store
+from core.budget import create_budget
+from core.checkpoint import create_checkpoint
+from core.http_cache import HTTPCache
+from core.transport import create_session_from_config, get_max_workers
 from providers.claude import ClaudeProvider
 
 
@@ -60,6 +67,18 @@ def create_ai_provider(config: dict):
         raise ValueError(f"不支持的 AI provider 类型: {provider_type}")
 
 
+def create_http_cache(config: dict):
+    """根据配置创建 HTTP 条件请求缓存（未启用时返回 None）"""
+    cache_config = config.get('http_cache', {})
+    if not cache_config.get('enabled', False):
+        return None
+
+    return HTTPCache(
+        path=cache_config.get('path', 'logs/http_cache.db'),
+        max_size=int(cache_config.get('max_size_mb', 50)) * 1024 * 1024
+    )
+
+
 def print_banner():
     """打印欢迎信息"""
     print("""
@@ -84,6 +103,8 @@ def print_statistics(stats: dict):
     print(f"  ❓ 等待信息: {stats.get('waiting_for_info', 0)}")
     print(f"  ⏭️  跳过: {stats.get('skipped', 0)}")
     print(f"  ❌ 失败: {stats.get('failed', 0)}")
+    if stats.get('deferred'):
+        print(f"  ⏳ 延期到下次运行: {stats['deferred']}")
 
     if stats['total'] > 0:
         success_rate = (stats.get('completed', 0) / stats['total']) * 100
@@ -110,6 +131,11 @@ def main():
         action='store_true',
         help='试运行模式（不实际执行）'
     )
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help='忽略上次中断留下的检查点，重新开始'
+    )
 
     args = parser.parse_args()
 
@@ -129,7 +155,7 @@ def main():
     logger = logging.getLogger(__name__)
 
     # 创建状态管理器
-    state_manager = StateManager(config.get('state_file', 'state.json'))
+    state_manager = create_state_manager_from_config(config)
 
     # 如果只是查看统计
     if args.stats:
@@ -139,9 +165,11 @@ def main():
 
     # 创建 GitLab 客户端
     gitlab_config = config['gitlab']
+    http_cache = create_http_cache(config)
     gitlab_client = GitLabClient(
         url=gitlab_config['url'],
-        token=gitlab_config['access_token']
+        token=gitlab_config['access_token'],
+        session=create_session_from_config(config, http_cache)
     )
 
     # 创建 AI Provider
@@ -152,19 +180,41 @@ def main():
         sys.exit(1)
 
     # 创建 Agent
-    agent = IssueAgent(gitlab_client, ai_provider, state_manager)
+    agent = IssueAgent(
+        gitlab_client, ai_provider, state_manager, create_blob_store(config),
+        max_workers=get_max_workers(config),
+        scheduler=create_scheduler(config),
+        budget=create_budget(config),
+        checkpoint=create_checkpoint(config, resume=False if args.no_resume else None)
+    )
+    # 启用 pipeline 时，获取、分析、执行分阶段并发进行
+    runner = create_pipeline(agent, config) or agent
 
     # 开始处理
     logger.info("🚀 开始处理 issues...\n")
 
     try:
-        results = agent.process_all_issues(
+        results = runner.process_all_issues(
             username=gitlab_config['assignee_username'],
             labels=gitlab_config.get('auto_process_labels')
         )
 
         # 打印结果
         print_statistics(results)
+        # 按保留策略清理旧记录（只访问过期的部分）
+        retention = config.get('retention') or {}
+        if retention.get('enabled', False):
+            removed = state_manager.clear_old_issues(
+                retention.get('days', 30),
+                retention.get('policies')
+            )
+            state_manager.flush()
+            if removed:
+                logger.info(f"🧹 清理了 {removed} 条过期的处理记录")
+
+        if http_cache:
+            logger.info(f"🗄️  HTTP 缓存: {http_cache.get_stats()}")
+        logger.info(f"🔌 连接复用: {gitlab_client.session.get_connection_metrics()}")
         logger.info("✅ 处理完成！")
 
     except KeyboardInterrupt:
@@ -11,13 +11,15 @@ import yaml
 import argparse
 import json
 from datetime import datetime
-from core.state import StateManager
+from core.state import create_state_manager
+from core.blobstore import BlobStore
+from core.rollup import DIMENSIONS, parse_since
 from core.gitlab import GitLabClient
 
 
 def cmd_stats(args):
     """显示统计信息"""
-    state = StateManager(args.state_file)
+    state = create_state_manager(args.state_file, args.state_backend)
     stats = state.get_statistics()
 
     print("="*60)
@@ -34,19 +36,21 @@ def cmd_stats(args):
         success_rate = (stats.get('completed', 0) / stats['total']) * 100
         print(f"\n📈 成功率: {success_rate:.1f}%")
 
+    # 指定时间范围时从时间桶汇总中读取
+    if args.since:
+        since = parse_since(args.since)
+        rollup = state.get_rollup(since, by=args.by)
+        print(f"\n🕒 {since.isoformat()[:19]} 以来的状态变化: {rollup['total']}"
+              f" (按{'小时' if rollup['granularity'] == 'hour' else '天'}统计)")
+        for value, count in sorted(rollup['by'].items(), key=lambda x: x[1], reverse=True):
+            print(f"  {value}: {count}")
+
     # 显示最近处理的 issues
-    all_issues = state.get_all_processed_issues()
-    if all_issues:
+    recent = state.get_recent_issues(5)
+    if recent:
         print(f"\n📋 最近处理的 issues:")
-        sorted_issues = sorted(
-            all_issues.items(),
-            key=lambda x: x[1].get('processed_at', ''),
-            reverse=True
-        )
-        for issue_key, data in sorted_issues[:5]:
-            status = data['status']
-            time = data.get('processed_at', 'N/A')[:19]  # 截取到秒
-            print(f"  {issue_key} - {status} ({time})")
+        for issue_key, status, time in recent:
+            print(f"  {issue_key} - {status} ({time[:19]})")  # 截取到秒
 
     print("="*60)
 
@@ -90,22 +94,39 @@ def cmd_reset(args):
             print("已取消")
             return
 
-    state = StateManager(args.state_file)
-    state.state = {
-        "processed_issues": {},
-        "last_run": None,
-        "statistics": {
-            "total": 0,
-            "completed": 0,
-            "waiting_for_info": 0,
-            "in_progress": 0,
-            "failed": 0
-        }
-    }
-    state._save_state()
+    state = create_state_manager(args.state_file, args.state_backend)
+    state.reset()
     print("✅ 状态已重置")
 
 
+def cmd_show(args):
+    """显示单个 issue 的完整处理记录"""
+    project_path, _, iid = args.issue_key.rpartition('#')
+    state = create_state_manager(args.state_file, args.state_backend)
+    record = state.get_issue(project_path, int(iid))
+    if record is None:
+        print(f"❌ 没有 {args.issue_key} 的处理记录")
+        return
+
+    record = BlobStore(args.blob_dir).unpack(record)
+    print("="*60)
+    print(f"📌 {args.issue_key}")
+    print("="*60)
+    for name, value in record.items():
+        if isinstance(value, str) and '\n' in value:
+            print(f"{name}:\n{value}")
+        else:
+            print(f"{name}: {value}")
+    print("="*60)
+
+
+def cmd_import_state(args):
+    """把 JSON 状态文件导入 SQLite 状态库或分片状态目录"""
+    state = create_state_manager(args.state_file, 'sharded' if args.state_backend == 'sharded' else 'sqlite')
+    count = state.import_json_state(args.json_file)
+    print(f"✅ 已从 {args.json_file} 导入 {count} 条记录到 {args.state_file}")
+
+
 def cmd_config(args):
     """显示配置信息"""
     with open(args.config, 'r') as f:
@@ -141,10 +162,18 @@ def main():
         help='状态文件路径'
     )
 
+    parser.add_argument(
+        '--state-backend',
+        choices=['json', 'sqlite', 'sharded'],
+        help='状态存储后端（默认按状态文件扩展名判断）'
+    )
+
     subparsers = parser.add_subparsers(dest='command', help='子命令')
 
     # stats 命令
-    subparsers.add_parser('stats', help='显示统计信息')
+    stats_parser = subparsers.add_parser('stats', help='显示统计信息')
+    stats_parser.add_argument('--since', help='统计这个时间以来的状态变化 (如 24h、7d、2024-01-01)')
+    stats_parser.add_argument('--by', choices=DIMENSIONS, default='status', help='分组维度')
 
     # list 命令
     list_parser = subparsers.add_parser('list', help='列出 GitLab issues')
@@ -154,6 +183,15 @@ def main():
     reset_parser = subparsers.add_parser('reset', help='重置状态')
     reset_parser.add_argument('--confirm', action='store_true', help='跳过确认')
 
+    # show 命令
+    show_parser = subparsers.add_parser('show', help='显示单个 issue 的完整处理记录')
+    show_parser.add_argument('issue_key', help='issue 键 (如 group/project#123)')
+    show_parser.add_argument('--blob-dir', default='logs/blobs', help='长文本存储目录')
+
+    # import-state 命令
+    import_parser = subparsers.add_parser('import-state', help='把 JSON 状态文件导入 SQLite 状态库或分片状态目录')
+    import_parser.add_argument('json_file', help='要导入的 JSON 状态文件 (如 state.json)')
+
     # config 命令
     subparsers.add_parser('config', help='显示配置')
 
@@ -170,6 +208,10 @@ def main():
         cmd_list_issues(args)
     elif args.command == 'reset':
         cmd_reset(args)
+    elif args.command == 'show':
+        cmd_show(args)
+    elif args.command == 'import-state':
+        cmd_import_state(args)
     elif args.command == 'config':
         cmd_config(args)
 
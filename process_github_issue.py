@@ -9,6 +9,7 @@ import sys
 import logging
 from datetime import datetime
 from core.github import GitHubClient
+from core.leases import IssueLeaseStore
 from providers.claude import ClaudeProvider
 
 
@@ -65,6 +66,13 @@ def main():
     logger, log_file = setup_logging(issue_number)
     logger.info(f"Processing issue #{issue_number} in {repo_owner}/{repo_name}")
 
+    # 与 cron 轮询共用租约库，同一时间只有一个 worker 处理这个 issue
+    issue_key = f"{repo_owner}/{repo_name}#{issue_number}"
+    leases = IssueLeaseStore('logs/issue_leases.db')
+    if not leases.claim(issue_key, lease_seconds=900):
+        logger.info(f"Issue #{issue_number} is being processed by another worker, skipping")
+        return
+
     # 初始化客户端
     github_client = GitHubClient(
         token=github_token,
@@ -255,6 +263,9 @@ The team has been notified and will look into this.
 
         sys.exit(1)
 
+    finally:
+        leases.release(issue_key)
+
 
 if __name__ == "__main__":
     main()
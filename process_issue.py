@@ -10,7 +10,8 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import yaml
 import argparse
 from core.gitlab import GitLabClient
-from core.state import StateManager
+from core.state import create_state_manager_from_config
+from core.blobstore import create_blob_store
 from core.agent import IssueAgent
 from providers.claude import ClaudeProvider
 
@@ -42,7 +43,7 @@ def main():
         token=config['gitlab']['access_token']
     )
 
-    state = StateManager(config.get('state_file', 'state.json'))
+    state = create_state_manager_from_config(config)
 
     ai_provider = ClaudeProvider(
         api_key=config['ai_provider']['claude']['api_key'],
@@ -50,7 +51,7 @@ def main():
         model=config['ai_provider']['claude']['model']
     )
 
-    agent = IssueAgent(gitlab, ai_provider, state)
+    agent = IssueAgent(gitlab, ai_provider, state, create_blob_store(config))
 
     # 检查是否已处理
     if state.is_processed(project_path, issue_iid) and not args.force:
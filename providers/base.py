@@ -49,3 +49,21 @@ class AIProvider(ABC):
             详细的修复指令
         """
         pass
+
+    def get_usage(self) -> Dict:
+        """
+        累计的 AI 调用次数和 token 用量（不统计用量的 provider 返回 0）
+
+        Returns:
+            {"calls": 调用次数, "input_tokens": 输入 token 数, "output_tokens": 输出 token 数}
+        """
+        return {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def get_thread_usage(self) -> Dict:
+        """
+        当前线程累计的 AI 调用次数和 token 用量（多个线程并发调用时，用于把用量算到各自的 issue 上）
+
+        Returns:
+            同 get_usage()
+        """
+        return {"calls": 0, "input_tokens": 0, "output_tokens": 0}
@@ -5,6 +5,7 @@ Claude AI Provider
 
 import json
 import re
+import threading
 from typing import Dict
 from anthropic import Anthropic
 from .base import AIProvider
@@ -31,6 +32,37 @@ class ClaudeProvider(AIProvider):
 
         self.client = Anthropic(**client_kwargs)
 
+        # 累计用量（多个 worker 线程共用一个 provider）
+        self._usage_lock = threading.Lock()
+        self._usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+        self._thread_usage = threading.local()
+
+    def _record_usage(self, response):
+        """累计一次调用的 token 用量（总量和当前线程的用量）"""
+        usage = getattr(response, "usage", None)
+        delta = {
+            "calls": 1,
+            "input_tokens": (usage.input_tokens or 0) if usage is not None else 0,
+            "output_tokens": (usage.output_tokens or 0) if usage is not None else 0
+        }
+        with self._usage_lock:
+            for name, value in delta.items():
+                self._usage[name] += value
+
+        local = self._thread_usage.__dict__
+        for name, value in delta.items():
+            local[name] = local.get(name, 0) + value
+
+    def get_usage(self) -> Dict:
+        """累计的 AI 调用次数和 token 用量"""
+        with self._usage_lock:
+            return dict(self._usage)
+
+    def get_thread_usage(self) -> Dict:
+        """当前线程累计的 AI 调用次数和 token 用量"""
+        local = self._thread_usage.__dict__
+        return {name: local.get(name, 0) for name in ("calls", "input_tokens", "output_tokens")}
+
     def analyze_issue(self, issue: Dict, project_info: Dict, comments: list = None) -> Dict:
         """分析 issue"""
 
@@ -42,6 +74,7 @@ class ClaudeProvider(AIProvider):
                 max_tokens=2000,
                 messages=[{"role": "user", "content": prompt}]
             )
+            self._record_usage(response)
 
             result_text = response.content[0].text
             return self._parse_json_response(result_text)
@@ -119,6 +119,347 @@ def test_mcp_server():
         return False
 
 
+def test_github_rate_limit_reaches_client():
+    """测试 GitHub 的 429（带 Retry-After）交给 GitHubClient 处理，而不是在连接层重试"""
+    print("\n🔍 测试 GitHub 429 处理...")
+
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from core.github import GitHubClient
+
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            if len(hits) == 1:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        client = GitHubClient(token="test-token")
+        client.base_url = f"http://127.0.0.1:{server.server_port}"
+        response = client._request("GET", f"{client.base_url}/repos/o/r/issues")
+        metrics = client.get_rate_limit_status()
+    finally:
+        server.shutdown()
+
+    rate_limited = sum(entry.get("rate_limited", 0) for entry in metrics.values())
+    if response.status_code == 200 and len(hits) == 2 and rate_limited == 1:
+        print("✅ 429 由 RateLimiter 处理")
+        return True
+    print(f"❌ 失败: 请求 {len(hits)} 次，rate_limited={rate_limited}")
+    return False
+
+
+def test_github_app_auth():
+    """测试 GitHub App 认证：JWT 内容、按 owner 缓存 token（内存和磁盘）、过期前刷新、慢请求不阻塞其他 owner"""
+    print("\n🔍 测试 GitHub App 认证...")
+
+    try:
+        import jwt
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+    except ImportError:
+        print("⚠️  未安装 pyjwt[crypto]，跳过")
+        return True
+
+    import json
+    import tempfile
+    import threading
+    import time
+    from datetime import datetime, timezone
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import requests
+    from core.github_app import GitHubAppAuth
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+    now = [1_700_000_000.0]
+    installations = {"/orgs/acme/installation": 11, "/users/alice/installation": 22, "/orgs/slow/installation": 33}
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        def do_GET(self):
+            requests_seen.append(("GET", self.path, self.headers["Authorization"]))
+            if self.path in installations:
+                self._reply(200, {"id": installations[self.path]})
+            else:
+                self._reply(404, {"message": "Not Found"})
+
+        def do_POST(self):
+            requests_seen.append(("POST", self.path, self.headers["Authorization"]))
+            installation_id = int(self.path.split("/")[3])
+            if installation_id == 33:
+                time.sleep(1.0)
+            count = sum(1 for method, path, _ in requests_seen if method == "POST" and path == self.path)
+            expires = datetime.fromtimestamp(now[0] + 3600, timezone.utc).isoformat().replace("+00:00", "Z")
+            self._reply(201, {"token": f"tok-{installation_id}-{count}", "expires_at": expires})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def make_auth(cache_file):
+        return GitHubAppAuth(
+            "12345", private_pem, base_url=base_url, cache_file=cache_file,
+            session=requests.Session(), clock=lambda: now[0]
+        )
+
+    def posts():
+        return [path for method, path, _ in requests_seen if method == "POST"]
+
+    checks = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, "tokens.json")
+            auth = make_auth(cache_file)
+
+            # JWT：RS256 签名，iss 为 App ID，签发时间回拨 60 秒，有效期 9 分钟
+            claims = jwt.decode(
+                auth.create_jwt(), key.public_key(), algorithms=["RS256"],
+                options={"verify_exp": False, "verify_iat": False}
+            )
+            checks["jwt"] = claims == {"iss": "12345", "iat": int(now[0]) - 60, "exp": int(now[0]) + 540}
+
+            # 组织和用户的 installation 各自签发 token，请求使用 App JWT
+            acme = auth.get_token("acme")
+            alice = auth.get_token("alice")
+            bearer = requests_seen[0][2].split(" ", 1)[1]
+            checks["per owner"] = (
+                acme == "tok-11-1" and alice == "tok-22-1"
+                and jwt.decode(bearer, key.public_key(), algorithms=["RS256"],
+                               options={"verify_exp": False, "verify_iat": False})["iss"] == "12345"
+            )
+
+            # 内存缓存：不再请求
+            before = len(requests_seen)
+            checks["memory cache"] = auth.get_token("acme") == acme and len(requests_seen) == before
+
+            # 磁盘缓存：新实例直接使用文件中的 token
+            checks["disk cache"] = (
+                make_auth(cache_file).get_token("alice") == alice and len(requests_seen) == before
+                and os.stat(cache_file).st_mode & 0o777 == 0o600
+            )
+
+            # 距过期超过 REFRESH_MARGIN 时继续使用，进入 REFRESH_MARGIN 后刷新（复用 installation ID）
+            now[0] += 3600 - GitHubAppAuth.REFRESH_MARGIN - 10
+            kept = auth.get_token("acme")
+            now[0] += 20
+            refreshed = auth.get_token("acme")
+            checks["refresh"] = (
+                kept == acme and refreshed == "tok-11-2" and len(requests_seen) == before + 1
+            )
+
+            # 一个 owner 的 token 请求很慢时，其他 owner 的缓存 token 不用等待；同一 owner 只请求一次
+            slow_tokens = []
+            slow_threads = [
+                threading.Thread(target=lambda: slow_tokens.append(auth.get_token("slow"))) for _ in range(2)
+            ]
+            for thread in slow_threads:
+                thread.start()
+            time.sleep(0.2)
+            started = time.monotonic()
+            auth.get_token("acme")
+            waited = time.monotonic() - started
+            for thread in slow_threads:
+                thread.join()
+            checks["no blocking"] = (
+                waited < 0.5 and slow_tokens == ["tok-33-1", "tok-33-1"]
+                and posts().count("/app/installations/33/access_tokens") == 1
+            )
+    finally:
+        server.shutdown()
+
+    if all(checks.values()):
+        print("✅ JWT、token 缓存和刷新正常，慢请求不阻塞其他 owner")
+        return True
+    print(f"❌ 失败: {checks}")
+    return False
+
+
+def test_budget_concurrent_workers():
+    """测试多个 worker 并发处理时，AI 调用预算能用满而不超出"""
+    print("\n🔍 测试并发处理时的运行预算...")
+
+    import tempfile
+    import threading
+    import time
+    from core.budget import RunBudget
+    from providers.base import AIProvider
+
+    class FakeGitLab:
+        def iter_assigned_issues(self, *args, **kwargs):
+            for iid in range(40):
+                yield {
+                    "iid": iid, "project_id": 1, "title": "test", "created_at": f"{iid:04d}",
+                    "author": {"username": "tester"}, "references": {"full": f"test/project#{iid}"}
+                }
+
+        def get_project_info(self, project_id):
+            return {}
+
+    class FakeAI(AIProvider):
+        def __init__(self):
+            self._local = threading.local()
+
+        def analyze_issue(self, issue, project_info):
+            time.sleep(0.01)
+            self._local.calls = getattr(self._local, "calls", 0) + 1
+            return {"action": "skip", "reason": "test"}
+
+        def generate_fix_instructions(self, issue, project_info, plan):
+            return ""
+
+        def get_thread_usage(self):
+            return {"calls": getattr(self._local, "calls", 0), "input_tokens": 0, "output_tokens": 0}
+
+    used = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (1, 4, 8):
+            budget = RunBudget(max_ai_calls=20)
+            state = StateManager(os.path.join(tmp, f"state_{workers}.json"), write_behind=True)
+            agent = IssueAgent(FakeGitLab(), FakeAI(), state, max_workers=workers, budget=budget)
+            results = agent.process_all_issues("tester")
+            used[workers] = (budget.get_usage()["ai_calls"], results["deferred"])
+
+    if all(calls == 20 and deferred == 20 for calls, deferred in used.values()):
+        print("✅ 预算用满且没有超出")
+        return True
+    print(f"❌ 失败: {used}")
+    return False
+
+
+def test_state_error_isolated():
+    """测试并发处理时，查询状态或认领出错（如 database is locked）只影响那个 issue"""
+    print("\n🔍 测试认领出错时的隔离...")
+
+    import sqlite3
+    import tempfile
+    from providers.base import AIProvider
+
+    class FakeGitLab:
+        def iter_assigned_issues(self, *args, **kwargs):
+            for iid in range(10):
+                yield {
+                    "iid": iid, "project_id": 1, "title": "test", "created_at": f"{iid:04d}",
+                    "author": {"username": "tester"}, "references": {"full": f"test/project#{iid}"}
+                }
+
+        def get_project_info(self, project_id):
+            return {}
+
+    class FakeAI(AIProvider):
+        def analyze_issue(self, issue, project_info):
+            return {"action": "skip", "reason": "test"}
+
+        def generate_fix_instructions(self, issue, project_info, plan):
+            return ""
+
+    class LockedState(StateManager):
+        claimed = []
+        released = []
+
+        def claim_issue(self, project_path, issue_iid, lease_seconds=900):
+            if issue_iid == 3:
+                raise sqlite3.OperationalError("database is locked")
+            self.claimed.append(issue_iid)
+            return True
+
+        def release_issue(self, project_path, issue_iid):
+            self.released.append(issue_iid)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = LockedState(os.path.join(tmp, "state.json"))
+        agent = IssueAgent(FakeGitLab(), FakeAI(), state, max_workers=4)
+        try:
+            results = agent.process_all_issues("tester")
+        except sqlite3.OperationalError as e:
+            print(f"❌ 失败: 运行被中断 ({e})")
+            return False
+
+    if results["failed"] == 1 and results["total"] == 10 and sorted(state.released) == sorted(state.claimed):
+        print("✅ 只有出错的 issue 记为失败，其余正常处理，认领都已释放")
+        return True
+    print(f"❌ 失败: {results}, claimed={state.claimed}, released={state.released}")
+    return False
+
+
+def test_recent_issues_order():
+    """测试 JSON、SQLite 和分片存储的最近处理记录顺序一致（处理时间相同时按 issue 键）"""
+    print("\n🔍 测试各存储后端的最近处理记录顺序...")
+
+    import tempfile
+    from datetime import datetime as real_datetime
+    from unittest import mock
+    from core.state import create_state_manager
+
+    class Clock(real_datetime):
+        current = real_datetime(2024, 1, 1, 12, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    modules = ("core.state", "core.state_sqlite", "core.state_sharded")
+    orders = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, path in (("json", "state.json"), ("sqlite", "state.db"), ("sharded", "state.d")):
+            patches = [mock.patch(f"{module}.datetime", Clock) for module in modules]
+            for patch in patches:
+                patch.start()
+            try:
+                Clock.current = real_datetime(2024, 1, 1, 12, 0, 0)
+                state = create_state_manager(os.path.join(tmp, path), backend)
+                for project_path, iid in (("g/a", 1), ("g/b", 1), ("g/a", 9), ("g/a", 10)):
+                    state.mark_processed(project_path, iid, "waiting_for_info")
+                Clock.current = real_datetime(2024, 1, 1, 12, 0, 1)
+                state.mark_processed("g/a", 3, "completed")
+                # 更新状态不改变处理时间
+                Clock.current = real_datetime(2024, 1, 1, 12, 0, 2)
+                state.update_issue_status("g/a", 1, "completed")
+                orders[backend] = state.get_recent_issues(5)
+            finally:
+                for patch in patches:
+                    patch.stop()
+
+    expected = [
+        ("g/a#3", "completed", "2024-01-01T12:00:01"),
+        ("g/b#1", "waiting_for_info", "2024-01-01T12:00:00"),
+        ("g/a#9", "waiting_for_info", "2024-01-01T12:00:00"),
+        ("g/a#10", "waiting_for_info", "2024-01-01T12:00:00"),
+        ("g/a#1", "completed", "2024-01-01T12:00:00"),
+    ]
+    if all(order == expected for order in orders.values()):
+        print("✅ 三个后端顺序一致")
+        return True
+    print(f"❌ 失败: {orders}")
+    return False
+
+
 def main():
     """运行所有测试"""
     print("="*60)
@@ -129,7 +470,12 @@ def main():
         "GitLab 连接": test_gitlab_connection(),
         "状态管理": test_state_manager(),
         "AI Provider": test_ai_provider(),
-        "MCP Server": test_mcp_server()
+        "MCP Server": test_mcp_server(),
+        "GitHub 429 处理": test_github_rate_limit_reaches_client(),
+        "GitHub App 认证": test_github_app_auth(),
+        "运行预算": test_budget_concurrent_workers(),
+        "认领出错隔离": test_state_error_isolated(),
+        "最近处理记录顺序": test_recent_issues_order()
     }
 
     print("\n" + "="*60)